@@ -1,11 +1,10 @@
 import os
 import time
 import hashlib
+import threading
 from datetime import datetime, timezone
 
 from flask import Flask, request, Response, jsonify
-import boto3
-from botocore.exceptions import ClientError
 
 APP_NAME = "ds252-flask"
 REGION = os.environ.get("AWS_REGION") or os.environ.get("AWS_DEFAULT_REGION")
@@ -14,7 +13,37 @@ BUCKET = os.environ.get("S3_BUCKET")
 # Fixed hashing workload (env knobs only; NOT per-request)
 HASH_ROUNDS = int(os.environ.get("MICRO_HASH_ROUNDS", "50000"))  # total sha256 iterations
 
-s3 = boto3.client("s3", region_name=REGION) if REGION else boto3.client("s3")
+# Fast start: defer importing boto3 and building the S3 client until the first S3 request,
+# so new replicas accept /hash and /healthz traffic sooner. S3_WARMUP=1 builds it in a
+# background thread right after startup instead of on the first request.
+FAST_START = os.environ.get("FAST_START", "0") == "1"
+S3_WARMUP = os.environ.get("S3_WARMUP", "0") == "1"
+
+
+class ClientError(Exception):
+    """Placeholder until botocore is imported; get_s3() rebinds it to botocore's ClientError."""
+
+
+_s3 = None
+_s3_lock = threading.Lock()
+
+
+def get_s3():
+    global _s3, ClientError
+    if _s3 is None:
+        with _s3_lock:
+            if _s3 is None:
+                import boto3
+                from botocore.exceptions import ClientError
+                _s3 = boto3.client("s3", region_name=REGION) if REGION else boto3.client("s3")
+    return _s3
+
+
+if not FAST_START:
+    get_s3()
+elif S3_WARMUP:
+    threading.Thread(target=get_s3, name="s3-warmup", daemon=True).start()
+
 app = Flask(__name__)
 
 def _json_error(message: str, status: int = 400):
@@ -32,7 +61,7 @@ def healthz():
 def info():
     return jsonify({"app": APP_NAME, "env": {
         "AWS_REGION": REGION, "S3_BUCKET": BUCKET,
-        "MICRO_HASH_ROUNDS": HASH_ROUNDS
+        "MICRO_HASH_ROUNDS": HASH_ROUNDS, "FAST_START": FAST_START, "S3_WARMUP": S3_WARMUP
     }})
 
 @app.route("/hash", methods=["GET", "POST"])
@@ -84,11 +113,11 @@ def work():
         if mode == "write":
             size_kb = int(request.args.get("size_kb", "64"))
             payload = os.urandom(size_kb * 1024)
-            put = s3.put_object(Bucket=BUCKET, Key=key, Body=payload)
+            put = get_s3().put_object(Bucket=BUCKET, Key=key, Body=payload)
             return jsonify({"ok": True, "action": "write", "bucket": BUCKET, "key": key,
                             "size_kb": size_kb, "etag": put.get("ETag"), "version_id": put.get("VersionId")})
         elif mode == "read":
-            obj = s3.get_object(Bucket=BUCKET, Key=key)
+            obj = get_s3().get_object(Bucket=BUCKET, Key=key)
             data = obj["Body"].read()
             return jsonify({"ok": True, "action": "read", "bucket": BUCKET, "key": key,
                             "bytes": len(data), "preview_first_128_bytes_hex": data[:128].hex(),
@@ -112,7 +141,7 @@ def text():
         if not key:
             return _json_error("Missing 'key'")
         try:
-            put = s3.put_object(Bucket=BUCKET, Key=key,
+            put = get_s3().put_object(Bucket=BUCKET, Key=key,
                                 Body=text_value.encode("utf-8"),
                                 ContentType="text/plain; charset=utf-8")
             return jsonify({"ok": True, "action": "write_text", "bucket": BUCKET, "key": key,
@@ -125,7 +154,7 @@ def text():
     if not key:
         return _json_error("Missing 'key'")
     try:
-        obj = s3.get_object(Bucket=BUCKET, Key=key)
+        obj = get_s3().get_object(Bucket=BUCKET, Key=key)
         return Response(obj["Body"].read(), status=200, mimetype="text/plain; charset=utf-8")
     except ClientError as e:
         err = e.response.get("Error", {})
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Gunicorn worker-model benchmark matrix for the ds252-flask image (app.py)
+
+For every combination of worker class, worker count, thread count and CPU quota:
+  1. starts `gunicorn app:app` under the quota (cgroup v2 / systemd-run / taskset)
+  2. points the app at an in-process S3 stand-in (see s3_standin.py)
+  3. drives a weighted /hash + /work mix with N concurrent closed-loop clients
+  4. records throughput, p50 and p99
+
+Prints a results table and the recommended configuration per CPU quota, and
+saves everything to gunicorn_matrix_results.json.
+
+Example (what the Dockerfile/ECS/Helm defaults look like):
+    python bench_gunicorn.py --worker-classes sync,gthread --workers 1,2 \
+        --threads 1,4 --cpu-quotas 0.25,1 --mix hash=70,work_read=20,work_write=10
+"""
+
+import argparse
+import importlib.util
+import itertools
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+from s3_standin import start_standin
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_BUCKET = "ds252-bench"
+SEED_OBJECTS = 32
+
+# worker class -> python module gunicorn needs for it
+ASYNC_WORKER_MODULES = {"gevent": "gevent", "eventlet": "eventlet"}
+
+
+def parse_list(value, cast=str):
+    return [cast(v.strip()) for v in value.split(",") if v.strip()]
+
+
+def parse_mix(value):
+    """'hash=70,work_read=20,work_write=10' -> {'hash': 70.0, ...}"""
+    mix = {}
+    for part in parse_list(value):
+        name, _, weight = part.partition("=")
+        if name not in ("hash", "work_read", "work_write"):
+            raise ValueError(f"Unknown mix operation: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile over an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+# ---------- CPU quota enforcement ----------
+
+class QuotaLimiter:
+    """Picks the best available way to cap the server's CPU on this host."""
+
+    CGROUP_ROOT = "/sys/fs/cgroup"
+
+    def __init__(self):
+        self.method = self._detect()
+
+    def _detect(self):
+        if shutil.which("systemd-run"):
+            probe = subprocess.run(["systemd-run", "--scope", "-q", "-p", "CPUQuota=50%", "true"],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            if probe.returncode == 0:
+                return "systemd-run"
+        controllers = os.path.join(self.CGROUP_ROOT, "cgroup.controllers")
+        if os.path.exists(controllers) and os.access(self.CGROUP_ROOT, os.W_OK):
+            with open(controllers) as f:
+                if "cpu" in f.read().split() and self._delegate_cpu():
+                    return "cgroup"
+        if shutil.which("taskset"):
+            return "taskset"
+        return "none"
+
+    def _delegate_cpu(self):
+        """Enable the cpu controller for child cgroups (cpu.max only exists in them once it is)"""
+        subtree = os.path.join(self.CGROUP_ROOT, "cgroup.subtree_control")
+        try:
+            with open(subtree) as f:
+                if "cpu" in f.read().split():
+                    return True
+            with open(subtree, "w") as f:
+                f.write("+cpu")
+            return True
+        except OSError:
+            return False
+
+    def _cgroup_path(self, tag):
+        return os.path.join(self.CGROUP_ROOT, f"ds252-bench-{tag}")
+
+    def wrap(self, cmd, quota, tag):
+        """Return (cmd, preexec_fn, enforced_description) for a quota in CPUs."""
+        if self.method == "systemd-run":
+            pct = int(round(quota * 100))
+            return (["systemd-run", "--scope", "-q", "-p", f"CPUQuota={pct}%"] + cmd,
+                    None, f"CPUQuota={pct}%")
+        if self.method == "cgroup":
+            path = self._cgroup_path(tag)
+            os.makedirs(path, exist_ok=True)
+            period = 100000
+            try:
+                with open(os.path.join(path, "cpu.max"), "w") as f:
+                    f.write(f"{int(quota * period)} {period}")
+            except OSError as e:
+                # cpu not delegated after all: fall back to pinning CPUs for this and later runs
+                self.release(tag)
+                print(f"⚠️  cgroup cpu.max unavailable ({e}), falling back to taskset")
+                self.method = "taskset" if shutil.which("taskset") else "none"
+                return self.wrap(cmd, quota, tag)
+
+            def join_cgroup():
+                with open(os.path.join(path, "cgroup.procs"), "w") as procs:
+                    procs.write(str(os.getpid()))
+            return cmd, join_cgroup, f"cpu.max={int(quota * period)}/{period}"
+        if self.method == "taskset":
+            # taskset can only pin whole CPUs; fractional quotas round up
+            cpus = min(max(1, math.ceil(quota)), os.cpu_count() or 1)
+            return (["taskset", "-c", f"0-{cpus - 1}"] + cmd, None,
+                    f"taskset {cpus} cpu(s) (approx.)")
+        return cmd, None, "unenforced"
+
+    def release(self, tag):
+        """Remove the run's cgroup once the server has exited (a no-op for the other methods)"""
+        path = self._cgroup_path(tag)
+        if self.method != "cgroup" or not os.path.isdir(path):
+            return
+        # gunicorn's workers may still be exiting for a moment after the master
+        for _ in range(50):
+            try:
+                os.rmdir(path)
+                return
+            except OSError:
+                time.sleep(0.1)
+        print(f"⚠️  Could not remove cgroup {path}")
+
+
+# ---------- Server lifecycle ----------
+
+def build_configs(worker_classes, workers, threads):
+    configs = []
+    for worker_class in worker_classes:
+        worker_class = "gevent" if worker_class == "async" else worker_class
+        module = ASYNC_WORKER_MODULES.get(worker_class)
+        if module and importlib.util.find_spec(module) is None:
+            print(f"⚠️  Skipping {worker_class}: `pip install {module}` to benchmark it")
+            continue
+        # sync and async workers ignore --threads, so don't multiply the matrix
+        thread_options = threads if worker_class == "gthread" else [1]
+        for w, t in itertools.product(workers, thread_options):
+            configs.append({"worker_class": worker_class, "workers": w, "threads": t})
+    return configs
+
+
+def start_server(config, quota, port, limiter, s3_endpoint, hash_rounds, tag):
+    cmd = [sys.executable, "-m", "gunicorn",
+           "--bind", f"127.0.0.1:{port}",
+           "--worker-class", config["worker_class"],
+           "--workers", str(config["workers"]),
+           "--threads", str(config["threads"]),
+           "--timeout", "60",
+           "app:app"]
+    if config["worker_class"] in ASYNC_WORKER_MODULES:
+        cmd[-1:-1] = ["--worker-connections", "1000"]
+    cmd, preexec_fn, enforced = limiter.wrap(cmd, quota, tag)
+
+    env = dict(os.environ,
+               S3_BUCKET=BENCH_BUCKET,
+               AWS_REGION="us-east-1",
+               AWS_ENDPOINT_URL_S3=s3_endpoint,
+               AWS_ACCESS_KEY_ID="local",
+               AWS_SECRET_ACCESS_KEY="local",
+               MICRO_HASH_ROUNDS=str(hash_rounds))
+    proc = subprocess.Popen(cmd, cwd=APP_DIR, env=env, preexec_fn=preexec_fn,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    return proc, enforced
+
+
+def wait_ready(base_url, proc, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn exited early: {proc.stderr.read().decode()[-500:]}")
+        try:
+            if requests.get(f"{base_url}/healthz", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"gunicorn not ready after {timeout}s")
+
+
+def stop_server(proc, limiter, tag):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+    limiter.release(tag)
+
+
+# ---------- Load driver ----------
+
+def send_op(session, base_url, op, rng):
+    if op == "hash":
+        return session.post(f"{base_url}/hash", data={"data": f"ds252-{rng.random()}"}, timeout=60)
+    if op == "work_read":
+        key = f"bench/seed-{rng.randrange(SEED_OBJECTS)}"
+        return session.get(f"{base_url}/work", params={"mode": "read", "key": key}, timeout=60)
+    key = f"bench/write-{rng.randrange(1_000_000)}"
+    return session.get(f"{base_url}/work", params={"mode": "write", "key": key, "size_kb": 64}, timeout=60)
+
+
+def drive_load(base_url, mix, concurrency, duration, warmup, seed=252):
+    """Closed-loop clients; returns per-request (op, latency_ms, ok) from the measured window."""
+    ops, weights = zip(*mix.items())
+    samples = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+
+    def client(idx):
+        rng = random.Random(seed + idx)
+        local = []
+        with requests.Session() as session:
+            while True:
+                now = time.perf_counter()
+                if now >= stop_at:
+                    break
+                op = rng.choices(ops, weights)[0]
+                try:
+                    ok = send_op(session, base_url, op, rng).status_code == 200
+                except requests.RequestException:
+                    ok = False
+                end = time.perf_counter()
+                if now >= measure_from:
+                    local.append((op, (end - now) * 1000, ok))
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples
+
+
+def summarize(samples, duration):
+    latencies = sorted(lat for _, lat, ok in samples if ok)
+    errors = sum(1 for _, _, ok in samples if not ok)
+    per_op = {}
+    for op in sorted({op for op, _, _ in samples}):
+        op_lat = sorted(lat for o, lat, ok in samples if o == op and ok)
+        per_op[op] = {"count": len(op_lat), "p50_ms": round(percentile(op_lat, 50), 2),
+                      "p99_ms": round(percentile(op_lat, 99), 2)}
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "throughput_rps": round(len(latencies) / duration, 2),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "per_op": per_op,
+    }
+
+
+def recommend(rows, p99_slo_ms, max_error_rate):
+    """Best config per quota: highest throughput within the p99/error budget, fewest processes on ties."""
+    recommendations = {}
+    for quota in sorted({r["cpu_quota"] for r in rows}):
+        candidates = [r for r in rows if r["cpu_quota"] == quota
+                      and r["p99_ms"] <= p99_slo_ms and r["error_rate"] <= max_error_rate]
+        if not candidates:
+            recommendations[quota] = None
+            continue
+        best = max(candidates, key=lambda r: (r["throughput_rps"], -r["workers"], -r["threads"]))
+        recommendations[quota] = best
+    return recommendations
+
+
+def label(row):
+    if row["worker_class"] == "gthread":
+        return f"{row['worker_class']} w={row['workers']} t={row['threads']}"
+    return f"{row['worker_class']} w={row['workers']}"
+
+
+def print_table(rows, recommendations, p99_slo_ms):
+    print("\n" + "=" * 86)
+    print("📊 GUNICORN WORKER MATRIX")
+    print("=" * 86)
+    print(f"{'quota':>6}  {'config':<24}{'rps':>9}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}  enforced")
+    print("-" * 86)
+    for row in sorted(rows, key=lambda r: (r["cpu_quota"], -r["throughput_rps"])):
+        print(f"{row['cpu_quota']:>6}  {label(row):<24}{row['throughput_rps']:>9.1f}"
+              f"{row['p50_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['errors']:>8}  {row['enforced']}")
+
+    print(f"\n🔹 Recommended configuration per CPU quota (p99 ≤ {p99_slo_ms:.0f} ms)")
+    for quota, best in recommendations.items():
+        if best is None:
+            print(f"  {quota} CPU: no configuration met the p99/error budget")
+            continue
+        args = f"--worker-class {best['worker_class']} --workers {best['workers']} --threads {best['threads']}"
+        print(f"  {quota} CPU: {label(best)}  ({best['throughput_rps']:.1f} rps, p99 {best['p99_ms']:.1f} ms)")
+        print(f"      GUNICORN_CMD_ARGS=\"{args} --timeout 60\"")
+    print("=" * 86)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gunicorn worker models for app.py")
+    parser.add_argument("--worker-classes", default="sync,gthread,gevent",
+                        help="comma list of sync,gthread,gevent|async,eventlet")
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--threads", default="1,4,8", help="only applied to gthread")
+    parser.add_argument("--cpu-quotas", default="0.25,0.5,1.0", help="CPUs per server, e.g. 0.25 = 250m")
+    parser.add_argument("--mix", default="hash=70,work_read=20,work_write=10")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent client connections")
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds per configuration")
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--hash-rounds", type=int, default=int(os.environ.get("MICRO_HASH_ROUNDS", "50000")))
+    parser.add_argument("--p99-slo-ms", type=float, default=1000)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--output", default="gunicorn_matrix_results.json")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    configs = build_configs(parse_list(args.worker_classes), parse_list(args.workers, int),
+                            parse_list(args.threads, int))
+    quotas = parse_list(args.cpu_quotas, float)
+    limiter = QuotaLimiter()
+
+    _, store, s3_endpoint = start_standin()
+    seed_payload = os.urandom(64 * 1024)
+    for i in range(SEED_OBJECTS):
+        store.put(BENCH_BUCKET, f"bench/seed-{i}", seed_payload)
+
+    print("🧪 Gunicorn worker-model benchmark")
+    print(f"   Configs: {len(configs)} x quotas {quotas} (limiter: {limiter.method})")
+    print(f"   Mix: {mix}, concurrency {args.concurrency}, {args.duration}s per run")
+    print(f"   S3 stand-in: {s3_endpoint}")
+
+    rows = []
+    for run, (quota, config) in enumerate(itertools.product(quotas, configs)):
+        base_url = f"http://127.0.0.1:{args.port}"
+        proc, enforced = start_server(config, quota, args.port, limiter, s3_endpoint,
+                                      args.hash_rounds, tag=run)
+        try:
+            wait_ready(base_url, proc)
+            samples = drive_load(base_url, mix, args.concurrency, args.duration, args.warmup)
+        except RuntimeError as e:
+            print(f"   ❌ {quota} CPU {label(dict(config))}: {e}")
+            continue
+        finally:
+            stop_server(proc, limiter, run)
+
+        row = dict(config, cpu_quota=quota, enforced=enforced, **summarize(samples, args.duration))
+        rows.append(row)
+        print(f"   ✅ {quota} CPU {label(row)}: {row['throughput_rps']:.1f} rps, "
+              f"p50 {row['p50_ms']:.1f} ms, p99 {row['p99_ms']:.1f} ms")
+
+    recommendations = recommend(rows, args.p99_slo_ms, args.max_error_rate)
+    print_table(rows, recommendations, args.p99_slo_ms)
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "timestamp": datetime.now().isoformat(),
+            "settings": {"mix": mix, "concurrency": args.concurrency, "duration": args.duration,
+                         "hash_rounds": args.hash_rounds, "p99_slo_ms": args.p99_slo_ms,
+                         "limiter": limiter.method},
+            "results": rows,
+            "recommendations": {str(q): r for q, r in recommendations.items()},
+        }, f, indent=2)
+    print(f"📄 Results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
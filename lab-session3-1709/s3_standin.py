@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Minimal local S3 stand-in for benchmarking app.py without AWS.
+
+Implements just enough of the S3 REST API (path-style PUT/GET/HEAD/DELETE
+object) for boto3's put_object/get_object, keeping objects in memory.
+
+Point the app at it with:
+    AWS_ENDPOINT_URL_S3=http://127.0.0.1:9000 AWS_ACCESS_KEY_ID=local \
+    AWS_SECRET_ACCESS_KEY=local S3_BUCKET=ds252-bench gunicorn app:app
+
+Run standalone:
+    python s3_standin.py --port 9000
+"""
+
+import argparse
+import hashlib
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+
+class S3Store:
+    """Thread-safe in-memory bucket/key -> bytes map."""
+
+    def __init__(self):
+        self.objects = {}
+        self.lock = threading.Lock()
+
+    def put(self, bucket, key, data):
+        with self.lock:
+            self.objects[(bucket, key)] = data
+        return hashlib.md5(data).hexdigest()
+
+    def get(self, bucket, key):
+        with self.lock:
+            return self.objects.get((bucket, key))
+
+    def delete(self, bucket, key):
+        with self.lock:
+            self.objects.pop((bucket, key), None)
+
+
+def _make_handler(store):
+    class S3Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass  # keep benchmark output clean
+
+        def _split_path(self):
+            path = unquote(urlparse(self.path).path).lstrip("/")
+            bucket, _, key = path.partition("/")
+            return bucket, key
+
+        def _send(self, status, body=b"", headers=None):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+
+        def _not_found(self, key):
+            body = (f"<?xml version=\"1.0\" encoding=\"UTF-8\"?><Error><Code>NoSuchKey</Code>"
+                    f"<Message>The specified key does not exist.</Message><Key>{key}</Key></Error>").encode()
+            self._send(404, body, {"Content-Type": "application/xml"})
+
+        def _read_body(self):
+            length = int(self.headers.get("Content-Length", "0"))
+            data = self.rfile.read(length)
+            if "aws-chunked" in self.headers.get("Content-Encoding", ""):
+                data = _decode_aws_chunked(data)
+            return data
+
+        def do_PUT(self):
+            bucket, key = self._split_path()
+            etag = store.put(bucket, key, self._read_body())
+            self._send(200, headers={"ETag": f"\"{etag}\""})
+
+        def do_GET(self):
+            bucket, key = self._split_path()
+            data = store.get(bucket, key)
+            if data is None:
+                return self._not_found(key)
+            self._send(200, data, {"Content-Type": "application/octet-stream",
+                                   "ETag": f"\"{hashlib.md5(data).hexdigest()}\"",
+                                   "Last-Modified": formatdate(usegmt=True)})
+
+        do_HEAD = do_GET
+
+        def do_DELETE(self):
+            bucket, key = self._split_path()
+            store.delete(bucket, key)
+            self._send(204)
+
+    return S3Handler
+
+
+def _decode_aws_chunked(data):
+    """Strip aws-chunked framing (newer botocore sends it for checksummed uploads)."""
+    out = bytearray()
+    pos = 0
+    while pos < len(data):
+        line_end = data.index(b"\r\n", pos)
+        size = int(data[pos:line_end].split(b";")[0], 16)
+        if size == 0:
+            break
+        start = line_end + 2
+        out += data[start:start + size]
+        pos = start + size + 2
+    return bytes(out)
+
+
+def start_standin(host="127.0.0.1", port=0, store=None):
+    """Start the stand-in on a daemon thread; returns (server, store, endpoint_url)."""
+    store = store or S3Store()
+    server = ThreadingHTTPServer((host, port), _make_handler(store))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://{host}:{server.server_address[1]}"
+    return server, store, endpoint
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-memory S3 stand-in for local benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), _make_handler(S3Store()))
+    print(f"S3 stand-in listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Startup profiler for app.py (cold-start / scale-out reaction time)
+
+For each startup mode (default, FAST_START=1, FAST_START=1 + S3_WARMUP=1):
+  1. import-time breakdown of `import app` (python -X importtime), top packages
+  2. time-to-first-200 from spawning gunicorn to the first 200 on /healthz and /hash
+  3. latency of the first S3-backed request (/work), where deferred work now lands
+
+The S3 calls go to the in-memory stand-in from s3_standin.py, so no AWS account is needed.
+
+Usage:
+    python startup_profile.py --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import requests
+
+from s3_standin import start_standin
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MODES = {
+    "default": {"FAST_START": "0"},
+    "fast_start": {"FAST_START": "1"},
+    "fast_start+warmup": {"FAST_START": "1", "S3_WARMUP": "1"},
+}
+
+
+def app_env(mode_env, s3_endpoint):
+    return dict(os.environ, S3_BUCKET="ds252-bench", AWS_REGION="us-east-1",
+                AWS_ENDPOINT_URL_S3=s3_endpoint, AWS_ACCESS_KEY_ID="local",
+                AWS_SECRET_ACCESS_KEY="local", **mode_env)
+
+
+def import_breakdown(env, top=10):
+    """Run `import app` under -X importtime; return its total ms and app's direct imports by cumulative ms."""
+    # the warmup thread imports boto3 off the critical path; keep it out of the breakdown
+    env = dict(env, S3_WARMUP="0")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"],
+                          cwd=APP_DIR, env=env, capture_output=True, text=True)
+    total_ms, packages = 0.0, {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, raw_name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header row
+        name = raw_name.strip()
+        depth = (len(raw_name) - len(raw_name.lstrip()) - 1) // 2
+        if depth == 0 and name == "app":
+            total_ms = int(cumulative) / 1000.0
+            break
+        elif depth == 1:
+            # importtime prints children before their parent; the next depth-0 "app" line closes them
+            packages[name] = packages.get(name, 0) + int(cumulative) / 1000.0
+        elif depth == 0:
+            packages.clear()  # direct imports of some other top-level module (interpreter startup)
+    ranked = sorted(packages.items(), key=lambda kv: kv[1], reverse=True)
+    return round(total_ms, 1), [(n, round(ms, 1)) for n, ms in ranked[:top]]
+
+
+def time_to_first_200(env, port, timeout=60):
+    """Spawn gunicorn like the Dockerfile does and time readiness plus the first requests."""
+    base_url = f"http://127.0.0.1:{port}"
+    cmd = [sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}",
+           "--workers", "1", "--threads", "4", "--timeout", "60", "app:app"]
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        healthz_ms = None
+        while time.perf_counter() - t0 < timeout:
+            try:
+                if requests.get(f"{base_url}/healthz", timeout=1).status_code == 200:
+                    healthz_ms = (time.perf_counter() - t0) * 1000
+                    break
+            except requests.RequestException:
+                time.sleep(0.005)
+        if healthz_ms is None:
+            raise RuntimeError("server never became ready")
+
+        requests.get(f"{base_url}/hash", params={"data": "warm"}, timeout=60)
+        hash_ms = (time.perf_counter() - t0) * 1000
+
+        s0 = time.perf_counter()
+        requests.get(f"{base_url}/work", params={"mode": "write", "key": "probe", "size_kb": 1}, timeout=60)
+        first_s3_ms = (time.perf_counter() - s0) * 1000
+        return {"healthz_ms": healthz_ms, "hash_ms": hash_ms, "first_s3_request_ms": first_s3_ms}
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile app.py import time and time-to-first-200")
+    parser.add_argument("--runs", type=int, default=5, help="gunicorn cold starts per mode")
+    parser.add_argument("--port", type=int, default=5056)
+    parser.add_argument("--output", default="startup_profile_results.json")
+    args = parser.parse_args()
+
+    _, _, s3_endpoint = start_standin()
+    report = {}
+
+    print("🧪 app.py startup profile")
+    for mode, mode_env in MODES.items():
+        env = app_env(mode_env, s3_endpoint)
+        import_total, top_packages = import_breakdown(env)
+        runs = [time_to_first_200(env, args.port) for _ in range(args.runs)]
+        medians = {k: round(statistics.median(r[k] for r in runs), 1) for k in runs[0]}
+        report[mode] = {"env": mode_env, "import_ms": import_total,
+                        "top_imports": top_packages, "median": medians, "runs": runs}
+
+        print(f"\n🔹 {mode} ({' '.join(f'{k}={v}' for k, v in mode_env.items())})")
+        print(f"   import app:            {import_total:8.1f} ms")
+        for name, ms in top_packages[:5]:
+            print(f"     {name:<22}{ms:8.1f} ms")
+        print(f"   first 200 /healthz:    {medians['healthz_ms']:8.1f} ms (median of {args.runs})")
+        print(f"   first 200 /hash:       {medians['hash_ms']:8.1f} ms")
+        print(f"   first /work (S3) req:  {medians['first_s3_request_ms']:8.1f} ms")
+
+    baseline = report["default"]["median"]["healthz_ms"]
+    print("\n" + "=" * 60)
+    for mode in MODES:
+        delta = baseline - report[mode]["median"]["healthz_ms"]
+        print(f"{mode:<20} time-to-first-200 saved vs default: {delta:7.1f} ms")
+    print("=" * 60)
+
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "modes": report}, f, indent=2)
+    print(f"📄 Results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
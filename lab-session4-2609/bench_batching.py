@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Micro-batching benchmark for ml-inference/src/inference_server.py
+
+For every (max batch size, max wait) setting this script:
+  1. starts the inference server in a fresh process on a local port
+  2. keeps --concurrency requests in flight against POST /predict for
+     --duration seconds (closed loop: each client sends its next request as
+     soon as the previous one returns), after a short warm-up
+  3. reports throughput, p50/p99 latency and the mean batch size the server
+     actually formed (from GET /stats)
+
+Batch size 1 with 0 ms wait is the unbatched baseline: one forward pass per
+request, like one Lambda invocation per image.
+
+Example:
+    python3 bench_batching.py --model resnet --batch-sizes 1,4,8,16,32 --waits-ms 0,2,5,10 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import aiohttp
+import numpy as np
+from PIL import Image
+
+LAB_DIR = os.path.dirname(os.path.abspath(__file__))
+ML_INFERENCE_SRC = os.path.join(LAB_DIR, "workflow2-stepfunctions", "ml-inference", "src")
+
+
+def make_images(count):
+    """Preprocessed-looking inputs: 224x224 grayscale JPEGs, base64 like the Lambda payload"""
+    rng = np.random.default_rng(0)
+    images = []
+    for _ in range(count):
+        out = io.BytesIO()
+        Image.fromarray(rng.integers(0, 256, size=(224, 224), dtype=np.uint8)).save(out, format="JPEG", quality=85)
+        images.append(base64.b64encode(out.getvalue()).decode())
+    return images
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, max_batch, max_wait_ms):
+    command = [sys.executable, "inference_server.py", "--port", str(port),
+               "--max-batch", str(max_batch), "--max-wait-ms", str(max_wait_ms)]
+    return subprocess.Popen(command, cwd=ML_INFERENCE_SRC, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+
+async def wait_ready(session, base_url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited: {process.stderr.read().decode()[-500:]}")
+        try:
+            async with session.get(f"{base_url}/health") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not start")
+
+
+async def drive(session, base_url, model, images, concurrency, duration):
+    """Closed-loop load; returns per-request latencies (ms) and error count"""
+    latencies, errors = [], 0
+    stop_at = time.perf_counter() + duration
+
+    async def client(index):
+        nonlocal errors
+        n = index
+        while time.perf_counter() < stop_at:
+            body = {"image_id": f"bench-{n}", "model_name": model, "processed_image_data": images[n % len(images)]}
+            start = time.perf_counter()
+            try:
+                async with session.post(f"{base_url}/predict", json=body) as response:
+                    result = await response.json()
+                ok = response.status == 200 and result.get("statusCode") == 200
+            except aiohttp.ClientError:
+                ok = False
+            if ok:
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                errors += 1
+            n += concurrency
+
+    await asyncio.gather(*(client(i) for i in range(concurrency)))
+    return latencies, errors
+
+
+async def run_setting(args, images, max_batch, max_wait_ms):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    process = start_server(port, max_batch, max_wait_ms)
+    try:
+        connector = aiohttp.TCPConnector(limit=args.concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await wait_ready(session, base_url, process)
+            await drive(session, base_url, args.model, images, args.concurrency, args.warmup)
+            before = await (await session.get(f"{base_url}/stats")).json()
+            start = time.perf_counter()
+            latencies, errors = await drive(session, base_url, args.model, images, args.concurrency, args.duration)
+            elapsed = time.perf_counter() - start
+            after = await (await session.get(f"{base_url}/stats")).json()
+    finally:
+        process.terminate()
+        process.wait()
+
+    batches = after["models"][args.model]["batches"] - before["models"][args.model]["batches"]
+    served = after["models"][args.model]["images"] - before["models"][args.model]["images"]
+    latencies.sort()
+    return {
+        "max_batch": max_batch,
+        "max_wait_ms": max_wait_ms,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) if latencies else None,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else None,
+        "mean_batch_size": served / batches if batches else 0
+    }
+
+
+async def run(args):
+    images = make_images(args.images)
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",") if b.strip()]
+    waits = [float(w) for w in args.waits_ms.split(",") if w.strip()]
+    settings = [(1, 0.0)] + [(b, w) for b in batch_sizes for w in waits if b > 1]
+
+    print(f"🧪 Micro-batching benchmark: {args.model}, concurrency {args.concurrency}, "
+          f"{args.duration:.0f}s per setting, {os.cpu_count()} CPU(s)\n")
+    print(f"{'max batch':>10}{'wait ms':>9}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'mean batch':>12}{'errors':>8}")
+    print("-" * 66)
+    rows = []
+    for max_batch, max_wait_ms in settings:
+        row = await run_setting(args, images, max_batch, max_wait_ms)
+        rows.append(row)
+        p50 = f"{row['p50_ms']:.1f}" if row["p50_ms"] is not None else "-"
+        p99 = f"{row['p99_ms']:.1f}" if row["p99_ms"] is not None else "-"
+        print(f"{max_batch:>10}{max_wait_ms:>9g}{row['throughput_rps']:>9.1f}{p50:>9}{p99:>9}"
+              f"{row['mean_batch_size']:>12.1f}{row['errors']:>8}")
+
+    baseline = rows[0]["throughput_rps"]
+    best = max(rows, key=lambda r: r["throughput_rps"])
+    if baseline:
+        print(f"\n   Best: batch {best['max_batch']}, wait {best['max_wait_ms']:g}ms -> "
+              f"{best['throughput_rps'] / baseline:.2f}x the unbatched throughput")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the micro-batching inference server")
+    parser.add_argument("--model", default="resnet", choices=["alexnet", "resnet", "mobilenet"])
+    parser.add_argument("--batch-sizes", default="4,8,16,32")
+    parser.add_argument("--waits-ms", default="2,5,10")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds measured per setting")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--images", type=int, default=16, help="Distinct input images")
+    parser.add_argument("--output", default="batching_benchmark_results.json")
+    args = parser.parse_args()
+
+    rows = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "model": args.model, "concurrency": args.concurrency,
+                   "duration_s": args.duration, "cpus": os.cpu_count(), "results": rows}, f, indent=2)
+    print(f"\n📄 Results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+ML inference benchmark: NumPy reference models vs Lambda memory size
+
+Lambda gives a function CPU in proportion to its memory (1 vCPU at 1769 MB,
+up to 6 vCPUs at 10240 MB). For every model and every whole-CPU count up to
+what this machine has, a fresh Python process pinned to that many cores (BLAS
+threads set to match):
+  1. loads the model from ml-inference/src/weights
+  2. runs --iterations single-image inferences
+  3. reports p50 latency and the process's peak RSS
+
+The memory table then estimates per-model latency at each memory size:
+the measurement at ceil(vCPUs) cores, divided by the vCPU fraction below one
+vCPU (a compute-bound function gets that share of one core). Sizes where
+the measured peak RSS does not fit are flagged.
+
+Example:
+    python3 bench_inference.py --memory-sizes 512,1024,1769,2048,3008,4096 --iterations 30
+"""
+
+import argparse
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+LAB_DIR = os.path.dirname(os.path.abspath(__file__))
+ML_INFERENCE_SRC = os.path.join(LAB_DIR, "workflow2-stepfunctions", "ml-inference", "src")
+MB_PER_VCPU = 1769
+MAX_VCPUS = 6
+THREAD_ENV = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+# what the mock backend sleeps, for comparison
+MOCK_SECONDS = {"alexnet": 0.1, "resnet": 0.3, "mobilenet": 0.05}
+
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_child(args):
+    sys.path.insert(0, ML_INFERENCE_SRC)
+    import numpy as np
+    from reference_models import ReferenceModel
+
+    model = ReferenceModel(args.child)
+    image = np.random.default_rng(0).integers(0, 256, size=(224, 224, 3), dtype=np.uint8)
+    model.predict(image)  # warm-up (first call faults the weights in)
+    durations = []
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        model.predict(image)
+        durations.append((time.perf_counter() - start) * 1000)
+    print(json.dumps({"p50_ms": statistics.median(durations), "mean_ms": statistics.mean(durations),
+                      "peak_rss_mb": peak_rss_mb()}))
+
+
+def available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def measure(model, cpus, iterations):
+    env = dict(os.environ, **{name: str(len(cpus)) for name in THREAD_ENV})
+    command = [sys.executable, os.path.abspath(__file__), "--child", model, "--iterations", str(iterations)]
+    preexec = (lambda: os.sched_setaffinity(0, cpus)) if hasattr(os, "sched_setaffinity") else None
+    out = subprocess.run(command, env=env, capture_output=True, text=True, check=True, preexec_fn=preexec)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ml-inference reference models")
+    parser.add_argument("--models", default="alexnet,resnet,mobilenet")
+    parser.add_argument("--memory-sizes", default="512,1024,1769,2048,3008,4096,10240", help="Lambda MB")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--output", default="inference_benchmark_results.json")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args)
+
+    models = [m.strip() for m in args.models.split(",") if m.strip()]
+    memory_sizes = [int(m) for m in args.memory_sizes.split(",") if m.strip()]
+    cpus = available_cpus()
+    needed = {min(MAX_VCPUS, math.ceil(m / MB_PER_VCPU)) for m in memory_sizes}
+    core_counts = sorted({min(n, len(cpus)) for n in needed})
+
+    print("🧪 Inference benchmark (NumPy reference models)")
+    print(f"   CPUs here: {len(cpus)}, measuring with {core_counts} core(s), {args.iterations} iterations\n")
+    print(f"{'Model':<12}{'cores':>6}{'p50 ms':>10}{'mean ms':>10}{'peak RSS MB':>13}")
+    print("-" * 51)
+    measured = {}
+    for model in models:
+        for cores in core_counts:
+            row = measure(model, cpus[:cores], args.iterations)
+            measured[(model, cores)] = row
+            print(f"{model:<12}{cores:>6}{row['p50_ms']:>10.1f}{row['mean_ms']:>10.1f}{row['peak_rss_mb']:>13.0f}")
+
+    print("\nEstimated p50 latency (ms) by Lambda memory size:")
+    print(f"{'Memory MB':<11}{'vCPUs':>7}" + "".join(f"{m:>12}" for m in models))
+    print("-" * (18 + 12 * len(models)))
+    estimates = []
+    for memory in memory_sizes:
+        vcpus = min(MAX_VCPUS, memory / MB_PER_VCPU)
+        cores = min(math.ceil(vcpus), len(cpus))
+        cells, row = [], {"memory_mb": memory, "vcpus": round(vcpus, 2), "models": {}}
+        for model in models:
+            result = measured[(model, cores)]
+            estimate = result["p50_ms"] / min(1.0, vcpus)
+            fits = result["peak_rss_mb"] < memory
+            row["models"][model] = {"p50_ms": round(estimate, 2), "fits": fits, "measured_cores": cores}
+            cells.append(f"{estimate:.1f}" if fits else "OOM")
+        estimates.append(row)
+        print(f"{memory:<11}{vcpus:>7.2f}" + "".join(f"{c:>12}" for c in cells))
+    print("   (INFERENCE_BACKEND=mock sleeps " + ", ".join(f"{m} {MOCK_SECONDS[m] * 1000:.0f}ms" for m in models
+                                                   if m in MOCK_SECONDS) + " at every size)")
+    if max(needed) > len(cpus):
+        print(f"⚠️  Only {len(cpus)} CPU(s) here: sizes above {len(cpus) * MB_PER_VCPU} MB reuse the "
+              f"{len(cpus)}-core measurement, so their estimates are pessimistic")
+
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "iterations": args.iterations, "cpus": len(cpus),
+                   "measured": [dict(v, model=m, cores=c) for (m, c), v in measured.items()],
+                   "estimates": estimates}, f, indent=2)
+    print(f"\n📄 Results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Preprocessing pipeline benchmark: reference vs fused (Workflow 2, preprocessing/src)
+
+For every input size and pipeline variant a fresh Python process:
+  1. imports the preprocessing handler module and reads a synthetic JPEG
+  2. records its peak RSS (VmHWM) as the baseline
+  3. runs the pipeline --iterations times
+  4. reports p50/mean latency and the peak RSS added by the pipeline
+
+Variants:
+  reference    full decode, grayscale, mirror, rotate, resize -> RGB JPEG (original handler)
+  fused        draft-mode grayscale decode, one transpose, one resize -> RGB JPEG
+  fused-array  same as fused but returns the uint8 array (in-process consumers)
+
+Also reports how far the fused output is from the reference (mean absolute
+pixel difference, 0-255).
+
+Example:
+    python3 bench_preprocessing.py --sizes 800x600,1920x1080,3840x2160 --iterations 20
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+LAB_DIR = os.path.dirname(os.path.abspath(__file__))
+PREPROCESSING_SRC = os.path.join(LAB_DIR, "workflow2-stepfunctions", "preprocessing", "src")
+VARIANTS = {
+    "reference": ("reference", "jpeg"),
+    "fused": ("fused", "jpeg"),
+    "fused-array": ("fused", "array"),
+}
+
+
+def load_preprocessing():
+    spec = importlib.util.spec_from_file_location("preprocessing_lambda_function",
+                                                  os.path.join(PREPROCESSING_SRC, "lambda_function.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.print = lambda *a, **k: None
+    return module
+
+
+def peak_rss_kb():
+    """
+    Peak resident set of this process. VmHWM belongs to the address space, so it
+    starts over at exec; ru_maxrss can carry the parent's peak across
+    fork+exec, so it is only the fallback (non-Linux).
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def parse_size(value):
+    width, _, height = value.lower().partition("x")
+    return int(width), int(height)
+
+
+def run_child(args):
+    """One variant on one image, in this (fresh) process; prints a JSON line."""
+    module = load_preprocessing()
+    pipeline, output = VARIANTS[args.child]
+    with open(args.image, "rb") as f:
+        image_data = f.read()
+    import numpy  # noqa: F401  (imported before the baseline so it is not counted)
+
+    baseline_kb = peak_rss_kb()
+    durations = []
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        module.preprocess_image(image_data, pipeline=pipeline, output=output)
+        durations.append((time.perf_counter() - start) * 1000)
+    peak_kb = peak_rss_kb()
+    print(json.dumps({"p50_ms": statistics.median(durations), "mean_ms": statistics.mean(durations),
+                      "peak_rss_mb": (peak_kb - baseline_kb) / 1024}))
+
+
+def measure(variant, image_path, iterations):
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", variant, "--image", image_path,
+                          "--iterations", str(iterations)], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Workflow 2 preprocessing pipelines")
+    parser.add_argument("--sizes", default="800x600,1920x1080,3840x2160", help="comma list of WIDTHxHEIGHT")
+    parser.add_argument("--variants", default=",".join(VARIANTS))
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--output", default="preprocessing_benchmark_results.json")
+    parser.add_argument("--child", choices=list(VARIANTS), help=argparse.SUPPRESS)
+    parser.add_argument("--image", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args)
+
+    sys.path.insert(0, LAB_DIR)
+    from local.image_server import make_jpeg
+
+    import numpy as np
+
+    module = load_preprocessing()
+    variants = [v.strip() for v in args.variants.split(",") if v.strip()]
+    print("🧪 Preprocessing benchmark (one fresh process per measurement)")
+    print(f"   Variants: {', '.join(variants)}, {args.iterations} iterations each\n")
+    print(f"{'Input':<12}{'Variant':<14}{'p50 ms':>10}{'mean ms':>10}{'peak MB':>10}{'speedup':>10}")
+    print("-" * 66)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in [parse_size(s) for s in args.sizes.split(",") if s.strip()]:
+            image_data = make_jpeg(*size)
+            path = os.path.join(tmp, f"{size[0]}x{size[1]}.jpg")
+            with open(path, "wb") as f:
+                f.write(image_data)
+
+            reference = module.preprocess_image(image_data, pipeline="reference", output="array").astype(np.int16)
+            fused = module.preprocess_image(image_data, pipeline="fused", output="array").astype(np.int16)
+            difference = float(np.abs(reference - fused).mean())
+
+            baseline_ms = None
+            for variant in variants:
+                row = measure(variant, path, args.iterations)
+                baseline_ms = baseline_ms or (row["p50_ms"] if variant == "reference" else None)
+                speedup = f"{baseline_ms / row['p50_ms']:.1f}x" if baseline_ms else "-"
+                label = f"{size[0]}x{size[1]}"
+                print(f"{label:<12}{variant:<14}{row['p50_ms']:>10.1f}{row['mean_ms']:>10.1f}"
+                      f"{row['peak_rss_mb']:>10.1f}{speedup:>10}")
+                results.append(dict(row, width=size[0], height=size[1], variant=variant,
+                                    jpeg_bytes=len(image_data), mean_abs_diff_vs_reference=difference))
+            print(f"{'':<12}fused vs reference: mean |pixel difference| {difference:.2f} / 255")
+
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "iterations": args.iterations, "results": results},
+                  f, indent=2)
+    print(f"\n📄 Results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
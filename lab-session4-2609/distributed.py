@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Coordinator/worker transport for distributed runs of load_test.py
+
+One Python process tops out at a few thousand requests per second (JSON
+encoding and TLS handshakes are CPU-bound), so load_test.py can split a run
+across several worker processes, on this box or on other hosts:
+
+    coordinator                                 worker (x N)
+    -----------                                 ------------
+                       <- {"type": "hello"}
+    {"type": "sync"} ->                         replies with its wall clock
+    {"type": "setup"} ->                        index/count, arrival, output, ...
+    {"type": "job"} ->                          sleeps until start_at, runs its
+                       <- {"type": "stats"}     share, returns counts + histograms
+    {"type": "stop"} ->
+
+Messages are JSON lines over a plain TCP socket. The clock offset measured
+during "sync" converts the coordinator's start time into each worker's clock,
+so all workers start within a few milliseconds of each other.
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+
+class Channel:
+    """JSON-lines connection to one peer."""
+
+    def __init__(self, sock, name=""):
+        self.sock = sock
+        self.name = name
+        self.file = sock.makefile("rw", encoding="utf-8", newline="\n")
+        self.clock_offset = 0.0  # peer clock - coordinator clock, seconds
+
+    def send(self, message):
+        self.file.write(json.dumps(message, separators=(",", ":")) + "\n")
+        self.file.flush()
+
+    def recv(self):
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError(f"worker {self.name or '?'} disconnected")
+        return json.loads(line)
+
+    def close(self):
+        try:
+            self.file.close()
+        finally:
+            self.sock.close()
+
+
+def parse_address(address, default_host="127.0.0.1"):
+    host, _, port = address.rpartition(":")
+    return host or default_host, int(port)
+
+
+class Coordinator:
+    """Accepts N workers, hands out jobs and collects their stats."""
+
+    def __init__(self, listen="127.0.0.1:0"):
+        host, port = parse_address(listen)
+        self.server = socket.create_server((host, port))
+        self.address = f"{host}:{self.server.getsockname()[1]}"
+        self.workers = []
+        self.processes = []
+
+    def spawn_local_workers(self, count, script, extra_args=()):
+        """Start `count` worker processes of `script` on this host."""
+        host, port = parse_address(self.address)
+        connect = f"{'127.0.0.1' if host in ('0.0.0.0', '') else host}:{port}"
+        for _ in range(count):
+            self.processes.append(subprocess.Popen(
+                [sys.executable, script, "--worker", connect, *extra_args],
+                stdout=subprocess.DEVNULL))
+
+    def accept(self, count, timeout=60):
+        """Wait for `count` workers to connect and measure each one's clock offset."""
+        self.server.settimeout(timeout)
+        while len(self.workers) < count:
+            try:
+                sock, peer = self.server.accept()
+            except socket.timeout:
+                raise TimeoutError(f"only {len(self.workers)} of {count} workers connected "
+                                   f"within {timeout}s")
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            channel = Channel(sock)
+            hello = channel.recv()
+            channel.name = f"{hello.get('host', peer[0])}/{hello.get('pid', '?')}"
+            channel.clock_offset = self._clock_offset(channel)
+            self.workers.append(channel)
+            print(f"   🔗 worker {len(self.workers)}/{count}: {channel.name} "
+                  f"(clock offset {channel.clock_offset * 1000:+.1f}ms)")
+        return self.workers
+
+    @staticmethod
+    def _clock_offset(channel, rounds=5):
+        """NTP-style offset estimate; keeps the sample with the smallest round trip."""
+        best_rtt, best_offset = float("inf"), 0.0
+        for _ in range(rounds):
+            t0 = time.time()
+            channel.send({"type": "sync"})
+            peer_time = channel.recv()["time"]
+            t1 = time.time()
+            if t1 - t0 < best_rtt:
+                best_rtt, best_offset = t1 - t0, peer_time - (t0 + t1) / 2
+        return best_offset
+
+    def setup(self, **settings):
+        for index, channel in enumerate(self.workers):
+            channel.send(dict(settings, type="setup", index=index, count=len(self.workers)))
+
+    def run_job(self, job, lead_time=2.0):
+        """Send one job to every worker with a common start time; return their stats messages."""
+        start_at = time.time() + lead_time
+        for channel in self.workers:
+            channel.send(dict(job, type="job", start_at=start_at + channel.clock_offset))
+        return [channel.recv() for channel in self.workers]
+
+    def close(self):
+        for channel in self.workers:
+            try:
+                channel.send({"type": "stop"})
+            except OSError:
+                pass
+            channel.close()
+        for proc in self.processes:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        self.server.close()
+
+
+def connect_worker(address, retries=30):
+    """Worker side: connect to the coordinator and introduce ourselves."""
+    host, port = parse_address(address)
+    for attempt in range(retries):
+        try:
+            sock = socket.create_connection((host, port))
+            break
+        except OSError:
+            if attempt == retries - 1:
+                raise
+            time.sleep(1)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    channel = Channel(sock)
+    channel.send({"type": "hello", "host": socket.gethostname(), "pid": os.getpid()})
+    return channel
+
+
+def worker_messages(channel):
+    """Yield setup/job messages for the worker, answering clock syncs along the way."""
+    while True:
+        try:
+            message = channel.recv()
+        except ConnectionError:
+            return
+        if message["type"] == "sync":
+            channel.send({"type": "sync", "time": time.time()})
+        elif message["type"] == "stop":
+            return
+        else:
+            yield message
+
+
+def wait_until(start_at):
+    delay = start_at - time.time()
+    if delay > 0:
+        time.sleep(delay)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Image-ID corpus for Workflow 2 load tests (load_test.py --corpus)
+
+Instead of classifying one IMAGE_ID over and over (one S3 object, one
+DynamoDB item, warm everywhere), requests sample from a pool of N images:
+
+  - uniform:    every image equally likely
+  - zipf:       image of rank k drawn with weight 1/k^s (a few hot images, long tail)
+  - sequential: each image once in turn, then wrap around
+
+Each request is tagged first-touch (the first time this run sends that image)
+or repeat-touch, and latency is recorded separately for the two. If repeats
+are clearly faster, some cache helps (Lambda container reuse, S3/DynamoDB
+hot keys, or the image cache in a fetch step).
+
+Corpus sources:
+  - a file with one image_id per line (or a JSON list)
+  - dynamodb:TABLE   scan up to N image_ids from the metadata table
+  - create           ingest N new images through Workflow 1 first
+"""
+
+import bisect
+import json
+import os
+import random
+import threading
+
+from latency_recorder import LatencyRecorder
+
+DISTRIBUTIONS = ("uniform", "zipf", "sequential")
+
+
+def load_corpus_file(path, size=None):
+    with open(path) as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        ids = json.loads(text)
+    else:
+        ids = [line.strip() for line in text.splitlines() if line.strip()]
+    return ids[:size] if size else ids
+
+
+def save_corpus_file(path, image_ids):
+    with open(path, "w") as f:
+        f.write("\n".join(image_ids) + "\n")
+
+
+def scan_dynamodb_ids(table_name, size, region=None):
+    """Up to `size` image_ids from the metadata table (projection-only scan)."""
+    import boto3
+    table = boto3.resource("dynamodb", region_name=region or os.getenv("AWS_REGION", "ap-south-1")).Table(table_name)
+    ids, kwargs = [], {"ProjectionExpression": "image_id"}
+    while len(ids) < size:
+        page = table.scan(**kwargs)
+        ids.extend(item["image_id"] for item in page.get("Items", []))
+        if "LastEvaluatedKey" not in page:
+            break
+        kwargs["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+    return ids[:size]
+
+
+class ImageCorpus:
+    """Samples image IDs and tracks first- vs repeat-touch latency."""
+
+    def __init__(self, image_ids, distribution="uniform", seed=None, zipf_s=1.1, interval_s=10):
+        if not image_ids:
+            raise ValueError("image corpus is empty")
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown corpus distribution: {distribution}")
+        self.rng = random.Random(seed)
+        # Shuffle so the hot Zipf ranks are not simply the first IDs in the file
+        self.image_ids = list(image_ids)
+        self.rng.shuffle(self.image_ids)
+        self.distribution = distribution
+        self.zipf_s = zipf_s
+        self._cumulative = None
+        if distribution == "zipf":
+            total, self._cumulative = 0.0, []
+            for rank in range(1, len(self.image_ids) + 1):
+                total += 1.0 / rank ** zipf_s
+                self._cumulative.append(total)
+        self._next = 0
+        self.touches = {}  # image_id -> times sent
+        self.lock = threading.Lock()
+        self.recorders = {"first": LatencyRecorder(interval_s), "repeat": LatencyRecorder(interval_s)}
+        self.errors = {"first": 0, "repeat": 0}
+
+    def _sample_index(self):
+        if self.distribution == "sequential":
+            index = self._next % len(self.image_ids)
+            self._next += 1
+            return index
+        if self.distribution == "zipf":
+            return bisect.bisect_left(self._cumulative, self.rng.random() * self._cumulative[-1])
+        return self.rng.randrange(len(self.image_ids))
+
+    def take(self):
+        """Return (image_id, first_touch, popularity rank starting at 1)."""
+        with self.lock:
+            index = self._sample_index()
+            image_id = self.image_ids[index]
+            seen = self.touches.get(image_id, 0)
+            self.touches[image_id] = seen + 1
+            return image_id, seen == 0, index + 1
+
+    def record(self, result):
+        """Add one annotated Workflow 2 result to the first/repeat histograms."""
+        touch = "first" if result.get("first_touch") else "repeat"
+        with self.lock:
+            if not result["success"]:
+                self.errors[touch] += 1
+                return
+            intended = result["response_time"] + max(0.0, result.get("send_lag_ms", 0.0))
+            self.recorders[touch].record(result["response_time"], result.get("sent_at", 0.0), intended)
+
+    def describe(self):
+        extra = f", s={self.zipf_s:g}" if self.distribution == "zipf" else ""
+        return f"{len(self.image_ids)} images, {self.distribution}{extra}"
+
+
+def print_corpus_report(corpus):
+    """First-touch vs repeat-touch latency and how concentrated the traffic was."""
+    print("\n" + "="*60)
+    print(f"🗂️  IMAGE CORPUS: {corpus.describe()}")
+    print("="*60)
+    total = sum(corpus.touches.values())
+    if not total:
+        print("No Workflow 2 requests sent")
+        return
+    hottest = max(corpus.touches.values())
+    print(f"Distinct images touched: {len(corpus.touches)} of {len(corpus.image_ids)}")
+    print(f"Hottest image share:     {hottest / total * 100:.1f}% of {total} requests")
+
+    summaries = {}
+    for touch in ("first", "repeat"):
+        stats = corpus.recorders[touch].corrected.summary()
+        summaries[touch] = stats
+        print(f"\n{touch.capitalize()}-touch: {stats['count']} ok, {corpus.errors[touch]} failed")
+        if stats["count"]:
+            print(f"  p50 {stats['p50']:8.1f}  p90 {stats['p90']:8.1f}  p99 {stats['p99']:8.1f}  "
+                  f"mean {stats['mean']:8.1f} ms (corrected)")
+
+    first, repeat = summaries["first"], summaries["repeat"]
+    if first["count"] and repeat["count"]:
+        delta = first["p50"] - repeat["p50"]
+        print(f"\nRepeat vs first touch: p50 {-delta:+.1f}ms ({-delta / first['p50'] * 100:+.1f}%), "
+              f"p99 {repeat['p99'] - first['p99']:+.1f}ms")
+        if delta > 0.1 * first["p50"]:
+            print("  → repeats are noticeably faster: some layer is caching per image")
+        else:
+            print("  → no clear per-image cache effect")
+    print("="*60)
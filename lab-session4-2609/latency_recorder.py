@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Shared latency recorder for the DS252 load-testing tools
+
+LatencyHistogram is a fixed-memory, log-bucketed histogram (HdrHistogram
+style): every value lands in a bucket whose width is ~1% of its magnitude,
+so memory is bounded by the bucket count (~2,200 buckets from 1 µs to 1 h)
+no matter how many requests are recorded, and two histograms merge by adding
+counts.
+
+LatencyRecorder keeps two histograms per stream:
+  - service:   latency measured from the actual send time
+  - corrected: latency measured from the *intended* send time, which
+               includes time a request spent waiting to be sent. This is the
+               coordinated-omission correction: a stalled server also
+               delays the requests queued behind it, and those delays must
+               count.
+plus interval histograms of the corrected latency every N seconds.
+
+Used by lab-session4-2609/load_test.py and lab-session6-1710/benchmark.py.
+"""
+
+import math
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram (values in ms) with ~1% relative precision."""
+
+    def __init__(self, lowest_ms=0.001, highest_ms=3_600_000, precision=0.01):
+        self.lowest_ms = lowest_ms
+        self.highest_ms = highest_ms
+        self.precision = precision
+        self._log_base = math.log1p(precision)
+        self.max_index = self._index(highest_ms)
+        self.counts = {}  # bucket index -> count (sparse, at most max_index + 1 keys)
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def _index(self, value_ms):
+        if value_ms <= self.lowest_ms:
+            return 0
+        return int(math.log(value_ms / self.lowest_ms) / self._log_base)
+
+    def _bucket_value(self, index):
+        """Representative (geometric midpoint) value of a bucket."""
+        return self.lowest_ms * math.exp((index + 0.5) * self._log_base)
+
+    def record(self, value_ms, count=1):
+        value_ms = min(max(value_ms, 0.0), self.highest_ms)
+        index = self._index(value_ms)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.count += count
+        self.total += value_ms * count
+        self.total_sq += value_ms * value_ms * count
+        self.min = min(self.min, value_ms)
+        self.max = max(self.max, value_ms)
+
+    def record_corrected(self, value_ms, expected_interval_ms):
+        """
+        Record a value measured by a closed-loop client that meant to send every
+        expected_interval_ms, back-filling the requests that a slow response
+        prevented from being sent (value - interval, value - 2*interval, ...).
+        """
+        self.record(value_ms)
+        if not expected_interval_ms or expected_interval_ms <= 0:
+            return
+        missing = value_ms - expected_interval_ms
+        while missing >= expected_interval_ms:
+            self.record(missing)
+            missing -= expected_interval_ms
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def snapshot(self):
+        return LatencyHistogram.from_dict(self.to_dict())
+
+    def percentile(self, pct):
+        if not self.count:
+            return 0.0
+        target = max(1, math.ceil(pct / 100.0 * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                # never report beyond what was actually observed
+                return min(max(self._bucket_value(index), self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def stddev(self):
+        if not self.count:
+            return 0.0
+        return math.sqrt(max(0.0, self.total_sq / self.count - self.mean ** 2))
+
+    def summary(self):
+        stats = {"count": self.count,
+                 "min": round(self.min, 2) if self.count else 0.0,
+                 "mean": round(self.mean, 2),
+                 "stddev": round(self.stddev, 2)}
+        for pct in PERCENTILES:
+            stats[f"p{pct:g}"] = round(self.percentile(pct), 2)
+        stats["max"] = round(self.max, 2)
+        return stats
+
+    def to_dict(self):
+        """JSON-serialisable form; from_dict(to_dict()) round-trips exactly."""
+        return {"lowest_ms": self.lowest_ms, "highest_ms": self.highest_ms,
+                "precision": self.precision,
+                "counts": {str(i): c for i, c in self.counts.items()},
+                "count": self.count, "total": self.total, "total_sq": self.total_sq,
+                "min": self.min if self.count else None, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        hist = cls(data["lowest_ms"], data["highest_ms"], data["precision"])
+        hist.counts = {int(i): c for i, c in data["counts"].items()}
+        hist.count = data["count"]
+        hist.total = data["total"]
+        hist.total_sq = data["total_sq"]
+        hist.min = data["min"] if data["min"] is not None else math.inf
+        hist.max = data["max"]
+        return hist
+
+
+class LatencyRecorder:
+    """Service + coordinated-omission-corrected histograms and per-interval snapshots for one stream."""
+
+    def __init__(self, interval_s=10, expected_interval_ms=None):
+        self.interval_s = interval_s
+        self.expected_interval_ms = expected_interval_ms
+        self.service = LatencyHistogram()
+        self.corrected = LatencyHistogram()
+        self.intervals = {}  # interval index -> LatencyHistogram of corrected latency
+
+    def record(self, latency_ms, t_s=0.0, intended_latency_ms=None):
+        """
+        latency_ms:          measured from the actual send time
+        t_s:                 when the request was sent, seconds from test start
+        intended_latency_ms: measured from the scheduled send time, if the client
+                             knows its schedule (open-loop); otherwise corrected
+                             values are back-filled from expected_interval_ms
+        """
+        self.service.record(latency_ms)
+        interval = self.intervals.setdefault(int(t_s // self.interval_s), LatencyHistogram())
+        for hist in (self.corrected, interval):
+            if intended_latency_ms is not None:
+                hist.record(max(intended_latency_ms, latency_ms))
+            else:
+                hist.record_corrected(latency_ms, self.expected_interval_ms)
+
+    def merge(self, other):
+        self.service.merge(other.service)
+        self.corrected.merge(other.corrected)
+        for index, hist in other.intervals.items():
+            self.intervals.setdefault(index, LatencyHistogram()).merge(hist)
+        return self
+
+    def interval_summaries(self):
+        """[(interval start s, corrected summary), ...] in time order."""
+        return [(index * self.interval_s, self.intervals[index].summary())
+                for index in sorted(self.intervals)]
+
+    def to_dict(self):
+        return {"interval_s": self.interval_s, "expected_interval_ms": self.expected_interval_ms,
+                "service": self.service.to_dict(), "corrected": self.corrected.to_dict(),
+                "intervals": {str(i): h.to_dict() for i, h in self.intervals.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        recorder = cls(data["interval_s"], data["expected_interval_ms"])
+        recorder.service = LatencyHistogram.from_dict(data["service"])
+        recorder.corrected = LatencyHistogram.from_dict(data["corrected"])
+        recorder.intervals = {int(i): LatencyHistogram.from_dict(h) for i, h in data["intervals"].items()}
+        return recorder
+
+    def snapshot(self):
+        return LatencyRecorder.from_dict(self.to_dict())
+
+
+def format_summary(label, stats):
+    """One line of p50/p90/p99/p99.9/max for printing."""
+    return (f"{label:<11} p50 {stats['p50']:8.1f}  p90 {stats['p90']:8.1f}  p99 {stats['p99']:8.1f}  "
+            f"p99.9 {stats['p99.9']:8.1f}  max {stats['max']:8.1f} ms")
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Declarative load profiles and saturation search for load_test.py
+
+A profile is a JSON object (or a list of them, run back to back):
+
+    {"type": "ramp",  "start_rps": 1, "end_rps": 50, "duration": 120}
+    {"type": "step",  "start_rps": 5, "step_rps": 5, "steps": 6, "step_duration": 30}
+    {"type": "spike", "base_rps": 5, "spike_rps": 50, "duration": 90,
+                      "spike_at": 30, "spike_duration": 10}
+    {"type": "soak",  "rps": 10, "duration": 3600}
+
+Every profile is compiled to piecewise-linear rate segments, and send times
+are produced by inverting the cumulative rate Λ(t): unit steps of Λ give
+evenly paced ("constant") arrivals, Exp(1) steps give a non-homogeneous
+Poisson process.
+
+run_saturation_search() raises the arrival rate step by step until the
+corrected p99, the error rate or the achieved throughput breaks a threshold,
+then bisects between the last good and first bad rate.
+"""
+
+import json
+import math
+import os
+import random
+
+
+# ---------- Profiles ----------
+
+def _segments(profile):
+    """Compile one profile into [(duration_s, start_rps, end_rps), ...]."""
+    kind = profile.get("type")
+    if kind == "ramp":
+        return [(profile["duration"], profile["start_rps"], profile["end_rps"])]
+    if kind == "step":
+        if "levels" in profile:
+            return [(level["duration"], level["rps"], level["rps"]) for level in profile["levels"]]
+        return [(profile["step_duration"], rps, rps)
+                for rps in (profile["start_rps"] + i * profile["step_rps"] for i in range(profile["steps"]))]
+    if kind == "spike":
+        base, spike = profile["base_rps"], profile["spike_rps"]
+        before = profile["spike_at"]
+        after = profile["duration"] - before - profile["spike_duration"]
+        segments = [(before, base, base), (profile["spike_duration"], spike, spike), (after, base, base)]
+        return [s for s in segments if s[0] > 0]
+    if kind == "soak":
+        return [(profile["duration"], profile["rps"], profile["rps"])]
+    if kind == "constant":
+        return [(profile["duration"], profile["rps"], profile["rps"])]
+    raise ValueError(f"Unknown load profile type: {kind}")
+
+
+def compile_profile(profile):
+    """Profile dict or list of dicts -> rate segments."""
+    profiles = profile if isinstance(profile, list) else [profile]
+    return [segment for p in profiles for segment in _segments(p)]
+
+
+def load_profile(spec):
+    """Accept a path to a JSON file or an inline JSON string."""
+    if os.path.exists(spec):
+        with open(spec) as f:
+            return json.load(f)
+    return json.loads(spec)
+
+
+def profile_duration(profile):
+    return sum(d for d, _, _ in compile_profile(profile))
+
+
+def describe_profile(profile):
+    segments = compile_profile(profile)
+    peak = max(max(r0, r1) for _, r0, r1 in segments)
+    expected = sum(d * (r0 + r1) / 2 for d, r0, r1 in segments)
+    return f"{len(segments)} segment(s), {profile_duration(profile):.0f}s, peak {peak:g} RPS, ~{expected:.0f} requests"
+
+
+def _invert_segment(target, duration, r0, r1):
+    """Time τ within a linear-rate segment where ∫₀^τ r(t) dt == target."""
+    slope = (r1 - r0) / duration
+    if abs(slope) < 1e-12:
+        return target / r0 if r0 > 0 else 0.0
+    # r0·τ + slope·τ²/2 = target  ->  positive root
+    disc = r0 * r0 + 2 * slope * target
+    return (-r0 + math.sqrt(max(disc, 0.0))) / slope
+
+
+def profile_schedule(profile, arrival="constant", seed=None, rate_scale=1.0, phase=0.0):
+    """
+    Yield send offsets (s from start) following the profile's rate over time.
+    rate_scale/phase split one profile across N workers: each runs rate_scale=1/N
+    with phase=i/N, so constant arrivals interleave instead of firing together.
+    """
+    rng = random.Random(seed)
+
+    def step():
+        return rng.expovariate(1.0) if arrival == "poisson" else 1.0
+
+    offset = 0.0
+    need = step() if arrival == "poisson" else phase  # first constant-mode request fires at t=0
+    for duration, r0, r1 in compile_profile(profile):
+        r0, r1 = r0 * rate_scale, r1 * rate_scale
+        mass = duration * (r0 + r1) / 2  # expected requests in this segment
+        used = 0.0
+        while need < mass - used:
+            used += need
+            yield offset + _invert_segment(used, duration, r0, r1)
+            need = step()
+        need -= mass - used
+        offset += duration
+
+
+# ---------- Saturation search ----------
+
+def _step_ok(step, p99_max_ms, max_error_rate, min_throughput_ratio):
+    reasons = []
+    if step["p99_ms"] > p99_max_ms:
+        reasons.append(f"p99 {step['p99_ms']:.0f}ms > {p99_max_ms:.0f}ms")
+    if step["error_rate"] > max_error_rate:
+        reasons.append(f"errors {step['error_rate'] * 100:.1f}% > {max_error_rate * 100:.1f}%")
+    if step["achieved_rps"] < min_throughput_ratio * step["offered_rps"]:
+        reasons.append(f"throughput {step['achieved_rps']:.1f} < {min_throughput_ratio:.0%} of offered")
+    return not reasons, reasons
+
+
+def run_saturation_search(run_step, start_rps=1.0, step_factor=1.5, max_rps=1000.0,
+                          step_duration=30, p99_max_ms=5000, max_error_rate=0.01,
+                          min_throughput_ratio=0.9, refine_steps=2):
+    """
+    run_step(rps, duration) must return a dict with offered_rps, achieved_rps,
+    p50_ms, p99_ms and error_rate for one constant-rate step.
+    Returns {"curve": [...], "max_sustainable_rps": float, "limit": [reasons]}.
+    """
+    curve = []
+    last_good, first_bad, limit = None, None, ["max_rps reached"]
+
+    def measure(rps):
+        step = run_step(rps, step_duration)
+        ok, reasons = _step_ok(step, p99_max_ms, max_error_rate, min_throughput_ratio)
+        step.update(ok=ok, violations=reasons)
+        curve.append(step)
+        status = "✅" if ok else "❌"
+        print(f"   {status} {rps:8.2f} RPS offered -> {step['achieved_rps']:8.2f} achieved, "
+              f"p50 {step['p50_ms']:.0f}ms, p99 {step['p99_ms']:.0f}ms, errors {step['error_rate'] * 100:.1f}%"
+              + (f"  ({'; '.join(reasons)})" if reasons else ""))
+        return ok, reasons
+
+    rps = start_rps
+    while rps <= max_rps:
+        ok, reasons = measure(rps)
+        if not ok:
+            first_bad, limit = rps, reasons
+            break
+        last_good = rps
+        rps *= step_factor
+
+    # Bisect between the last good and the first bad rate
+    if last_good is not None and first_bad is not None:
+        low, high = last_good, first_bad
+        for _ in range(refine_steps):
+            mid = (low + high) / 2
+            ok, reasons = measure(mid)
+            if ok:
+                low = mid
+            else:
+                high, limit = mid, reasons
+        last_good = low
+
+    return {
+        "curve": sorted(curve, key=lambda s: s["offered_rps"]),
+        "max_sustainable_rps": last_good or 0.0,
+        "limit": limit,
+    }
+
+
+def plot_saturation_curves(searches, filename="saturation_curve.png"):
+    """Throughput-vs-latency plot per workflow (skipped if matplotlib is not installed)."""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("⚠️  matplotlib not installed; skipping saturation plot")
+        return None
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    for name, search in searches.items():
+        curve = search["curve"]
+        x = [s["achieved_rps"] for s in curve]
+        ax.plot(x, [s["p99_ms"] for s in curve], "o-", label=f"{name} p99")
+        ax.plot(x, [s["p50_ms"] for s in curve], "s--", alpha=0.6, label=f"{name} p50")
+        if search["max_sustainable_rps"]:
+            ax.axvline(search["max_sustainable_rps"], linestyle=":", alpha=0.5)
+    ax.set_xlabel("Achieved throughput (RPS)")
+    ax.set_ylabel("Latency, corrected (ms)")
+    ax.set_yscale("log")
+    ax.set_title("Throughput vs latency (saturation search)")
+    ax.grid(True, alpha=0.3)
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(filename, dpi=150)
+    plt.close(fig)
+    return filename
@@ -1,235 +1,527 @@
 #!/usr/bin/env python3
 """
 Simple Python Load Test Client for Serverless Workflows
-1 RPS for 30 seconds for both Workflow 1 and Workflow 2
+1 RPS for 30 seconds for both Workflow 1 and Workflow 2 by default
+
+Requests are sent open-loop (see open_loop.py): arrivals follow a constant or
+Poisson schedule independent of response times, so the target rate holds even
+when latency exceeds the inter-arrival gap.
+
+With --processes/--remote-workers the load is split across worker processes
+(see distributed.py) and their histograms are merged into one summary.
 """
 
-import requests
+import argparse
+import asyncio
 import json
 import time
 import threading
 import sys
 import os
+from collections import Counter
 from datetime import datetime
-import statistics
+
+from distributed import Coordinator, connect_worker, wait_until, worker_messages
+from image_corpus import (DISTRIBUTIONS, ImageCorpus, load_corpus_file, print_corpus_report,
+                          save_corpus_file, scan_dynamodb_ids)
+from latency_recorder import LatencyRecorder, format_summary
+from load_profiles import (compile_profile, describe_profile, load_profile, plot_saturation_curves,
+                           profile_schedule, profile_duration, run_saturation_search)
+from mixed_workload import FreshImagePool, extract_image_id, print_mixed_report
+from open_loop import ARRIVALS, OpenLoopEngine, make_schedule
+from result_sink import iter_results, open_sink
+
+# Image URLs sent to Workflow 1 (local_harness.py serves a stand-in for picsum.photos)
+IMAGE_SOURCE_URL = os.getenv('IMAGE_SOURCE_URL', 'https://picsum.photos')
+
+WORKFLOW_NAMES = {"1": "Workflow 1 (Ingestion)", "2": "Workflow 2 (Classification)"}
 
 class LoadTester:
-    def __init__(self):
-        self.results = []
+    def __init__(self, arrival="constant", max_concurrency=256, seed=None, interval_s=10, sink=None,
+                 worker_index=0, worker_count=1):
+        # Detailed results stream to the sink (see result_sink.py) instead of piling up in memory
+        self.sink = sink
         self.lock = threading.Lock()
+        self.arrival = arrival
+        self.max_concurrency = max_concurrency
+        self.seed = seed
+        self.interval_s = interval_s
+        # In a distributed run this process sends 1/worker_count of the load
+        self.worker_index = worker_index
+        self.worker_count = worker_count
+        # Per-workflow latency histograms and counters (fixed memory, see latency_recorder.py)
+        self.recorders = {}
+        self.counts = {}
+        self.image_pool = None  # set by test_mixed
+    
+    def record_result(self, result, body=None):
+        """Callback for the load engine: store one request result"""
+        with self.lock:
+            self._account(result)
+        if self.sink:
+            self.sink.write(result)
+    
+    def _account(self, result):
+        workflow = result["workflow"]
+        counts = self.counts.setdefault(workflow, {"total": 0, "successful": 0, "errors": Counter()})
+        counts["total"] += 1
+        if result["error"]:
+            counts["errors"][result["error"]] += 1
+        if not result["success"]:
+            return
+        counts["successful"] += 1
+        recorder = self.recorders.setdefault(workflow, LatencyRecorder(self.interval_s))
+        # Latency from the intended send time corrects for coordinated omission
+        intended = result["response_time"] + max(0.0, result.get("send_lag_ms", 0.0))
+        recorder.record(result["response_time"], result.get("sent_at", 0.0), intended)
+    
+    def export_stats(self):
+        """Counts and histograms in JSON form (summary file, worker -> coordinator)"""
+        with self.lock:
+            return {
+                "counts": {w: dict(c, errors=dict(c["errors"])) for w, c in self.counts.items()},
+                "latency_histograms": {w: r.to_dict() for w, r in self.recorders.items()}
+            }
+    
+    def merge_stats(self, stats):
+        """Add another tester's export_stats() into this one"""
+        with self.lock:
+            for workflow, other in stats["counts"].items():
+                counts = self.counts.setdefault(workflow, {"total": 0, "successful": 0, "errors": Counter()})
+                counts["total"] += other["total"]
+                counts["successful"] += other["successful"]
+                counts["errors"].update(other["errors"])
+            for workflow, data in stats["latency_histograms"].items():
+                recorder = self.recorders.setdefault(workflow, LatencyRecorder(self.interval_s))
+                recorder.merge(LatencyRecorder.from_dict(data))
+    
+    def _prepare_run(self, duration, rps, timeout, profile=None, on_result=None, rate_scale=1.0):
+        """Engine and arrival schedule for one stream; rate_scale multiplies the rate (mixed mode ratios)"""
+        seed = self.seed
+        if self.worker_count > 1:
+            # Take this worker's share: 1/N of the rate, phase-shifted so constant arrivals interleave
+            if profile is None:
+                profile = {"type": "constant", "rps": rps, "duration": duration}
+            if seed is not None:
+                seed += self.worker_index
+        if profile is not None:
+            scale = rate_scale / self.worker_count
+            schedule = profile_schedule(profile, self.arrival, seed, rate_scale=scale,
+                                        phase=self.worker_index / self.worker_count)
+            peak_rps = max(max(r0, r1) for _, r0, r1 in compile_profile(profile)) * scale
+        else:
+            schedule = make_schedule(self.arrival, rps * rate_scale, duration, seed)
+            peak_rps = rps * rate_scale
+        engine = OpenLoopEngine(on_result or self.record_result, max_concurrency=self.max_concurrency,
+                                timeout=timeout, verbose=peak_rps <= 10)
+        return engine, schedule
     
-    def test_workflow1(self, api_endpoint, duration=30, rps=1):
+    def run_open_loop(self, workflow, url, payload_fn, duration, rps, timeout, profile=None, on_result=None):
+        """Drive one endpoint open-loop: requests go out on schedule, not after the previous reply"""
+        engine, schedule = self._prepare_run(duration, rps, timeout, profile, on_result)
+        return asyncio.run(engine.run(workflow, url, payload_fn, schedule))
+    
+    def workflow1_target(self, api_endpoint):
+        """URL, payload builder and timeout for Workflow 1"""
+        # Prepare request - check if endpoint already has /ingest
+        if api_endpoint.endswith('/ingest'):
+            url = api_endpoint
+        else:
+            url = f"{api_endpoint}/ingest"
+        
+        def payload(request_id):
+            return {
+                "image_url": f"{IMAGE_SOURCE_URL}/800/600?random={int(time.time() * 1000)}{request_id}"
+            }
+        
+        return url, payload, 30
+    
+    def workflow2_target(self, api_endpoint, image_id):
+        """URL, payload builder and timeout for Workflow 2"""
+        # Prepare request - check if endpoint already has /classify
+        if api_endpoint.endswith('/classify'):
+            url = api_endpoint
+        else:
+            url = f"{api_endpoint}/classify"
+        
+        # Longer timeout for Step Functions
+        return url, lambda request_id: {"image_id": image_id}, 300
+    
+    def _describe_load(self, duration, rps, profile):
+        if profile is not None:
+            return f"   Profile: {describe_profile(profile)} ({self.arrival}, max {self.max_concurrency} in flight)"
+        return f"   Duration: {duration}s, Rate: {rps} RPS ({self.arrival}, max {self.max_concurrency} in flight)"
+    
+    def test_workflow1(self, api_endpoint, duration=30, rps=1, profile=None):
         """Test Workflow 1 - Image Ingestion"""
         print(f"\n🚀 Starting Workflow 1 Load Test")
-        print(f"   Duration: {duration}s, Rate: {rps} RPS")
+        print(self._describe_load(duration, rps, profile))
         print(f"   Endpoint: {api_endpoint}")
         
-        interval = 1.0 / rps
-        start_time = time.time()
-        request_count = 0
-        
-        while time.time() - start_time < duration:
-            request_start = time.time()
-            
-            # Prepare request - check if endpoint already has /ingest
-            if api_endpoint.endswith('/ingest'):
-                url = api_endpoint
-            else:
-                url = f"{api_endpoint}/ingest"
-            payload = {
-                "image_url": f"https://picsum.photos/800/600?random={int(time.time() * 1000)}"
-            }
-            headers = {"Content-Type": "application/json"}
-            
-            try:
-                # Make request
-                response = requests.post(url, json=payload, headers=headers, timeout=30)
-                request_end = time.time()
-                
-                # Record result
-                result = {
-                    "workflow": "1",
-                    "request_id": request_count + 1,
-                    "timestamp": datetime.now().isoformat(),
-                    "status_code": response.status_code,
-                    "response_time": round((request_end - request_start) * 1000, 2),  # ms
-                    "success": response.status_code == 200,
-                    "error": None if response.status_code == 200 else response.text[:100]
-                }
-                
-                with self.lock:
-                    self.results.append(result)
-                
-                # Print progress
-                status = "✅" if result["success"] else "❌"
-                print(f"   {status} Request {request_count + 1}: {result['response_time']}ms")
-                
-            except Exception as e:
-                request_end = time.time()
-                result = {
-                    "workflow": "1",
-                    "request_id": request_count + 1,
-                    "timestamp": datetime.now().isoformat(),
-                    "status_code": 0,
-                    "response_time": round((request_end - request_start) * 1000, 2),
-                    "success": False,
-                    "error": str(e)[:100]
-                }
-                
-                with self.lock:
-                    self.results.append(result)
-                
-                print(f"   ❌ Request {request_count + 1}: Error - {str(e)[:50]}")
-            
-            request_count += 1
-            
-            # Wait for next request (maintain 1 RPS)
-            elapsed = time.time() - request_start
-            sleep_time = max(0, interval - elapsed)
-            if sleep_time > 0:
-                time.sleep(sleep_time)
-        
+        url, payload, timeout = self.workflow1_target(api_endpoint)
+        request_count = self.run_open_loop("1", url, payload, duration, rps, timeout, profile)
         print(f"✅ Workflow 1 test completed: {request_count} requests")
     
-    def test_workflow2(self, api_endpoint, image_id, duration=30, rps=1):
+    def test_workflow2(self, api_endpoint, image_id, duration=30, rps=1, profile=None, corpus=None):
         """Test Workflow 2 - Classification Pipeline"""
         print(f"\n🚀 Starting Workflow 2 Load Test")
-        print(f"   Duration: {duration}s, Rate: {rps} RPS")
+        print(self._describe_load(duration, rps, profile))
         print(f"   Endpoint: {api_endpoint}")
-        print(f"   Image ID: {image_id}")
-        
-        interval = 1.0 / rps
-        start_time = time.time()
-        request_count = 0
+        if corpus:
+            print(f"   Image corpus: {corpus.describe()}")
+        else:
+            print(f"   Image ID: {image_id}")
         
-        while time.time() - start_time < duration:
-            request_start = time.time()
-            
-            # Prepare request - check if endpoint already has /classify
-            if api_endpoint.endswith('/classify'):
-                url = api_endpoint
-            else:
-                url = f"{api_endpoint}/classify"
-            payload = {"image_id": image_id}
-            headers = {"Content-Type": "application/json"}
-            
-            try:
-                # Make request (longer timeout for Step Functions)
-                response = requests.post(url, json=payload, headers=headers, timeout=300)
-                request_end = time.time()
-                
-                # Record result
-                result = {
-                    "workflow": "2",
-                    "request_id": request_count + 1,
-                    "timestamp": datetime.now().isoformat(),
-                    "status_code": response.status_code,
-                    "response_time": round((request_end - request_start) * 1000, 2),  # ms
-                    "success": response.status_code == 200,
-                    "error": None if response.status_code == 200 else response.text[:100]
-                }
-                
-                with self.lock:
-                    self.results.append(result)
-                
-                # Print progress
-                status = "✅" if result["success"] else "❌"
-                print(f"   {status} Request {request_count + 1}: {result['response_time']}ms")
-                
-            except Exception as e:
-                request_end = time.time()
-                result = {
-                    "workflow": "2",
-                    "request_id": request_count + 1,
-                    "timestamp": datetime.now().isoformat(),
-                    "status_code": 0,
-                    "response_time": round((request_end - request_start) * 1000, 2),
-                    "success": False,
-                    "error": str(e)[:100]
-                }
-                
-                with self.lock:
-                    self.results.append(result)
-                
-                print(f"   ❌ Request {request_count + 1}: Error - {str(e)[:50]}")
+        url, payload, timeout = self.workflow2_target(api_endpoint, image_id)
+        on_result = None
+        if corpus:
+            picks = {}  # request_id -> sampled image
             
-            request_count += 1
+            def payload(request_id):
+                sampled_id, first_touch, rank = corpus.take()
+                picks[request_id] = {"image_id": sampled_id, "first_touch": first_touch, "image_rank": rank}
+                return {"image_id": sampled_id}
             
-            # Wait for next request (maintain 1 RPS)
-            elapsed = time.time() - request_start
-            sleep_time = max(0, interval - elapsed)
-            if sleep_time > 0:
-                time.sleep(sleep_time)
+            def on_result(result, body=None):
+                result.update(picks.pop(result["request_id"], {}))
+                corpus.record(result)
+                self.record_result(result, body)
         
+        request_count = self.run_open_loop("2", url, payload, duration, rps, timeout, profile, on_result)
         print(f"✅ Workflow 2 test completed: {request_count} requests")
     
+    def ingest_corpus(self, api_endpoint, size, rps=2):
+        """Create `size` fresh images through Workflow 1 and return their IDs"""
+        print(f"\n📥 Creating a corpus of {size} images via Workflow 1 ({rps:g} RPS)")
+        url, payload, timeout = self.workflow1_target(api_endpoint)
+        image_ids = []
+        
+        def on_result(result, body=None):
+            image_id = extract_image_id(body)
+            if image_id:
+                image_ids.append(image_id)
+        
+        self.run_open_loop("1", url, payload, size / rps, rps, timeout, on_result=on_result)
+        print(f"   {len(image_ids)} of {size} ingestions succeeded")
+        return image_ids
+    
+    def test_mixed(self, workflow1_api, workflow2_api, fallback_image_id, duration=30, rps=1, profile=None,
+                   wf2_rps=None, wf2_ratio=None):
+        """Run Workflow 1 and Workflow 2 concurrently; Workflow 2 classifies images Workflow 1 just created"""
+        # Workflow 2 rate: ratio-linked to Workflow 1 (follows its profile), or an independent constant rate
+        if wf2_ratio is None and wf2_rps is None:
+            wf2_ratio = 1.0
+        if wf2_ratio is not None:
+            wf2_profile, wf2_base_rps, wf2_scale = profile, rps, wf2_ratio
+            wf2_label = f"{wf2_ratio:g} x Workflow 1"
+        else:
+            wf2_profile, wf2_base_rps, wf2_scale = None, wf2_rps, 1.0
+            wf2_label = f"{wf2_rps:g} RPS"
+        
+        print(f"\n🚀 Starting Mixed Load Test (Workflow 1 + Workflow 2 concurrently)")
+        print(self._describe_load(duration, rps, profile))
+        print(f"   Workflow 2 rate: {wf2_label}")
+        print(f"   Endpoints: {workflow1_api} | {workflow2_api}")
+        
+        self.image_pool = FreshImagePool(fallback_image_id, seed=self.seed)
+        picks = {}  # Workflow 2 request_id -> image it was sent
+        
+        def on_ingest(result, body=None):
+            image_id = extract_image_id(body)
+            if image_id:
+                self.image_pool.add(image_id)
+            result["image_id"] = image_id
+            self.record_result(result, body)
+        
+        def classify_payload(request_id):
+            image_id, source, age_ms = self.image_pool.take()
+            picks[request_id] = {"image_id": image_id, "image_source": source, "image_age_ms": age_ms}
+            return {"image_id": image_id}
+        
+        def on_classify(result, body=None):
+            result.update(picks.pop(result["request_id"], {}))
+            self.record_result(result, body)
+        
+        url1, payload1, timeout1 = self.workflow1_target(workflow1_api)
+        url2, _, timeout2 = self.workflow2_target(workflow2_api, fallback_image_id)
+        engine1, schedule1 = self._prepare_run(duration, rps, timeout1, profile, on_ingest)
+        engine2, schedule2 = self._prepare_run(duration, wf2_base_rps, timeout2, wf2_profile, on_classify,
+                                               rate_scale=wf2_scale)
+        
+        async def run_both():
+            return await asyncio.gather(engine1.run("1", url1, payload1, schedule1),
+                                        engine2.run("2", url2, classify_payload, schedule2))
+        
+        sent1, sent2 = asyncio.run(run_both())
+        print(f"✅ Mixed test completed: {sent1} Workflow 1 + {sent2} Workflow 2 requests")
+    
+    def measure_step(self, workflow, url, payload_fn, rps, duration, timeout):
+        """Run one constant-rate step and return its throughput/latency point"""
+        step_recorder = LatencyRecorder(self.interval_s)
+        step_counts = {"total": 0, "errors": 0}
+        
+        def on_result(result, body=None):
+            self.record_result(result, body)
+            with self.lock:
+                step_counts["total"] += 1
+                if not result["success"]:
+                    step_counts["errors"] += 1
+                    return
+                intended = result["response_time"] + max(0.0, result["send_lag_ms"])
+                step_recorder.record(result["response_time"], result["sent_at"], intended)
+        
+        self.run_open_loop(workflow, url, payload_fn, duration, rps, timeout, on_result=on_result)
+        corrected = step_recorder.corrected.summary()
+        return {
+            "offered_rps": round(rps, 3),
+            "achieved_rps": round(step_recorder.corrected.count / duration, 3),
+            "requests": step_counts["total"],
+            "error_rate": step_counts["errors"] / step_counts["total"] if step_counts["total"] else 1.0,
+            "p50_ms": corrected["p50"],
+            "p90_ms": corrected["p90"],
+            "p99_ms": corrected["p99"],
+            "max_ms": corrected["max"],
+        }
+    
+    def saturation_search(self, workflow, url, payload_fn, timeout, **search_args):
+        """Raise the arrival rate until p99/error/throughput thresholds break"""
+        print(f"\n🔍 Saturation search: {WORKFLOW_NAMES.get(workflow, workflow)}")
+        print(f"   Endpoint: {url}")
+        return run_saturation_search(
+            lambda rps, duration: self.measure_step(workflow, url, payload_fn, rps, duration, timeout),
+            **search_args)
+    
     def print_summary(self):
         """Print test results summary"""
-        if not self.results:
+        if not self.counts:
             print("\n❌ No results to summarize")
             return
         
-        # Separate results by workflow
-        wf1_results = [r for r in self.results if r["workflow"] == "1"]
-        wf2_results = [r for r in self.results if r["workflow"] == "2"]
-        
         print("\n" + "="*60)
         print("📊 LOAD TEST RESULTS SUMMARY")
         print("="*60)
         
-        for workflow, results in [("Workflow 1 (Ingestion)", wf1_results), 
-                                 ("Workflow 2 (Classification)", wf2_results)]:
-            if not results:
-                continue
-                
+        for workflow_id, counts in sorted(self.counts.items()):
+            workflow = WORKFLOW_NAMES.get(workflow_id, f"Workflow {workflow_id}")
             print(f"\n🔹 {workflow}")
             print("-" * 40)
             
             # Calculate metrics
-            total_requests = len(results)
-            successful_requests = len([r for r in results if r["success"]])
+            total_requests = counts["total"]
+            successful_requests = counts["successful"]
             failed_requests = total_requests - successful_requests
             success_rate = (successful_requests / total_requests) * 100 if total_requests > 0 else 0
             
-            response_times = [r["response_time"] for r in results if r["success"]]
-            
             print(f"Total Requests:     {total_requests}")
             print(f"Successful:         {successful_requests}")
             print(f"Failed:             {failed_requests}")
             print(f"Success Rate:       {success_rate:.1f}%")
             
-            if response_times:
-                print(f"Avg Response Time:  {statistics.mean(response_times):.1f}ms")
-                print(f"Min Response Time:  {min(response_times):.1f}ms")
-                print(f"Max Response Time:  {max(response_times):.1f}ms")
-                print(f"Med Response Time:  {statistics.median(response_times):.1f}ms")
+            recorder = self.recorders.get(workflow_id)
+            if recorder:
+                service = recorder.service.summary()
+                corrected = recorder.corrected.summary()
+                print(f"Avg Response Time:  {service['mean']:.1f}ms")
+                print(f"Min Response Time:  {service['min']:.1f}ms")
+                print(f"Max Response Time:  {service['max']:.1f}ms")
+                print(f"Med Response Time:  {service['p50']:.1f}ms")
+                print(format_summary("Service", service))
+                print(format_summary("Corrected", corrected))
+                
+                intervals = recorder.interval_summaries()
+                if len(intervals) > 1:
+                    print(f"\nPer {recorder.interval_s}s interval (corrected):")
+                    for start, stats in intervals:
+                        print(f"  {start:6.0f}s  n={stats['count']:<6} p50 {stats['p50']:8.1f}  "
+                              f"p99 {stats['p99']:8.1f}  max {stats['max']:8.1f} ms")
             
             # Show errors if any
-            errors = [r["error"] for r in results if r["error"]]
-            if errors:
+            if counts["errors"]:
                 print(f"\nErrors encountered:")
-                for error in set(errors):
-                    count = errors.count(error)
+                for error, count in counts["errors"].most_common():
                     print(f"  - {error} ({count}x)")
         
         print("\n" + "="*60)
     
-    def save_results(self, filename="load_test_results.json"):
-        """Save detailed results to JSON file"""
+    def save_results(self, filename="load_test_summary.json", duration=30, rps=1, profile=None):
+        """Close the result stream and save the run summary (counts + latency histograms) to JSON"""
+        if self.sink:
+            self.sink.close()
         with open(filename, 'w') as f:
             json.dump({
                 "test_summary": {
                     "timestamp": datetime.now().isoformat(),
-                    "total_requests": len(self.results),
-                    "duration": "30s per workflow",
-                    "rate": "1 RPS"
+                    "total_requests": sum(c["total"] for c in self.counts.values()),
+                    "duration": f"{duration}s per workflow",
+                    "rate": f"{rps} RPS",
+                    "arrival": self.arrival,
+                    "max_concurrency": self.max_concurrency,
+                    "profile": profile
                 },
-                "detailed_results": self.results
+                **self.export_stats(),
+                "detailed_results_file": self.sink.path if self.sink else None,
+                "detailed_results_dropped": self.sink.dropped if self.sink else 0
             }, f, indent=2)
-        print(f"📄 Detailed results saved to: {filename}")
+        if self.sink and not self.sink.error:  # a failed sink reported itself in close()
+            print(f"📄 Detailed results streamed to: {self.sink.path} ({self.sink.written} rows)")
+            if self.sink.dropped:
+                print(f"⚠️  {self.sink.dropped} rows were dropped because the writer fell behind")
+        print(f"📄 Summary saved to: {filename}")
+
+def summarize_results_file(path, interval_s=10):
+    """Recompute the print_summary statistics by streaming over a results file"""
+    tester = LoadTester(interval_s=interval_s)
+    for result in iter_results(path):
+        tester.record_result(result)
+    tester.print_summary()
+    return tester
+
+def worker_output_path(output, index):
+    """load_test_results.jsonl -> load_test_results.worker3.jsonl"""
+    root, ext = os.path.splitext(output)
+    return f"{root}.worker{index}{ext}"
+
+def run_worker(address):
+    """--worker: run this process's share of each job a coordinator sends (see distributed.py)"""
+    channel = connect_worker(address)
+    setup, sink = None, None
+    try:
+        for message in worker_messages(channel):
+            if message["type"] == "setup":
+                setup = message
+                sink = open_sink(worker_output_path(setup["output"], setup["index"]))
+                continue
+            
+            tester = LoadTester(arrival=setup["arrival"], max_concurrency=setup["max_concurrency"],
+                                seed=setup["seed"], interval_s=setup["interval"], sink=sink,
+                                worker_index=setup["index"], worker_count=setup["count"])
+            if message["workflow"] == "1":
+                url, payload, timeout = tester.workflow1_target(message["api"])
+            else:
+                url, payload, timeout = tester.workflow2_target(message["api"], message["image_id"])
+            wait_until(message["start_at"])
+            tester.run_open_loop(message["workflow"], url, payload, message["duration"], message["rps"],
+                                 timeout, message["profile"])
+            channel.send(dict(tester.export_stats(), type="stats"))
+    finally:
+        if sink:
+            sink.close()
+        channel.close()
+
+def run_distributed(args, workflows, profile, workflow1_api, workflow2_api, image_id):
+    """Coordinator: split the load across worker processes/hosts and merge their statistics"""
+    coordinator = Coordinator(args.listen)
+    worker_count = args.processes + args.remote_workers
+    print(f"\n🌐 Coordinator on {coordinator.address}: {args.processes} local + "
+          f"{args.remote_workers} remote worker(s)")
+    if args.remote_workers:
+        print(f"   On each remote host run: python3 load_test.py --worker <this-host>:{coordinator.address.split(':')[1]}")
+    
+    # Merged statistics only; every worker streams its own detailed results file
+    tester = LoadTester(arrival=args.arrival, max_concurrency=args.max_concurrency * worker_count,
+                        seed=args.seed, interval_s=args.interval)
+    jobs = {"1": {"workflow": "1", "api": workflow1_api},
+            "2": {"workflow": "2", "api": workflow2_api, "image_id": image_id}}
+    try:
+        coordinator.spawn_local_workers(args.processes, os.path.abspath(__file__))
+        coordinator.accept(worker_count)
+        coordinator.setup(arrival=args.arrival, max_concurrency=args.max_concurrency, seed=args.seed,
+                          interval=args.interval, output=args.output)
+        
+        for workflow in workflows:
+            print(f"\n🚀 Starting {WORKFLOW_NAMES[workflow]} Load Test on {worker_count} workers")
+            print(tester._describe_load(args.duration, args.rps, profile))
+            started = time.time()
+            job_stats = coordinator.run_job(dict(jobs[workflow], duration=args.duration, rps=args.rps,
+                                                 profile=profile))
+            for stats in job_stats:
+                tester.merge_stats(stats)
+            sent = [sum(c["total"] for c in stats["counts"].values()) for stats in job_stats]
+            print(f"✅ {WORKFLOW_NAMES[workflow]} completed: {sum(sent)} requests "
+                  f"(per worker: {', '.join(map(str, sent))}) in {time.time() - started:.1f}s")
+        
+        tester.print_summary()
+        tester.save_results(args.summary_output, args.duration, args.rps, profile)
+        print(f"📄 Detailed results: {worker_output_path(args.output, '<N>')} on each worker's host")
+    finally:
+        coordinator.close()
+
+def build_corpus(args, tester, workflow1_api):
+    """--corpus FILE | dynamodb:TABLE | create -> ImageCorpus"""
+    if args.corpus == "create":
+        image_ids = tester.ingest_corpus(workflow1_api, args.corpus_size, args.corpus_create_rps)
+        save_corpus_file(args.corpus_output, image_ids)
+        print(f"   Saved to {args.corpus_output} (reuse with --corpus {args.corpus_output})")
+    elif args.corpus.startswith("dynamodb:"):
+        image_ids = scan_dynamodb_ids(args.corpus.split(":", 1)[1], args.corpus_size)
+    else:
+        image_ids = load_corpus_file(args.corpus, args.corpus_size)
+    return ImageCorpus(image_ids, args.corpus_dist, seed=args.seed, zipf_s=args.zipf_s,
+                       interval_s=args.interval)
 
 def main():
     """Main function"""
+    parser = argparse.ArgumentParser(description="Open-loop load tester for the serverless workflows")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per workflow")
+    parser.add_argument("--rps", type=float, default=1, help="target arrival rate per workflow")
+    parser.add_argument("--arrival", choices=sorted(ARRIVALS), default="constant",
+                        help="inter-arrival distribution")
+    parser.add_argument("--max-concurrency", type=int, default=256, help="cap on in-flight requests")
+    parser.add_argument("--workflows", default="1,2", help="which workflows to run, e.g. 1 or 1,2")
+    parser.add_argument("--seed", type=int, default=None, help="seed for Poisson arrivals")
+    parser.add_argument("--interval", type=float, default=10, help="seconds per interval histogram")
+    parser.add_argument("--output", default="load_test_results.jsonl",
+                        help="detailed per-request results, streamed as written (.jsonl or .parquet)")
+    parser.add_argument("--summary-output", default="load_test_summary.json")
+    parser.add_argument("--summarize", metavar="RESULTS_FILE",
+                        help="print the summary for an existing .jsonl/.parquet results file and exit")
+    parser.add_argument("--profile", help="load profile JSON file or inline JSON (ramp/step/spike/soak), "
+                                          "overrides --rps/--duration")
+    parser.add_argument("--saturate", action="store_true",
+                        help="search for the max sustainable RPS per workflow instead of a fixed load")
+    parser.add_argument("--start-rps", type=float, default=1, help="saturation: first step rate")
+    parser.add_argument("--step-factor", type=float, default=1.5, help="saturation: rate multiplier per step")
+    parser.add_argument("--step-duration", type=float, default=30, help="saturation: seconds per step")
+    parser.add_argument("--max-rps", type=float, default=1000, help="saturation: stop here")
+    parser.add_argument("--p99-max-ms", type=float, default=5000, help="saturation: corrected p99 limit")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="saturation: error-rate limit")
+    parser.add_argument("--mixed", action="store_true",
+                        help="run Workflow 1 and Workflow 2 concurrently; Workflow 2 uses freshly ingested images")
+    parser.add_argument("--wf2-rps", type=float, help="mixed: independent Workflow 2 rate")
+    parser.add_argument("--wf2-ratio", type=float,
+                        help="mixed: Workflow 2 rate as a multiple of Workflow 1's (default 1.0)")
+    parser.add_argument("--corpus", metavar="SOURCE",
+                        help="Workflow 2 samples image IDs from FILE, dynamodb:TABLE, or 'create' (ingest new ones)")
+    parser.add_argument("--corpus-size", type=int, default=100, help="corpus: number of image IDs")
+    parser.add_argument("--corpus-dist", choices=DISTRIBUTIONS, default="uniform",
+                        help="corpus: how image IDs are sampled")
+    parser.add_argument("--zipf-s", type=float, default=1.1, help="corpus: Zipf exponent")
+    parser.add_argument("--corpus-create-rps", type=float, default=2, help="corpus create: ingestion rate")
+    parser.add_argument("--corpus-output", default="image_corpus.txt", help="corpus create: where to save IDs")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="split the load across this many local worker processes")
+    parser.add_argument("--remote-workers", type=int, default=0,
+                        help="also wait for this many workers on other hosts (started with --worker)")
+    parser.add_argument("--listen", default="127.0.0.1:0",
+                        help="coordinator address; use 0.0.0.0:PORT for remote workers")
+    parser.add_argument("--worker", metavar="HOST:PORT", help="run as a worker for the coordinator at HOST:PORT")
+    args = parser.parse_args()
+    if args.worker:
+        run_worker(args.worker)
+        return
+    if args.summarize:
+        summarize_results_file(args.summarize, args.interval)
+        return
+    distributed = args.processes > 1 or args.remote_workers > 0
+    if distributed and (args.saturate or args.mixed or args.corpus):
+        parser.error("--saturate/--mixed/--corpus run in a single process; drop --processes/--remote-workers")
+    if args.wf2_rps is not None and args.wf2_ratio is not None:
+        parser.error("use either --wf2-rps or --wf2-ratio")
+    profile = load_profile(args.profile) if args.profile else None
+    if profile is not None:
+        args.duration = profile_duration(profile)
+    workflows = [w.strip() for w in args.workflows.split(",")]
+    
     print("🧪 Serverless Workflow Load Tester")
     print("=" * 50)
     
@@ -242,28 +534,93 @@ def main():
     print(f"Workflow 2 API: {WORKFLOW2_API}")
     print(f"Test Image ID:  {TEST_IMAGE_ID}")
     
+    if distributed:
+        try:
+            run_distributed(args, workflows, profile, WORKFLOW1_API, WORKFLOW2_API, TEST_IMAGE_ID)
+        except KeyboardInterrupt:
+            print("\n\n⚠️  Test interrupted by user")
+        return
+    
     # Initialize tester
-    tester = LoadTester()
+    tester = LoadTester(arrival=args.arrival, max_concurrency=args.max_concurrency, seed=args.seed,
+                        interval_s=args.interval, sink=open_sink(args.output))
     
     try:
+        if args.saturate:
+            run_saturation(tester, args, workflows, WORKFLOW1_API, WORKFLOW2_API, TEST_IMAGE_ID)
+            return
+        
+        if args.mixed:
+            tester.test_mixed(WORKFLOW1_API, WORKFLOW2_API, TEST_IMAGE_ID, duration=args.duration,
+                              rps=args.rps, profile=profile, wf2_rps=args.wf2_rps, wf2_ratio=args.wf2_ratio)
+            tester.print_summary()
+            print_mixed_report(tester.recorders, tester.image_pool, WORKFLOW_NAMES)
+            tester.save_results(args.summary_output, args.duration, args.rps, profile)
+            return
+        
         # Run tests sequentially
-        tester.test_workflow1(WORKFLOW1_API)
-        time.sleep(2)  # Brief pause between tests
-        tester.test_workflow2(WORKFLOW2_API, TEST_IMAGE_ID)
+        corpus = None
+        if "1" in workflows:
+            tester.test_workflow1(WORKFLOW1_API, duration=args.duration, rps=args.rps, profile=profile)
+        if "1" in workflows and "2" in workflows:
+            time.sleep(2)  # Brief pause between tests
+        if "2" in workflows:
+            if args.corpus:
+                corpus = build_corpus(args, tester, WORKFLOW1_API)
+            tester.test_workflow2(WORKFLOW2_API, TEST_IMAGE_ID, duration=args.duration, rps=args.rps,
+                                  profile=profile, corpus=corpus)
         
         # Print summary
         tester.print_summary()
+        if corpus:
+            print_corpus_report(corpus)
         
         # Save detailed results
-        tester.save_results()
+        tester.save_results(args.summary_output, args.duration, args.rps, profile)
         
     except KeyboardInterrupt:
         print("\n\n⚠️  Test interrupted by user")
         tester.print_summary()
-        tester.save_results()
+        tester.save_results(args.summary_output, args.duration, args.rps, profile)
     except Exception as e:
         print(f"\n❌ Test failed with error: {e}")
         sys.exit(1)
+    finally:
+        tester.sink.close()  # flush whatever was streamed so far
+
+def run_saturation(tester, args, workflows, workflow1_api, workflow2_api, image_id):
+    """Saturation search per workflow; prints the knee and saves the throughput/latency curve"""
+    targets = {"1": tester.workflow1_target(workflow1_api),
+               "2": tester.workflow2_target(workflow2_api, image_id)}
+    search_args = dict(start_rps=args.start_rps, step_factor=args.step_factor, max_rps=args.max_rps,
+                       step_duration=args.step_duration, p99_max_ms=args.p99_max_ms,
+                       max_error_rate=args.max_error_rate)
+    searches = {}
+    for workflow in workflows:
+        url, payload, timeout = targets[workflow]
+        searches[WORKFLOW_NAMES[workflow]] = tester.saturation_search(workflow, url, payload, timeout,
+                                                                      **search_args)
+    
+    print("\n" + "="*60)
+    print("📈 SATURATION SEARCH RESULTS")
+    print("="*60)
+    for name, search in searches.items():
+        print(f"\n🔹 {name}")
+        print(f"{'offered':>10}{'achieved':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>9}")
+        for step in search["curve"]:
+            print(f"{step['offered_rps']:>10.2f}{step['achieved_rps']:>10.2f}{step['p50_ms']:>10.0f}"
+                  f"{step['p99_ms']:>10.0f}{step['error_rate'] * 100:>8.1f}%")
+        print(f"Max sustainable RPS: {search['max_sustainable_rps']:.2f} (limit: {'; '.join(search['limit'])})")
+    print("\n" + "="*60)
+    
+    with open("saturation_results.json", "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "settings": search_args,
+                   "workflows": searches}, f, indent=2)
+    print("📄 Saturation curve saved to: saturation_results.json")
+    plot_file = plot_saturation_curves(searches)
+    if plot_file:
+        print(f"📄 Throughput-vs-latency plot saved to: {plot_file}")
+    tester.save_results(args.summary_output, args.step_duration, f"{args.start_rps:g}-{args.max_rps:g}")
 
 if __name__ == "__main__":
     main()
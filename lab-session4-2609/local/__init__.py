@@ -0,0 +1,19 @@
+"""
+Offline harness for the lab's serverless workflows
+
+Runs workflow1-lambda and the four Workflow 2 handlers in-process against
+in-memory S3/DynamoDB stand-ins, with a local image server standing in for
+picsum.photos, a local interpreter for statemachine.json (asl.py) and an
+HTTP gateway that load_test.py can target. See
+local_harness.py for the command-line entry point.
+"""
+
+from .asl import StateMachine, StatesError, format_waterfall, load_definition
+from .gateway import LocalHarness
+from .handlers import FUNCTIONS, LocalFunction, load_functions
+from .image_server import start_image_server
+from .standins import LocalDynamoDB, LocalS3, item_size_bytes
+
+__all__ = ["FUNCTIONS", "LocalDynamoDB", "LocalFunction", "LocalHarness", "LocalS3", "StateMachine",
+           "StatesError", "format_waterfall", "item_size_bytes", "load_definition", "load_functions",
+           "start_image_server"]
@@ -0,0 +1,413 @@
+"""
+Local interpreter for the Amazon States Language subset used by statemachine.json
+
+Supported: Task, Parallel, Choice, Pass, Succeed, Fail; Parameters (with ".$"
+paths), InputPath, ResultPath, OutputPath, Result; Retry (ErrorEquals,
+IntervalSeconds, MaxAttempts, BackoffRate) and Catch (ErrorEquals, Next,
+ResultPath); Choice rules with And/Or/Not, IsPresent, IsNull, StringEquals,
+BooleanEquals and the Numeric comparisons.
+Paths are the simple forms the lab uses: $, $.a.b, $.a[0], and $$.Execution.Input...,
+$$.Execution.Id and $$.Execution.StartTime for the context object.
+
+Task resources are looked up by their DefinitionSubstitutions name
+("${FetchImageFunctionArn}" -> resources["FetchImageFunctionArn"]) and called
+in-process. Parallel branches run on a thread pool, or on a process pool
+where each worker builds its own resources (useful for CPU-bound branches;
+stand-in S3/DynamoDB state is per process there).
+
+Every state entered is recorded with start/end offsets and its input/output
+JSON sizes, which gives a timing waterfall, the critical path and the number
+of bytes moved between states. As in Step Functions, a state input or output
+over 256 KB fails with States.DataLimitExceeded.
+"""
+
+import copy
+import json
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+STATE_PAYLOAD_LIMIT = 256 * 1024
+
+_PATH_TOKEN = re.compile(r"\.([A-Za-z0-9_\-]+)|\[(\d+)\]")
+_SUBSTITUTION = re.compile(r"^\$\{(\w+)\}$")
+
+
+class StatesError(Exception):
+    """An ASL error with a name (matched by ErrorEquals) and a cause."""
+
+    def __init__(self, error, cause=""):
+        super().__init__(f"{error}: {cause}")
+        self.error = error
+        self.cause = cause
+
+
+def _path_tokens(path):
+    if path == "$":
+        return []
+    if not path.startswith("$"):
+        raise StatesError("States.Runtime", f"Unsupported path {path!r}")
+    tokens, pos = [], 1
+    for match in _PATH_TOKEN.finditer(path, 1):
+        if match.start() != pos:
+            break
+        tokens.append(match.group(1) if match.group(1) is not None else int(match.group(2)))
+        pos = match.end()
+    if pos != len(path):
+        raise StatesError("States.Runtime", f"Unsupported path {path!r}")
+    return tokens
+
+
+def get_path(data, path, context=None):
+    if path.startswith("$$"):
+        if context is None:
+            raise StatesError("States.Runtime", f"No context object for {path!r}")
+        data, path = context, path[1:]
+    for token in _path_tokens(path):
+        try:
+            data = data[token]
+        except (KeyError, IndexError, TypeError):
+            raise StatesError("States.Runtime", f"Invalid path {path!r}: not found in input")
+    return data
+
+
+def set_path(data, path, value):
+    """ResultPath semantics: $ replaces, null discards the result, $.a.b merges into a copy of the input."""
+    if path is None:
+        return data
+    tokens = _path_tokens(path)
+    if not tokens:
+        return value
+    result = copy.copy(data) if isinstance(data, dict) else {}
+    node = result
+    for token in tokens[:-1]:
+        child = node.get(token)
+        node[token] = copy.copy(child) if isinstance(child, dict) else {}
+        node = node[token]
+    node[tokens[-1]] = value
+    return result
+
+
+def apply_parameters(template, data, context=None):
+    if isinstance(template, dict):
+        out = {}
+        for key, value in template.items():
+            if key.endswith(".$"):
+                out[key[:-2]] = get_path(data, value, context)
+            else:
+                out[key] = apply_parameters(value, data, context)
+        return out
+    if isinstance(template, list):
+        return [apply_parameters(v, data, context) for v in template]
+    return template
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+_COMPARISONS = {
+    "StringEquals": lambda a, b: isinstance(a, str) and a == b,
+    "BooleanEquals": lambda a, b: isinstance(a, bool) and a == b,
+    "NumericEquals": lambda a, b: _is_number(a) and a == b,
+    "NumericLessThan": lambda a, b: _is_number(a) and a < b,
+    "NumericLessThanEquals": lambda a, b: _is_number(a) and a <= b,
+    "NumericGreaterThan": lambda a, b: _is_number(a) and a > b,
+    "NumericGreaterThanEquals": lambda a, b: _is_number(a) and a >= b,
+}
+
+
+def choice_matches(rule, data, context=None):
+    """Evaluate one Choice rule (without its Next) against the state input."""
+    if "And" in rule:
+        return all(choice_matches(r, data, context) for r in rule["And"])
+    if "Or" in rule:
+        return any(choice_matches(r, data, context) for r in rule["Or"])
+    if "Not" in rule:
+        return not choice_matches(rule["Not"], data, context)
+    if "IsPresent" in rule:
+        try:
+            get_path(data, rule["Variable"], context)
+            present = True
+        except StatesError:
+            present = False
+        return present == rule["IsPresent"]
+    value = get_path(data, rule["Variable"], context)
+    if "IsNull" in rule:
+        return (value is None) == rule["IsNull"]
+    for name, compare in _COMPARISONS.items():
+        if name in rule:
+            return compare(value, rule[name])
+    raise StatesError("States.Runtime", f"Unsupported Choice rule {sorted(rule)}")
+
+
+def _size(value):
+    return len(json.dumps(value, default=str).encode())
+
+
+def _matches(error_equals, error):
+    for name in error_equals:
+        if name == "States.ALL" or name == error:
+            return True
+        if name == "States.TaskFailed" and error != "States.Timeout" and not error.startswith("States."):
+            return True
+    return False
+
+
+class Execution:
+    """Result of one run: status, output and the per-state trace."""
+
+    def __init__(self, data=None):
+        self.status = "RUNNING"
+        self.wall_t0 = time.time()  # aligns traces recorded in other processes
+        started = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(self.wall_t0))
+        self.context = {"Execution": {
+            "Id": f"local:{uuid.uuid4()}",
+            "Input": data,
+            "StartTime": f"{started}.{int(self.wall_t0 * 1000) % 1000:03d}Z",
+        }}
+        self.output = None
+        self.error = None
+        self.cause = None
+        self.events = []  # dicts: state, type, path, start_ms, end_ms, input_bytes, output_bytes, attempts, error
+        self.lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        self.duration_ms = 0.0
+
+    def now_ms(self):
+        return (time.perf_counter() - self._t0) * 1000
+
+    def add_event(self, event):
+        with self.lock:
+            self.events.append(event)
+
+    @property
+    def payload_bytes(self):
+        """Bytes handed between states: every state's input plus every state's output."""
+        return sum(e["input_bytes"] + e["output_bytes"] for e in self.events)
+
+    def critical_path(self):
+        """Top-level states in order; a Parallel state contributes its slowest branch."""
+        top = sorted((e for e in self.events if "/" not in e["path"]), key=lambda e: e["start_ms"])
+        path = []
+        for event in top:
+            path.append(event)
+            if event["type"] == "Parallel":
+                branches = {}
+                for e in self.events:
+                    if e["path"].startswith(event["path"] + "/"):
+                        branch = e["path"].split("/")[1]
+                        branches.setdefault(branch, []).append(e)
+                if branches:
+                    slowest = max(branches.values(), key=lambda es: max(x["end_ms"] for x in es))
+                    path.extend(sorted(slowest, key=lambda e: e["start_ms"]))
+        return path
+
+    def to_dict(self):
+        return {"status": self.status, "output": self.output, "error": self.error, "cause": self.cause,
+                "duration_ms": round(self.duration_ms, 2), "payload_bytes": self.payload_bytes,
+                "events": sorted(self.events, key=lambda e: e["start_ms"])}
+
+
+# ---------- process-pool branches ----------
+
+_worker_machine = None
+
+
+def _init_branch_worker(resource_factory, retry_delay_scale):
+    global _worker_machine
+    _worker_machine = StateMachine({"StartAt": "_", "States": {}}, resource_factory(),
+                                   retry_delay_scale=retry_delay_scale)
+
+
+def _run_branch_in_worker(branch, data, path, context):
+    execution = Execution()
+    execution.context = context
+    try:
+        output = _worker_machine._run_states(branch, data, execution, path)
+        return output, None, execution.events, execution.wall_t0
+    except StatesError as e:
+        return None, (e.error, e.cause), execution.events, execution.wall_t0
+
+
+class StateMachine:
+    def __init__(self, definition, resources, pool="thread", max_workers=16, resource_factory=None,
+                 retry_delay_scale=1.0):
+        """
+        definition:        parsed ASL JSON (see load_definition)
+        resources:         {substitution name or ARN: callable(event) -> result}
+        pool:              "thread" or "process" for Parallel branches
+        resource_factory:  picklable zero-arg callable building `resources` in each pool process
+        retry_delay_scale: multiply Retry IntervalSeconds (0 = retry immediately)
+        """
+        self.definition = definition
+        self.resources = resources
+        self.retry_delay_scale = retry_delay_scale
+        self.pool_kind = pool
+        if pool == "process":
+            if resource_factory is None:
+                raise ValueError("a process pool needs a picklable resource_factory")
+            self.pool = ProcessPoolExecutor(max_workers, initializer=_init_branch_worker,
+                                            initargs=(resource_factory, retry_delay_scale))
+        else:
+            self.pool = ThreadPoolExecutor(max_workers, thread_name_prefix="asl-branch")
+
+    def close(self):
+        self.pool.shutdown(wait=False)
+
+    def execute(self, data):
+        execution = Execution(data)
+        try:
+            execution.output = self._run_states(self.definition, data, execution, "")
+            execution.status = "SUCCEEDED"
+        except StatesError as e:
+            execution.status, execution.error, execution.cause = "FAILED", e.error, e.cause
+        execution.duration_ms = execution.now_ms()
+        return execution
+
+    def _run_states(self, machine, data, execution, prefix):
+        name = machine["StartAt"]
+        while True:
+            state = machine["States"][name]
+            path = f"{prefix}{name}"
+            data, next_name = self._run_state(name, state, data, execution, path)
+            if next_name is None:
+                return data
+            name = next_name
+
+    def _run_state(self, name, state, data, execution, path):
+        kind = state["Type"]
+        event = {"state": name, "type": kind, "path": path, "start_ms": execution.now_ms(),
+                 "input_bytes": _size(data), "output_bytes": 0, "attempts": 0, "error": None}
+        try:
+            self._check_limit(event["input_bytes"], name, "input")
+            if kind == "Fail":
+                raise StatesError(state.get("Error", "States.Fail"), state.get("Cause", ""))
+            effective = get_path(data, state.get("InputPath", "$"), execution.context)
+            if "Parameters" in state:
+                effective = apply_parameters(state["Parameters"], effective, execution.context)
+
+            next_name = None if state.get("End") or kind == "Succeed" else state.get("Next")
+            if kind == "Choice":
+                rule = next((r for r in state["Choices"] if choice_matches(r, effective, execution.context)), None)
+                next_name = rule["Next"] if rule else state.get("Default")
+                if next_name is None:
+                    raise StatesError("States.NoChoiceMatched", f"No Choice rule matched in '{name}'")
+                result = effective
+            elif kind in ("Task", "Parallel"):
+                result = self._with_retry(state, kind, effective, execution, path, event)
+            elif kind == "Pass":
+                result = state.get("Result", effective)
+            elif kind == "Succeed":
+                result = effective
+            else:
+                raise StatesError("States.Runtime", f"Unsupported state type {kind}")
+
+            if kind in ("Task", "Parallel", "Pass"):
+                output = set_path(data, state.get("ResultPath", "$"), result)
+            else:
+                output = result
+            output = get_path(output, state.get("OutputPath", "$"))
+            event["output_bytes"] = _size(output)
+            self._check_limit(event["output_bytes"], name, "output")
+        except StatesError as e:
+            event["error"] = e.error
+            catcher = next((c for c in state.get("Catch", []) if _matches(c["ErrorEquals"], e.error)), None)
+            if catcher is None:
+                event["end_ms"] = execution.now_ms()
+                execution.add_event(event)
+                raise
+            output = set_path(data, catcher.get("ResultPath", "$"), {"Error": e.error, "Cause": e.cause})
+            event["output_bytes"] = _size(output)
+            next_name = catcher["Next"]
+        event["end_ms"] = execution.now_ms()
+        execution.add_event(event)
+        return output, next_name
+
+    @staticmethod
+    def _check_limit(size, name, what):
+        if size > STATE_PAYLOAD_LIMIT:
+            raise StatesError("States.DataLimitExceeded",
+                              f"The state/task '{name}' {what} ({size} bytes) exceeds the 256 KB limit")
+
+    def _with_retry(self, state, kind, effective, execution, path, event):
+        attempts_by_rule = {}
+        while True:
+            event["attempts"] += 1
+            try:
+                if kind == "Task":
+                    return self._invoke(state, effective)
+                return self._run_parallel(state, effective, execution, path)
+            except StatesError as e:
+                rule = next((r for r in state.get("Retry", []) if _matches(r["ErrorEquals"], e.error)), None)
+                if rule is None:
+                    raise
+                used = attempts_by_rule.get(id(rule), 0)
+                if used >= rule.get("MaxAttempts", 3):
+                    raise
+                attempts_by_rule[id(rule)] = used + 1
+                delay = rule.get("IntervalSeconds", 1) * rule.get("BackoffRate", 2.0) ** used
+                time.sleep(delay * self.retry_delay_scale)
+
+    def _invoke(self, state, effective):
+        resource = state["Resource"]
+        match = _SUBSTITUTION.match(resource)
+        key = match.group(1) if match else resource
+        if key not in self.resources:
+            raise StatesError("States.Runtime", f"No local resource for {resource}")
+        try:
+            return self.resources[key](effective)
+        except StatesError:
+            raise
+        except Exception as e:
+            # an unhandled exception in the function is a task failure named after the exception
+            raise StatesError(type(e).__name__, str(e))
+
+    def _run_parallel(self, state, effective, execution, path):
+        branches = state["Branches"]
+        if self.pool_kind == "process":
+            futures = [self.pool.submit(_run_branch_in_worker, branch, effective, f"{path}/{i}/", execution.context)
+                       for i, branch in enumerate(branches)]
+            results = []
+            for future in futures:
+                output, error, events, wall_t0 = future.result()
+                offset = (wall_t0 - execution.wall_t0) * 1000
+                for e in events:  # worker traces start at their own zero; shift onto the parent's clock
+                    e["start_ms"] += offset
+                    e["end_ms"] += offset
+                    execution.add_event(e)
+                if error:
+                    raise StatesError(*error)
+                results.append(output)
+            return results
+        futures = [self.pool.submit(self._run_states, branch, effective, execution, f"{path}/{i}/")
+                   for i, branch in enumerate(branches)]
+        return [future.result() for future in futures]
+
+
+def load_definition(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def format_waterfall(execution, width=50):
+    """ASCII timing waterfall, one row per state, '*' marking the critical path."""
+    events = sorted(execution.events, key=lambda e: e["start_ms"])
+    total = max([execution.duration_ms] + [e["end_ms"] for e in events]) or 1.0
+    critical = {id(e) for e in execution.critical_path()}
+    lines = [f"{'State':<34}{'start':>8}{'ms':>9}{'in KB':>8}{'out KB':>8}  timeline"]
+    for e in events:
+        depth = e["path"].count("/") // 2
+        begin = int(e["start_ms"] / total * width)
+        length = max(1, int((e["end_ms"] - e["start_ms"]) / total * width))
+        bar = " " * begin + ("█" if id(e) in critical else "▒") * length
+        label = ("  " * depth + e["state"] + (" *" if id(e) in critical else ""))[:33]
+        retry = f" (x{e['attempts']})" if e["attempts"] > 1 else ""
+        error = f" !{e['error']}" if e["error"] else ""
+        lines.append(f"{label:<34}{e['start_ms']:>8.1f}{e['end_ms'] - e['start_ms']:>9.1f}"
+                     f"{e['input_bytes'] / 1024:>8.1f}{e['output_bytes'] / 1024:>8.1f}  {bar}{retry}{error}")
+    lines.append(f"Total {execution.duration_ms:.1f}ms, {execution.payload_bytes / 1024:.1f} KB moved between "
+                 f"states, status {execution.status}" + (f" ({execution.error})" if execution.error else ""))
+    return "\n".join(lines)
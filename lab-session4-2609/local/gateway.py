@@ -0,0 +1,120 @@
+"""
+Local HTTP gateway in front of the in-process handlers
+
+    POST /ingest    API Gateway proxy event -> workflow1 handler (same as the real /ingest)
+    POST /classify  runs statemachine.json (local.asl) for {"image_id": ...[, "inference_mode": ...]} and returns the
+                    execution with its per-state trace. Unlike the real API (StartExecution,
+                    asynchronous), the call waits for the pipeline so load_test.py measures
+                    end-to-end time. An execution that failed, or ended in HandleError, is
+                    answered with 500 (same body), so load_test.py counts it as an error.
+    GET  /stats     per-function timings/payload sizes and stand-in call counts
+"""
+
+import json
+import os
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .asl import StateMachine, load_definition
+from .handlers import LAB_DIR, load_functions, standalone_resources, state_machine_resources
+from .image_server import start_image_server
+from .standins import LocalDynamoDB, LocalS3
+
+STATEMACHINE_PATH = os.path.join(LAB_DIR, "workflow2-stepfunctions", "statemachine.json")
+FUSED_STATEMACHINE_PATH = os.path.join(LAB_DIR, "workflow2-stepfunctions", "statemachine-fused.json")
+# Workflow 1's dedup table (DEDUP_TABLE_NAME); it is keyed on dedup_key rather than image_id
+DEDUP_TABLE = "image-dedup"
+
+
+class LocalHarness:
+    """Stand-ins + handlers + image server, and the two workflows on top of them."""
+
+    def __init__(self, s3_latency_ms=0.0, dynamodb_latency_ms=0.0, bucket="local-images",
+                 table="image-metadata", env=None, log_file=None, statemachine=STATEMACHINE_PATH,
+                 pool="thread", retry_delay_scale=1.0):
+        self.s3 = LocalS3(s3_latency_ms)
+        self.dynamodb = LocalDynamoDB(dynamodb_latency_ms, key_names={DEDUP_TABLE: "dedup_key"})
+        self.bucket, self.table = bucket, table
+        self.functions = load_functions(self.s3, self.dynamodb, bucket, table, env, log_file=log_file)
+        self.image_server, self.image_base_url = start_image_server()
+        self.state_machine = StateMachine(load_definition(statemachine), state_machine_resources(self.functions),
+                                          pool=pool, max_workers=32, resource_factory=standalone_resources,
+                                          retry_delay_scale=retry_delay_scale)
+
+    def ingest(self, image_url):
+        """Invoke Workflow 1 the way API Gateway's proxy integration does."""
+        return self.functions["ingest"].invoke({"body": json.dumps({"image_url": image_url}),
+                                                "httpMethod": "POST", "path": "/ingest"})
+
+    def seed_images(self, count=1, size=(800, 600)):
+        """Ingest `count` synthetic images; returns their image_ids."""
+        ids = []
+        for i in range(count):
+            response = self.ingest(f"{self.image_base_url}/{size[0]}/{size[1]}?random=seed{i}")
+            ids.append(json.loads(response["body"])["image_id"])
+        return ids
+
+    def classify(self, image_id, **execution_input):
+        """
+        Run Workflow 2 (statemachine.json) locally; returns the local.asl Execution.
+        Extra keyword arguments go into the execution input (e.g. inference_mode="multi_model").
+        """
+        return self.state_machine.execute({"image_id": image_id, **execution_input})
+
+    def stats(self):
+        return {"functions": {name: fn.stats() for name, fn in self.functions.items()},
+                "s3": self.s3.stats(), "dynamodb": self.dynamodb.stats()}
+
+    def serve(self, host="127.0.0.1", port=8080):
+        """Start the HTTP gateway in a background thread; returns the server."""
+        harness = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body):
+                data = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/stats"):
+                    self._reply(200, harness.stats())
+                else:
+                    self._reply(404, {"message": "Not Found"})
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+                path = self.path.rstrip("/")
+                try:
+                    if path.endswith("/ingest"):
+                        response = harness.functions["ingest"].invoke(
+                            {"body": raw, "httpMethod": "POST", "path": "/ingest"})
+                        self._reply(response.get("statusCode", 200), response.get("body", ""))
+                    elif path.endswith("/classify"):
+                        execution = harness.classify(**json.loads(raw))
+                        output = execution.output
+                        handled_error = isinstance(output, dict) and output.get("status") == "FAILED"
+                        status = 200 if execution.status == "SUCCEEDED" and not handled_error else 500
+                        self._reply(status, dict(execution.to_dict(),
+                                                 executionArn=f"arn:aws:states:local:execution:{uuid.uuid4()}"))
+                    else:
+                        self._reply(404, {"message": "Not Found"})
+                except Exception as e:
+                    self._reply(502, {"message": "Internal server error", "error": str(e)})
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def close(self):
+        self.image_server.shutdown()
+        self.state_machine.close()
@@ -0,0 +1,185 @@
+"""
+Load the lab's Lambda handlers in-process, wired to the local stand-ins
+
+The handlers create their boto3 clients and read env vars at import time, so
+load_functions() sets the env vars first, and boto3.client/boto3.resource
+return the stand-ins while each module is imported (no AWS credentials or
+network needed). Each module is imported under a unique name because they
+are all called lambda_function.
+
+LocalFunction.invoke() marshals the event and the response through JSON, as
+the Lambda service does. Payload sizes are real, and Decimal values from
+DynamoDB are serialised the way the Python runtime does.
+"""
+
+import decimal
+import functools
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+LAB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> (source dir relative to the lab, handler, configured memory MB from the SAM templates)
+# handler is "function" in lambda_function.py or "module.function", as in the template's Handler
+FUNCTIONS = {
+    "ingest": ("workflow1-lambda/src", "lambda_handler", 128),
+    "fetch_image": ("workflow2-stepfunctions/fetch-image/src", "lambda_handler", 512),
+    "preprocessing": ("workflow2-stepfunctions/preprocessing/src", "lambda_handler", 1024),
+    "ml_inference": ("workflow2-stepfunctions/ml-inference/src", "lambda_handler", 2048),
+    "aggregator": ("workflow2-stepfunctions/aggregator/src", "lambda_handler", 512),
+    "batch_preprocessing": ("workflow2-stepfunctions/preprocessing/src", "batch_preprocessing.lambda_handler", 3538),
+    "bulk_aggregator": ("workflow2-stepfunctions/aggregator/src", "bulk_aggregator.lambda_handler", 1024),
+    "fetch_preprocess": ("workflow2-stepfunctions/preprocessing/src", "fetch_preprocess.lambda_handler", 1024),
+}
+
+# DefinitionSubstitutions in workflow2-stepfunctions/template.yaml -> local function
+STATE_MACHINE_RESOURCES = {
+    "FetchImageFunctionArn": "fetch_image",
+    "PreprocessingFunctionArn": "preprocessing",
+    "MLInferenceFunctionArn": "ml_inference",
+    "AggregatorFunctionArn": "aggregator",
+    "FetchPreprocessFunctionArn": "fetch_preprocess",  # statemachine-fused.json
+}
+
+LAMBDA_SYNC_PAYLOAD_LIMIT = 6 * 1024 * 1024
+
+
+def _runtime_default(value):
+    """The Lambda Python runtime's JSON encoder turns Decimal into float."""
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class LambdaContext:
+    def __init__(self, function_name, memory_mb, timeout_s=300):
+        self.function_name = function_name
+        self.memory_limit_in_mb = memory_mb
+        self.aws_request_id = str(uuid.uuid4())
+        self.invoked_function_arn = f"arn:aws:lambda:local:000000000000:function:{function_name}"
+        self._deadline = time.monotonic() + timeout_s
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+
+class LocalFunction:
+    """One handler plus per-invocation timing and payload sizes."""
+
+    def __init__(self, name, module, handler="lambda_handler", memory_mb=128):
+        self.name = name
+        self.module = module
+        self.handler = getattr(module, handler)
+        self.memory_mb = memory_mb
+        self.lock = threading.Lock()
+        self.invocations = []  # (duration_ms, request_bytes, response_bytes)
+
+    def invoke(self, event):
+        request = json.dumps(event)
+        if len(request) > LAMBDA_SYNC_PAYLOAD_LIMIT:
+            raise ValueError(f"{self.name}: request payload {len(request)} bytes exceeds the 6 MB Lambda limit")
+        start = time.perf_counter()
+        result = self.handler(json.loads(request), LambdaContext(self.name, self.memory_mb))
+        duration_ms = (time.perf_counter() - start) * 1000
+        response = json.dumps(result, default=_runtime_default)
+        with self.lock:
+            self.invocations.append((duration_ms, len(request), len(response)))
+        return json.loads(response)
+
+    def stats(self):
+        with self.lock:
+            runs = list(self.invocations)
+        if not runs:
+            return {"invocations": 0}
+        durations = sorted(r[0] for r in runs)
+        return {"invocations": len(runs),
+                "p50_ms": round(durations[len(durations) // 2], 2),
+                "max_ms": round(durations[-1], 2),
+                "mean_ms": round(sum(durations) / len(durations), 2),
+                "avg_request_bytes": round(sum(r[1] for r in runs) / len(runs)),
+                "avg_response_bytes": round(sum(r[2] for r in runs) / len(runs))}
+
+
+@contextmanager
+def _patched_boto3(s3, dynamodb):
+    import boto3
+    real_client, real_resource = boto3.client, boto3.resource
+
+    def client(service, *args, **kwargs):
+        if service in ("s3", "dynamodb"):
+            return s3 if service == "s3" else dynamodb
+        return real_client(service, *args, **kwargs)
+
+    def resource(service, *args, **kwargs):
+        return dynamodb if service == "dynamodb" else real_resource(service, *args, **kwargs)
+
+    boto3.client, boto3.resource = client, resource
+    try:
+        yield
+    finally:
+        boto3.client, boto3.resource = real_client, real_resource
+
+
+def _import_handler_module(name, src_dir, module_name="lambda_function"):
+    path = os.path.join(src_dir, f"{module_name}.py")
+    spec = importlib.util.spec_from_file_location(f"local_{name}_{module_name}", path)
+    module = importlib.util.module_from_spec(spec)
+    # helper modules next to lambda_function.py are importable, as in the deployment package
+    sys.path.insert(0, src_dir)
+    before = set(sys.modules)
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(src_dir)
+        # every function has a lambda_function.py; don't let one handler's import leak into the next
+        if "lambda_function" not in before:
+            sys.modules.pop("lambda_function", None)
+    return module
+
+
+def load_functions(s3, dynamodb, bucket="local-images", table="image-metadata", env=None, names=None,
+                   log_file=None):
+    """
+    Import the handlers against the stand-ins; returns {name: LocalFunction}.
+    log_file: where handler print() output goes (their CloudWatch logs); None = stdout.
+    """
+    os.environ.update({"S3_BUCKET_NAME": bucket, "DYNAMODB_TABLE_NAME": table,
+                       "AWS_DEFAULT_REGION": os.environ.get("AWS_DEFAULT_REGION", "ap-south-1"),
+                       **(env or {})})
+    functions = {}
+    with _patched_boto3(s3, dynamodb):
+        for name in names or FUNCTIONS:
+            src, handler, memory_mb = FUNCTIONS[name]
+            module_name, _, handler = handler.rpartition(".")
+            module = _import_handler_module(name, os.path.join(LAB_DIR, src), module_name or "lambda_function")
+            # belt and braces: point module-level clients at the stand-ins
+            if hasattr(module, "s3_client"):
+                module.s3_client = s3
+            if hasattr(module, "dynamodb"):
+                module.dynamodb = dynamodb
+            if hasattr(module, "dynamodb_client"):
+                module.dynamodb_client = dynamodb
+            if log_file is not None:
+                # a module-level `print` shadows the builtin for that handler only
+                module.print = functools.partial(print, file=log_file, flush=True)
+            functions[name] = LocalFunction(name, module, handler, memory_mb)
+    return functions
+
+
+def state_machine_resources(functions):
+    """{substitution name: invoke} for local.asl.StateMachine."""
+    return {sub: functions[name].invoke for sub, name in STATE_MACHINE_RESOURCES.items() if name in functions}
+
+
+def standalone_resources():
+    """Fresh stand-ins + handlers for one pool process (stand-in state is not shared across processes)."""
+    from .standins import LocalDynamoDB, LocalS3
+    functions = load_functions(LocalS3(), LocalDynamoDB(), log_file=open(os.devnull, "w"),
+                               names=list(STATE_MACHINE_RESOURCES.values()))
+    return state_machine_resources(functions)
@@ -0,0 +1,128 @@
+"""
+Local stand-in for https://picsum.photos: GET /<width>/<height>[?random=N] returns a JPEG
+
+Images are synthetic (gradient + noise, so they compress like photos rather
+than flat colour) and cached per (size, variant) so the server itself costs
+almost nothing per request.
+
+GET /bytes/<n>[?random=N] returns a JPEG padded to exactly n bytes (decoders
+ignore data after the end-of-image marker), for ingestion benchmarks that
+need large objects without encoding huge images. latency_ms delays every
+response and bandwidth_mbps caps its transfer rate, like a remote origin.
+"""
+
+import io
+import os
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+VARIANTS = 8
+MAX_PADDED_BYTES = 512 * 1024 * 1024
+WRITE_CHUNK = 64 * 1024
+
+
+def make_jpeg(width, height, variant=0, quality=85):
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(variant)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack([x / max(width, 1) * 255, y / max(height, 1) * 255,
+                     (x + y) / max(width + height, 1) * 255], axis=-1)
+    noise = rng.normal(0, 25, size=(height, width, 3))
+    pixels = np.clip(base + noise + variant * 17, 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, "RGB").save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+class ImageCache:
+    def __init__(self):
+        self.images = {}
+        self.lock = threading.Lock()
+
+    def get(self, width, height, variant):
+        key = (width, height, variant)
+        with self.lock:
+            if key not in self.images:
+                self.images[key] = make_jpeg(width, height, variant)
+            return self.images[key]
+
+    def padded(self, size, variant):
+        key = ("bytes", size, variant)
+        with self.lock:
+            if key not in self.images:
+                jpeg = make_jpeg(64, 64, variant)
+                self.images[key] = jpeg + os.urandom(max(0, size - len(jpeg)))
+            return self.images[key]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    cache = None
+    bytes_per_s = None
+    latency_s = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def _send_body(self, body):
+        if not self.bytes_per_s:
+            self.wfile.write(body)
+            return
+        start = time.perf_counter()
+        view = memoryview(body)
+        for offset in range(0, len(body), WRITE_CHUNK):
+            self.wfile.write(view[offset:offset + WRITE_CHUNK])
+            ahead = (offset + WRITE_CHUNK) / self.bytes_per_s - (time.perf_counter() - start)
+            if ahead > 0:
+                time.sleep(ahead)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        seed = parse_qs(url.query).get("random", ["0"])[0]
+        if len(parts) == 2 and parts[0] == "bytes":
+            try:
+                size = int(parts[1])
+            except ValueError:
+                size = -1
+            if not 0 < size <= MAX_PADDED_BYTES:
+                self.send_error(400, "bad size")
+                return
+            self._reply(self.cache.padded(size, zlib.crc32(seed.encode()) % VARIANTS))
+            return
+        try:
+            width, height = int(parts[-2]), int(parts[-1])
+        except (IndexError, ValueError):
+            width, height = 800, 600
+        if not (0 < width <= 8192 and 0 < height <= 8192):
+            self.send_error(400, "bad size")
+            return
+        self._reply(self.cache.get(width, height, zlib.crc32(seed.encode()) % VARIANTS))
+
+    def _reply(self, body):
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self._send_body(body)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # concurrent ingestion benchmarks open many connections at once
+
+
+def start_image_server(host="127.0.0.1", port=0, bandwidth_mbps=None, latency_ms=0.0):
+    """Serve synthetic JPEGs in a background thread; returns (server, base_url)."""
+    handler = type("ImageHandler", (_Handler,), {"cache": ImageCache(),
+                                                 "bytes_per_s": bandwidth_mbps * 1e6 / 8 if bandwidth_mbps else None,
+                                                 "latency_s": latency_ms / 1000.0})
+    server = _Server((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
@@ -0,0 +1,518 @@
+"""
+In-memory stand-ins for the boto3 S3 client and DynamoDB resource
+
+They implement the calls the lab handlers make, with boto3's observable
+behaviour where it affects performance or correctness:
+
+  - DynamoDB values go through boto3's TypeSerializer, so numbers come back
+    as Decimal and Python floats are rejected (TypeError), just like
+    boto3.resource('dynamodb'); items over 400 KB are rejected.
+  - Missing S3 keys and failed conditions raise botocore ClientError with the
+    real error codes.
+  - The same LocalDynamoDB object also answers boto3.client('dynamodb')
+    batch_execute_statement (PartiQL UPDATE, up to 25 statements per call),
+    with per-statement errors in the response as the real API returns them.
+  - Every call is counted (and optionally delayed by a fixed latency and a
+    transfer time) so benchmarks can report request counts and emulate
+    network round trips.
+  - Table.batch_writer() buffers puts and sends them 25 per BatchWriteItem
+    call, rejecting duplicate keys in one batch as DynamoDB does.
+  - S3 multipart uploads enforce the 5 MB minimum part size, and
+    ChecksumSHA256 values are verified against the bytes sent.
+"""
+
+import base64
+import copy
+import hashlib
+import io
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+DYNAMODB_ITEM_LIMIT = 400 * 1024
+BATCH_WRITE_LIMIT = 25
+MULTIPART_MIN_PART = 5 * 1024 * 1024  # every part but the last
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+def _client_error(code, message, operation, status=400):
+    return ClientError({"Error": {"Code": code, "Message": message},
+                        "ResponseMetadata": {"HTTPStatusCode": status}}, operation)
+
+
+class _Service:
+    """
+    Call counting and optional per-call latency shared by both stand-ins.
+    bandwidth_mbps adds transfer time per call (per connection, so concurrent
+    calls overlap the way parallel uploads to S3 do).
+    """
+
+    def __init__(self, latency_ms=0.0, bandwidth_mbps=None):
+        self.latency_s = latency_ms / 1000.0
+        self.bytes_per_s = bandwidth_mbps * 1e6 / 8 if bandwidth_mbps else None
+        self.calls = Counter()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.lock = threading.Lock()
+
+    def _call(self, operation, bytes_in=0, bytes_out=0):
+        with self.lock:
+            self.calls[operation] += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+        delay = self.latency_s
+        if self.bytes_per_s:
+            delay += (bytes_in + bytes_out) / self.bytes_per_s
+        if delay:
+            time.sleep(delay)
+
+    def stats(self):
+        with self.lock:
+            return {"calls": dict(self.calls), "bytes_in": self.bytes_in, "bytes_out": self.bytes_out}
+
+
+# ---------- S3 ----------
+
+class StreamingBody:
+    """Enough of botocore's StreamingBody for handlers: read(), read(amt), iter_chunks()."""
+
+    def __init__(self, data):
+        self._raw = io.BytesIO(data)
+        self._length = len(data)
+
+    def read(self, amt=None):
+        return self._raw.read() if amt is None else self._raw.read(amt)
+
+    def iter_chunks(self, chunk_size=1024 * 1024):
+        while True:
+            chunk = self._raw.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self):
+        self._raw.close()
+
+
+class LocalS3(_Service):
+    """
+    boto3.client('s3') stand-in backed by a dict.
+
+    keep_bodies=False checks and counts uploads but drops the bytes (GetObject
+    then fails), for ingestion benchmarks that measure the handler's memory
+    and would otherwise mostly see the stand-in's own copy of every object.
+    """
+
+    def __init__(self, latency_ms=0.0, bandwidth_mbps=None, keep_bodies=True):
+        super().__init__(latency_ms, bandwidth_mbps)
+        self.keep_bodies = keep_bodies
+        self.objects = {}  # (bucket, key) -> dict(body, size, content_type, metadata, etag, last_modified)
+        self.uploads = {}  # UploadId -> dict(bucket, key, content_type, metadata, parts: {number: (data, etag, size)})
+
+    @staticmethod
+    def _body_bytes(body):
+        if body is None:
+            return b""
+        if isinstance(body, str):
+            return body.encode()
+        if hasattr(body, "read"):
+            return body.read()
+        return bytes(body)
+
+    @staticmethod
+    def _verify_checksum(data, kwargs, operation):
+        """ChecksumSHA256 (base64) is checked against the body, as S3 does; BadDigest on mismatch."""
+        expected = kwargs.get("ChecksumSHA256")
+        if expected is None:
+            return None
+        actual = base64.b64encode(hashlib.sha256(data).digest()).decode()
+        if actual != expected:
+            raise _client_error("BadDigest", "The SHA256 you specified did not match the calculated checksum.",
+                                operation)
+        return actual
+
+    def put_object(self, Bucket, Key, Body=None, ContentType="binary/octet-stream", Metadata=None, **kwargs):
+        data = self._body_bytes(Body)
+        self._call("PutObject", bytes_in=len(data))
+        checksum = self._verify_checksum(data, kwargs, "PutObject")
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        with self.lock:
+            self.objects[(Bucket, Key)] = {"body": data if self.keep_bodies else None, "size": len(data),
+                                           "content_type": ContentType, "metadata": dict(Metadata or {}),
+                                           "etag": etag, "last_modified": datetime.now(timezone.utc)}
+        response = {"ETag": etag}
+        if checksum:
+            response["ChecksumSHA256"] = checksum
+        return response
+
+    # multipart upload: parts are kept until complete (or dropped on abort)
+
+    def create_multipart_upload(self, Bucket, Key, ContentType="binary/octet-stream", Metadata=None, **kwargs):
+        self._call("CreateMultipartUpload")
+        upload_id = uuid.uuid4().hex
+        with self.lock:
+            self.uploads[upload_id] = {"bucket": Bucket, "key": Key, "content_type": ContentType,
+                                       "metadata": dict(Metadata or {}), "parts": {}}
+        return {"Bucket": Bucket, "Key": Key, "UploadId": upload_id}
+
+    def _upload(self, UploadId, operation):
+        with self.lock:
+            upload = self.uploads.get(UploadId)
+        if upload is None:
+            raise _client_error("NoSuchUpload", "The specified upload does not exist.", operation, 404)
+        return upload
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body=None, **kwargs):
+        data = self._body_bytes(Body)
+        self._call("UploadPart", bytes_in=len(data))
+        upload = self._upload(UploadId, "UploadPart")
+        checksum = self._verify_checksum(data, kwargs, "UploadPart")
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        with self.lock:
+            upload["parts"][PartNumber] = (data if self.keep_bodies else None, etag, len(data))
+        response = {"ETag": etag}
+        if checksum:
+            response["ChecksumSHA256"] = checksum
+        return response
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        self._call("CompleteMultipartUpload")
+        upload = self._upload(UploadId, "CompleteMultipartUpload")
+        listed = MultipartUpload["Parts"]
+        numbers = [p["PartNumber"] for p in listed]
+        if numbers != sorted(numbers) or any(upload["parts"].get(p["PartNumber"], (None, None, 0))[1] != p["ETag"]
+                                             for p in listed):
+            raise _client_error("InvalidPart", "One or more of the specified parts could not be found.",
+                                "CompleteMultipartUpload")
+        parts = [upload["parts"][n] for n in numbers]
+        if any(size < MULTIPART_MIN_PART for _, _, size in parts[:-1]):
+            raise _client_error("EntityTooSmall", "Your proposed upload is smaller than the minimum "
+                                "allowed object size.", "CompleteMultipartUpload")
+        data = b"".join(part for part, _, _ in parts) if self.keep_bodies else None
+        # multipart ETags are the MD5 of the part MD5s plus the part count
+        digest = hashlib.md5(b"".join(bytes.fromhex(etag.strip('"')) for _, etag, _ in parts))
+        etag = f'"{digest.hexdigest()}-{len(numbers)}"'
+        with self.lock:
+            del self.uploads[UploadId]
+            self.objects[(Bucket, Key)] = {"body": data, "size": sum(size for _, _, size in parts),
+                                           "content_type": upload["content_type"],
+                                           "metadata": upload["metadata"], "etag": etag,
+                                           "last_modified": datetime.now(timezone.utc)}
+        return {"Bucket": Bucket, "Key": Key, "ETag": etag}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        self._call("AbortMultipartUpload")
+        with self.lock:
+            self.uploads.pop(UploadId, None)
+        return {}
+
+    def _get(self, Bucket, Key, operation):
+        with self.lock:
+            obj = self.objects.get((Bucket, Key))
+        if obj is None:
+            self._call(operation)
+            raise _client_error("NoSuchKey", "The specified key does not exist.", operation, 404)
+        return obj
+
+    def get_object(self, Bucket, Key, **kwargs):
+        obj = self._get(Bucket, Key, "GetObject")
+        if obj["body"] is None:
+            self._call("GetObject")
+            raise _client_error("InvalidObjectState", "Object body was not kept (keep_bodies=False).",
+                                "GetObject", 403)
+        self._call("GetObject", bytes_out=len(obj["body"]))
+        return {"Body": StreamingBody(obj["body"]), "ContentLength": len(obj["body"]),
+                "ContentType": obj["content_type"], "Metadata": dict(obj["metadata"]),
+                "ETag": obj["etag"], "LastModified": obj["last_modified"]}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        obj = self._get(Bucket, Key, "HeadObject")
+        self._call("HeadObject")
+        return {"ContentLength": obj["size"], "ContentType": obj["content_type"],
+                "Metadata": dict(obj["metadata"]), "ETag": obj["etag"],
+                "LastModified": obj["last_modified"]}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        self._call("DeleteObject")
+        with self.lock:
+            self.objects.pop((Bucket, Key), None)
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix="", MaxKeys=1000, ContinuationToken=None, **kwargs):
+        self._call("ListObjectsV2")
+        with self.lock:
+            keys = sorted(k for b, k in self.objects if b == Bucket and k.startswith(Prefix))
+        if ContinuationToken:
+            keys = [k for k in keys if k > ContinuationToken]
+        page = keys[:MaxKeys]
+        response = {"KeyCount": len(page), "IsTruncated": len(keys) > MaxKeys,
+                    "Contents": [{"Key": k, "Size": self.objects[(Bucket, k)]["size"],
+                                  "ETag": self.objects[(Bucket, k)]["etag"]} for k in page]}
+        if response["IsTruncated"]:
+            response["NextContinuationToken"] = page[-1]
+        return response
+
+
+# ---------- DynamoDB ----------
+
+def item_size_bytes(item):
+    """Approximate DynamoDB item size: attribute names plus serialized values (the 400 KB limit)."""
+    def value_size(value):
+        (kind, raw), = value.items()
+        if kind in ("S", "N"):
+            return len(str(raw).encode())
+        if kind == "B":
+            return len(getattr(raw, "value", raw))
+        if kind in ("BOOL", "NULL"):
+            return 1
+        if kind in ("SS", "NS"):
+            return sum(len(str(v).encode()) for v in raw)
+        if kind == "BS":
+            return sum(len(v) for v in raw)
+        if kind == "L":
+            return 3 + sum(1 + value_size(v) for v in raw)
+        if kind == "M":
+            return 3 + sum(len(k.encode()) + 1 + value_size(v) for k, v in raw.items())
+        return 0
+    return sum(len(name.encode()) + value_size(_serializer.serialize(value)) for name, value in item.items())
+
+
+def _normalize(value):
+    """Round-trip through the DynamoDB type system (floats raise TypeError, numbers become Decimal)."""
+    return _deserializer.deserialize(_serializer.serialize(value))
+
+
+_SET_CLAUSE = re.compile(r"^\s*SET\s+(.*)$", re.IGNORECASE | re.DOTALL)
+_CONDITION = re.compile(r"^\(?\s*(attribute_exists|attribute_not_exists)\s*\(\s*([#\w]+)\s*\)\s*\)?$",
+                        re.IGNORECASE)
+
+
+class LocalTable:
+    def __init__(self, name, service, key_name="image_id"):
+        self.name = name
+        self.table_name = name
+        self.service = service
+        self.key_name = key_name
+        self.items = {}
+        self.lock = threading.Lock()
+
+    def _key(self, Key):
+        return Key[self.key_name]
+
+    @staticmethod
+    def _project(item, projection, names):
+        if not projection:
+            return item
+        wanted = [(names or {}).get(p.strip(), p.strip()) for p in projection.split(",")]
+        return {k: v for k, v in item.items() if k in wanted}
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, **kwargs):
+        with self.lock:
+            item = copy.deepcopy(self.items.get(self._key(Key)))
+        self.service._call("GetItem")
+        if item is None:
+            return {}
+        return {"Item": self._project(item, ProjectionExpression, ExpressionAttributeNames)}
+
+    def _check_size(self, item, operation):
+        size = item_size_bytes(item)
+        if size > DYNAMODB_ITEM_LIMIT:
+            raise _client_error("ValidationException", "Item size has exceeded the maximum allowed size",
+                                operation)
+        return size
+
+    @staticmethod
+    def _condition_holds(existing, expression, names):
+        """`attribute_exists(a)` / `attribute_not_exists(a)`, optionally joined with AND."""
+        for clause in re.split(r"\s+AND\s+", expression.strip(), flags=re.IGNORECASE):
+            match = _CONDITION.match(clause)
+            if not match:
+                raise NotImplementedError(f"LocalTable does not support the condition {clause!r}")
+            function, attribute = match.group(1).lower(), (names or {}).get(match.group(2), match.group(2))
+            present = existing is not None and attribute in existing
+            if present != (function == "attribute_exists"):
+                return False
+        return True
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None, **kwargs):
+        item = {k: _normalize(v) for k, v in Item.items()}
+        size = self._check_size(item, "PutItem")
+        self.service._call("PutItem", bytes_in=size)
+        with self.lock:
+            if ConditionExpression and not self._condition_holds(self.items.get(self._key(item)),
+                                                                 ConditionExpression, ExpressionAttributeNames):
+                raise _client_error("ConditionalCheckFailedException", "The conditional request failed", "PutItem")
+            self.items[self._key(item)] = item
+        return {}
+
+    def delete_item(self, Key, **kwargs):
+        self.service._call("DeleteItem")
+        with self.lock:
+            self.items.pop(self._key(Key), None)
+        return {}
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        return _BatchWriter(self, overwrite_by_pkeys)
+
+    def _batch_write(self, items):
+        if len({self._key(item) for item in items}) != len(items):
+            raise _client_error("ValidationException", "Provided list of item keys contains duplicates",
+                                "BatchWriteItem")
+        items = [{k: _normalize(v) for k, v in item.items()} for item in items]
+        size = sum(self._check_size(item, "BatchWriteItem") for item in items)
+        self.service._call("BatchWriteItem", bytes_in=size)
+        with self.lock:
+            for item in items:
+                self.items[self._key(item)] = item
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues=None,
+                    ExpressionAttributeNames=None, ReturnValues="NONE", ConditionExpression=None, **kwargs):
+        """Supports the `SET a = :x, #b = :y` form the handlers use, and ReturnValues ALL_NEW / ALL_OLD."""
+        match = _SET_CLAUSE.match(UpdateExpression)
+        if not match:
+            raise NotImplementedError(f"LocalTable only supports SET updates: {UpdateExpression!r}")
+        values = {k: _normalize(v) for k, v in (ExpressionAttributeValues or {}).items()}
+        names = ExpressionAttributeNames or {}
+        assignments = []
+        for clause in match.group(1).split(","):
+            attribute, _, placeholder = clause.partition("=")
+            assignments.append((names.get(attribute.strip(), attribute.strip()), values[placeholder.strip()]))
+
+        condition = (lambda existing: self._condition_holds(existing, ConditionExpression, names)
+                     if ConditionExpression else None)
+        item, size, old = self._apply_set(Key, assignments, "UpdateItem", condition=condition)
+        self.service._call("UpdateItem", bytes_in=size)
+        if ReturnValues == "ALL_NEW":
+            return {"Attributes": copy.deepcopy(item)}
+        if ReturnValues == "ALL_OLD" and old is not None:
+            return {"Attributes": old}
+        return {}
+
+    def _apply_set(self, Key, assignments, operation, must_exist=False, condition=None):
+        """Apply [(attribute, value)] to one item; returns (item, size, previous item or None)."""
+        with self.lock:
+            existing = self.items.get(self._key(Key))
+            if (existing is None and must_exist) or (condition and condition(existing) is False):
+                raise _client_error("ConditionalCheckFailedException", "The conditional request failed",
+                                    operation)
+            item = copy.deepcopy(existing or {self.key_name: self._key(Key)})
+            for attribute, value in assignments:
+                item[attribute] = value
+            size = self._check_size(item, operation)
+            self.items[self._key(Key)] = item
+        return item, size, existing
+
+    def scan(self, ProjectionExpression=None, ExpressionAttributeNames=None, Limit=None,
+             ExclusiveStartKey=None, **kwargs):
+        self.service._call("Scan")
+        with self.lock:
+            keys = sorted(self.items)
+            if ExclusiveStartKey:
+                keys = [k for k in keys if k > self._key(ExclusiveStartKey)]
+            page = keys[:Limit] if Limit else keys
+            items = [self._project(copy.deepcopy(self.items[k]), ProjectionExpression, ExpressionAttributeNames)
+                     for k in page]
+        response = {"Items": items, "Count": len(items)}
+        if Limit and len(keys) > Limit:
+            response["LastEvaluatedKey"] = {self.key_name: page[-1]}
+        return response
+
+
+class _BatchWriter:
+    """Table.batch_writer(): a context manager that flushes every 25 puts (and on exit)."""
+
+    def __init__(self, table, overwrite_by_pkeys=None):
+        self.table = table
+        self.overwrite = bool(overwrite_by_pkeys)
+        self.pending = []
+
+    def put_item(self, Item):
+        if self.overwrite:
+            self.pending = [item for item in self.pending if self.table._key(item) != self.table._key(Item)]
+        self.pending.append(Item)
+        if len(self.pending) >= BATCH_WRITE_LIMIT:
+            self._flush()
+
+    def _flush(self):
+        batch, self.pending = self.pending[:BATCH_WRITE_LIMIT], self.pending[BATCH_WRITE_LIMIT:]
+        if batch:
+            self.table._batch_write(batch)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        while self.pending:
+            self._flush()
+        return False
+
+
+_PARTIQL_UPDATE = re.compile(r'^\s*UPDATE\s+"?([\w.-]+)"?\s+(SET\s.*?)\s+WHERE\s+"?(\w+)"?\s*=\s*\?\s*$',
+                             re.IGNORECASE | re.DOTALL)
+_PARTIQL_SET = re.compile(r'\bSET\s+"?(\w+)"?\s*=\s*\?', re.IGNORECASE)
+PARTIQL_BATCH_LIMIT = 25
+# BatchStatementError codes differ from the exception names of the single-item calls
+_BATCH_STATEMENT_ERRORS = {"ConditionalCheckFailedException": "ConditionalCheckFailed",
+                           "ValidationException": "ValidationError"}
+
+
+class LocalDynamoDB(_Service):
+    """
+    boto3.resource('dynamodb') stand-in: Table(name) returns a persistent in-memory table.
+    Also stands in for boto3.client('dynamodb') where the handlers use PartiQL.
+    key_names: {table name: partition key attribute} for tables not keyed on image_id.
+    """
+
+    def __init__(self, latency_ms=0.0, key_names=None):
+        super().__init__(latency_ms)
+        self.tables = {}
+        self.key_names = dict(key_names or {})
+
+    def Table(self, name):
+        with self.lock:
+            if name not in self.tables:
+                self.tables[name] = LocalTable(name, self, self.key_names.get(name, "image_id"))
+            return self.tables[name]
+
+    def batch_execute_statement(self, Statements, **kwargs):
+        """
+        `UPDATE "table" SET a=? SET b=? WHERE key=?` statements with low-level
+        (typed) Parameters. As in DynamoDB, UPDATE never creates an item: a
+        missing key fails that statement with ConditionalCheckFailed, and the
+        other statements still apply.
+        """
+        if not 0 < len(Statements) <= PARTIQL_BATCH_LIMIT:
+            raise _client_error("ValidationException", f"Member must have length less than or equal to "
+                                f"{PARTIQL_BATCH_LIMIT}", "BatchExecuteStatement")
+        responses, size = [], 0
+        for statement in Statements:
+            match = _PARTIQL_UPDATE.match(statement["Statement"])
+            if not match:
+                raise NotImplementedError(f"LocalDynamoDB only supports PartiQL SET updates: "
+                                          f"{statement['Statement']!r}")
+            table_name, set_clause, key_name = match.groups()
+            attributes = _PARTIQL_SET.findall(set_clause)
+            values = [_deserializer.deserialize(v) for v in statement.get("Parameters", [])]
+            if len(values) != len(attributes) + 1:
+                raise _client_error("ValidationException", "Number of parameters in request and statement "
+                                    "don't match", "BatchExecuteStatement")
+            table = self.Table(table_name)
+            try:
+                _, item_size, _ = table._apply_set({key_name: values[-1]}, list(zip(attributes, values)),
+                                                "BatchExecuteStatement", must_exist=True)
+                size += item_size
+                responses.append({"TableName": table_name})
+            except ClientError as e:
+                code = _BATCH_STATEMENT_ERRORS.get(e.response["Error"]["Code"], e.response["Error"]["Code"])
+                responses.append({"TableName": table_name,
+                                  "Error": {"Code": code, "Message": e.response["Error"]["Message"]}})
+        self._call("BatchExecuteStatement", bytes_in=size)
+        return {"Responses": responses}
@@ -0,0 +1,859 @@
+#!/usr/bin/env python3
+"""
+Run the lab's workflows offline: handlers in-process, S3/DynamoDB in memory
+
+    python3 local_harness.py serve --port 8080
+        starts the local gateway (POST /ingest, POST /classify, GET /stats) and
+        prints the environment for load_test.py
+
+    python3 local_harness.py bench --iterations 20
+        invokes every handler directly and reports per-handler latency and
+        payload sizes (a quick regression check after changing a handler)
+
+    python3 local_harness.py run --executions 5 --pool thread
+        executes statemachine.json with the local ASL interpreter and prints
+        the per-state timing waterfall, critical path and payload bytes
+
+    python3 local_harness.py payload --executions 20
+        runs the same images with PAYLOAD_MODE=inline and =claim_check and
+        compares latency, bytes moved between states and S3 traffic
+
+    python3 local_harness.py batch --images 200
+        runs the batch preprocessing handler (process pool vs thread pool)
+        over seeded images and reports throughput and the shard manifest
+
+    python3 local_harness.py aggregate --images 2000 --dynamodb-latency-ms 5
+        aggregates synthetic model outputs with the per-image aggregator and
+        the bulk aggregator, checks they store the same results, and reports
+        images/s and DynamoDB calls
+
+    python3 local_harness.py encoding --images 50
+        classifies the same images with each RESULTS_ENCODING and reports
+        item size, write/read capacity units per image and the size of the
+        projected metadata read
+
+    python3 local_harness.py fused --executions 30
+        runs statemachine.json (FetchImage -> Preprocessing) and
+        statemachine-fused.json (FetchAndPreprocess) on the same images and
+        compares latency, invocations, state transitions, calls and cost
+
+    python3 local_harness.py ingest --sizes-mb 0.5,4,16,64
+        ingests padded images of each size with INGEST_UPLOAD=buffered and
+        =stream through a bandwidth-limited origin and S3, checks the stored
+        bytes, and reports latency and the handler's peak Python memory
+
+    python3 local_harness.py ingest-batch --urls 300 --concurrency 1,4,16,32
+        ingests the same URLs one invocation per URL and as one batch
+        invocation per concurrency setting, against an origin and S3 with
+        added latency, and reports images/s and S3/DynamoDB calls
+
+    python3 local_harness.py dedup --requests 200
+        ingests a repeated fixed URL and random-parameter URLs with each
+        DEDUP_POLICY and reports hit rate, latency and bytes stored
+
+--payload-mode sets PAYLOAD_MODE for the Workflow 2 handlers.
+--s3-latency-ms / --dynamodb-latency-ms add a fixed delay per call to
+emulate network round trips; by default the stand-ins answer instantly, so
+the numbers are pure handler CPU time.
+"""
+
+import argparse
+import hashlib
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import requests
+
+from local import LocalDynamoDB, LocalHarness, LocalS3, load_functions, start_image_server
+from local.asl import format_waterfall
+from local.gateway import DEDUP_TABLE, FUSED_STATEMACHINE_PATH, STATEMACHINE_PATH
+
+# list prices (us-east-1, x86, Standard workflows, on-demand DynamoDB) for the fused cost estimate
+PRICES = {"lambda_gb_s": 0.0000166667, "lambda_request": 0.20 / 1e6, "sfn_transition": 0.025 / 1000,
+          "dynamodb_write": 1.25 / 1e6, "dynamodb_read": 0.25 / 1e6, "s3_get": 0.0004 / 1000,
+          "s3_put": 0.005 / 1000}
+
+# labels for the synthetic model outputs of the aggregate benchmark
+AGGREGATE_LABELS = ['cat', 'dog', 'bird', 'car', 'bicycle', 'airplane', 'boat', 'train', 'truck', 'bench',
+                    'elephant', 'bear', 'zebra', 'giraffe', 'umbrella', 'bottle', 'cup', 'banana', 'apple', 'pizza']
+
+
+def add_common_args(parser):
+    parser.add_argument("--s3-latency-ms", type=float, default=0.0, help="delay added to every S3 call")
+    parser.add_argument("--dynamodb-latency-ms", type=float, default=0.0, help="delay added to every DynamoDB call")
+    parser.add_argument("--handler-log", default="local_handlers.log",
+                        help="file for the handlers' print() output ('-' for stdout)")
+    parser.add_argument("--payload-mode", choices=["inline", "claim_check"], default="inline",
+                        help="how Workflow 2 passes images between states (PAYLOAD_MODE)")
+
+
+def make_harness(args, payload_mode=None, statemachine=STATEMACHINE_PATH):
+    payload_mode = payload_mode or args.payload_mode
+    print(f"🧪 Local serverless harness (in-memory S3 + DynamoDB, PAYLOAD_MODE={payload_mode})")
+    log_file = None if args.handler_log == "-" else open(args.handler_log, "a")
+    harness = LocalHarness(s3_latency_ms=args.s3_latency_ms, dynamodb_latency_ms=args.dynamodb_latency_ms,
+                           log_file=log_file, env={"PAYLOAD_MODE": payload_mode}, statemachine=statemachine,
+                           pool=getattr(args, "pool", "thread"),
+                           retry_delay_scale=getattr(args, "retry_delay_scale", 1.0))
+    print(f"   Handlers loaded: {', '.join(harness.functions)}")
+    if log_file:
+        print(f"   Handler logs:    {args.handler_log}")
+    print(f"   Image server:    {harness.image_base_url}")
+    return harness
+
+
+def serve(args):
+    harness = make_harness(args)
+    server = harness.serve(args.host, args.port)
+    api = f"http://{args.host}:{server.server_address[1]}"
+    image_id = harness.seed_images(1)[0]
+    print(f"   Gateway:         {api}  (seed image {image_id})")
+    print("\nPoint load_test.py at it with:")
+    print(f"   export WORKFLOW1_API={api}")
+    print(f"   export WORKFLOW2_API={api}")
+    print(f"   export IMAGE_ID={image_id}")
+    print(f"   export IMAGE_SOURCE_URL={harness.image_base_url}")
+    print("\nCtrl-C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("\n📊 Handler stats:")
+        print(json.dumps(harness.stats(), indent=2))
+    finally:
+        server.shutdown()
+        harness.close()
+
+
+def bench(args):
+    harness = make_harness(args)
+    image_ids = harness.seed_images(args.images, size=(args.width, args.height))
+    print(f"   Seeded {len(image_ids)} image(s) of {args.width}x{args.height}\n")
+
+    timings = {}  # step -> [ms]
+    sizes = {}    # step -> response bytes
+
+    def step(name, fn, event):
+        function = harness.functions[fn]
+        t0 = time.perf_counter()
+        result = function.invoke(event)
+        timings.setdefault(name, []).append((time.perf_counter() - t0) * 1000)
+        sizes[name] = function.invocations[-1][2]
+        return result
+
+    for i in range(args.iterations):
+        image_id = image_ids[i % len(image_ids)]
+        step("ingest", "ingest", {"image_url": f"{harness.image_base_url}/{args.width}/{args.height}?random={i}"})
+        fetched = step("fetch_image", "fetch_image", {"image_id": image_id})
+        processed = step("preprocessing", "preprocessing", fetched)
+        results = [step(f"ml_inference[{m}]", "ml_inference",
+                        {"image_id": image_id, "processed_image_data": processed["processed_image_data"],
+                         "processed_image_ref": processed["processed_image_ref"],
+                         "model_name": m, "metadata": processed["metadata"]})
+                   for m in ("alexnet", "resnet", "mobilenet")]
+        step("aggregator", "aggregator", {"image_id": image_id, "alexnet_result": results[0],
+                                          "resnet_result": results[1], "mobilenet_result": results[2],
+                                          "original_metadata": processed["metadata"]})
+
+    print(f"{'Handler':<24}{'p50 ms':>10}{'mean ms':>10}{'max ms':>10}{'response':>12}")
+    print("-" * 66)
+    report = {}
+    for name, values in timings.items():
+        report[name] = {"p50_ms": round(statistics.median(values), 2),
+                        "mean_ms": round(statistics.mean(values), 2),
+                        "max_ms": round(max(values), 2), "response_bytes": sizes[name]}
+        print(f"{name:<24}{report[name]['p50_ms']:>10.1f}{report[name]['mean_ms']:>10.1f}"
+              f"{report[name]['max_ms']:>10.1f}{sizes[name]:>11,}B")
+
+    stats = harness.stats()
+    print(f"\nS3 calls: {stats['s3']['calls']}")
+    print(f"DynamoDB calls: {stats['dynamodb']['calls']}")
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "iterations": args.iterations,
+                   "image_size": [args.width, args.height], "handlers": report, "standins": stats}, f, indent=2)
+    print(f"📄 Results saved to: {args.output}")
+    harness.close()
+
+
+def run(args):
+    harness = make_harness(args)
+    image_ids = harness.seed_images(args.images, size=(args.width, args.height))
+    print(f"   Seeded {len(image_ids)} image(s) of {args.width}x{args.height}, {args.pool} pool for Parallel\n")
+
+    extra = {"inference_mode": args.inference_mode} if args.inference_mode != "parallel" else {}
+    executions = [harness.classify(image_ids[i % len(image_ids)], **extra) for i in range(args.executions)]
+    durations = sorted(e.duration_ms for e in executions)
+    median = min(executions, key=lambda e: abs(e.duration_ms - durations[len(durations) // 2]))
+
+    print(f"Waterfall of the median execution ({median.duration_ms:.1f}ms):")
+    print(format_waterfall(median))
+    critical = median.critical_path()
+    print(f"\nCritical path: {' -> '.join(e['state'] for e in critical)}")
+    print(f"Executions: {len(executions)}, "
+          f"succeeded {sum(e.status == 'SUCCEEDED' for e in executions)}, "
+          f"p50 {durations[len(durations) // 2]:.1f}ms, max {durations[-1]:.1f}ms")
+
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "pool": args.pool, "inference_mode": args.inference_mode,
+                   "image_size": [args.width, args.height],
+                   "critical_path": [e["path"] for e in critical],
+                   "executions": [e.to_dict() for e in executions]}, f, indent=2, default=str)
+    print(f"📄 Results saved to: {args.output}")
+    harness.close()
+
+
+def payload(args):
+    """Same images, same handlers: inline base64 vs claim-check references."""
+    rows = {}
+    for mode in ("inline", "claim_check"):
+        harness = make_harness(args, payload_mode=mode)
+        image_ids = harness.seed_images(args.images, size=(args.width, args.height))
+        s3_before = harness.s3.stats()
+        executions = [harness.classify(image_ids[i % len(image_ids)]) for i in range(args.executions)]
+        s3_after = harness.s3.stats()
+        s3_calls = {op: n - s3_before["calls"].get(op, 0) for op, n in s3_after["calls"].items()}
+        ok = [e for e in executions if e.status == "SUCCEEDED"]
+        durations = sorted(e.duration_ms for e in ok)
+        states = {}
+        for e in ok:
+            for event in e.events:
+                states.setdefault(event["state"], []).append(event["end_ms"] - event["start_ms"])
+        rows[mode] = {
+            "succeeded": len(ok), "failed": len(executions) - len(ok),
+            "errors": sorted({e.error for e in executions if e.error}),
+            "p50_ms": round(durations[len(durations) // 2], 2) if ok else None,
+            "payload_kb_per_execution": round(statistics.mean(e.payload_bytes for e in ok) / 1024, 1) if ok else None,
+            "largest_state_kb": round(max(max(ev["input_bytes"], ev["output_bytes"])
+                                          for e in ok for ev in e.events) / 1024, 1) if ok else None,
+            "state_p50_ms": {name: round(statistics.median(v), 2) for name, v in states.items()},
+            "s3_gets": s3_calls.get("GetObject", 0) / len(executions),
+            "s3_puts": s3_calls.get("PutObject", 0) / len(executions),
+            "s3_kb_read": round((s3_after["bytes_out"] - s3_before["bytes_out"]) / 1024 / len(executions), 1),
+        }
+        harness.close()
+        print()
+
+    print(f"📦 Payload modes, {args.executions} executions of {args.width}x{args.height} images")
+    print(f"{'':<28}{'inline':>14}{'claim_check':>14}")
+    print("-" * 56)
+
+    def row(label, key, fmt="{:.1f}"):
+        values = [rows[m][key] for m in ("inline", "claim_check")]
+        cells = ["-" if v is None else fmt.format(v) for v in values]
+        print(f"{label:<28}{cells[0]:>14}{cells[1]:>14}")
+
+    row("succeeded", "succeeded", "{}")
+    row("execution p50 ms", "p50_ms")
+    row("KB between states / exec", "payload_kb_per_execution")
+    row("largest state KB", "largest_state_kb")
+    row("S3 GETs / exec", "s3_gets")
+    row("S3 PUTs / exec", "s3_puts")
+    row("S3 KB read / exec", "s3_kb_read")
+    for name in ("FetchImage", "Preprocessing", "AlexNetInference", "ResNetInference", "MobileNetInference"):
+        values = [rows[m]["state_p50_ms"].get(name) for m in ("inline", "claim_check")]
+        cells = ["-" if v is None else f"{v:.1f}" for v in values]
+        print(f"{'  ' + name + ' p50 ms':<28}{cells[0]:>14}{cells[1]:>14}")
+    for mode in ("inline", "claim_check"):
+        if rows[mode]["errors"]:
+            print(f"⚠️  {mode}: {rows[mode]['failed']} failed ({', '.join(rows[mode]['errors'])})")
+
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "executions": args.executions,
+                   "image_size": [args.width, args.height], "modes": rows}, f, indent=2)
+    print(f"📄 Results saved to: {args.output}")
+
+
+def batch(args):
+    harness = make_harness(args)
+    print(f"   Seeding {args.images} image(s) of {args.width}x{args.height}...")
+    image_ids = harness.seed_images(args.images, size=(args.width, args.height))
+    image_ids += [f"missing-{i}" for i in range(args.inject_failures)]
+    print()
+
+    function = harness.functions["batch_preprocessing"]
+    print(f"{'Pool':<10}{'workers':>8}{'images/s':>10}{'seconds':>9}{'ok':>7}{'failed':>8}{'shards':>8}")
+    print("-" * 60)
+    report = []
+    for pool in args.pools.split(","):
+        result = function.invoke({"image_ids": image_ids, "pool": pool, "workers": args.workers,
+                                  "shard_size": args.shard_size, "output_prefix": f"preprocessed/bench-{pool}/"})
+        report.append(result)
+        print(f"{result['pool']:<10}{result['workers']:>8}{result['images_per_s']:>10.1f}{result['elapsed_s']:>9.2f}"
+              f"{result['processed']:>7}{result['failed']:>8}{result['shards']:>8}")
+
+    manifest = json.loads(harness.s3.get_object(Bucket=harness.bucket, Key=report[-1]["manifest_key"])["Body"].read())
+    print(f"\nManifest {report[-1]['manifest_key']}: shape {manifest['shape']} {manifest['dtype']}, "
+          f"shards {[s['count'] for s in manifest['shards']]}")
+    for failure in manifest["failed"][:3]:
+        print(f"   ✗ {failure['image_id']}: {failure['error']}")
+
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "images": len(image_ids),
+                   "image_size": [args.width, args.height], "runs": report}, f, indent=2)
+    print(f"📄 Results saved to: {args.output}")
+    harness.close()
+
+
+def synthetic_results(image_id, rng, failure_rate):
+    """Aggregator input for one image, shaped like ml-inference output (rng is a random.Random)"""
+    event = {"image_id": image_id}
+    for model, top_k in (("alexnet", 5), ("resnet", 5), ("mobilenet", 3)):
+        if rng.random() < failure_rate:
+            event[f"{model}_result"] = {"statusCode": 500, "error": "injected", "inference_failed": True}
+            continue
+        labels = rng.sample(AGGREGATE_LABELS, top_k)
+        scores = sorted((round(rng.random(), 3) for _ in labels), reverse=True)
+        event[f"{model}_result"] = {"statusCode": 200, "image_id": image_id, "model_name": model,
+                                    "predictions": labels, "confidence_scores": scores,
+                                    "top_prediction": {"label": labels[0], "confidence": scores[0]},
+                                    "processing_time": 0.01, "model_version": f"{model} synthetic"}
+    return event
+
+
+def aggregate(args):
+    import random
+    harness = make_harness(args)
+    rng = random.Random(0)
+    table = harness.dynamodb.Table(harness.table)
+    images = []
+    for i in range(args.images):
+        image_id = f"agg-{i:06d}"
+        table.put_item(Item={"image_id": image_id, "workflow_stage": "image_uploaded", "s3_bucket": harness.bucket,
+                             "s3_key": f"raw-images/{image_id}_synthetic.jpg"})
+        images.append(synthetic_results(image_id, rng, args.failure_rate))
+    print(f"   {args.images} synthetic images, model failure rate {args.failure_rate:.0%}\n")
+
+    def stored():
+        """The table's items without timestamps, to compare the two aggregators"""
+        items = {}
+        for image in images:
+            item = table.get_item(Key={"image_id": image["image_id"]})["Item"]
+            for key in ("updated_at", "processing_completed_at"):
+                item.pop(key, None)
+            if isinstance(item.get("classification_results"), dict):  # RESULTS_ENCODING=full
+                item["classification_results"].pop("processing_timestamp", None)
+            items[image["image_id"]] = item
+        return items
+
+    print(f"{'Aggregator':<22}{'images/s':>10}{'seconds':>9}{'DynamoDB calls':>16}")
+    print("-" * 57)
+    rows = []
+    function = harness.functions["aggregator"]
+    before = sum(harness.dynamodb.stats()["calls"].values())
+    start = time.perf_counter()
+    for image in images:
+        function.invoke(image)
+    elapsed = time.perf_counter() - start
+    calls = sum(harness.dynamodb.stats()["calls"].values()) - before
+    rows.append({"mode": "per-image", "images_per_s": args.images / elapsed, "seconds": elapsed, "calls": calls})
+    reference = stored()
+
+    function = harness.functions["bulk_aggregator"]
+    for batch_size in [int(b) for b in args.batch_sizes.split(",") if b.strip()]:
+        before = sum(harness.dynamodb.stats()["calls"].values())
+        start = time.perf_counter()
+        failed = 0
+        for i in range(0, len(images), batch_size):
+            failed += len(function.invoke({"images": images[i:i + batch_size]})["failed"])
+        elapsed = time.perf_counter() - start
+        calls = sum(harness.dynamodb.stats()["calls"].values()) - before
+        rows.append({"mode": f"bulk x{batch_size}", "images_per_s": args.images / elapsed, "seconds": elapsed,
+                     "calls": calls, "matches_per_image": stored() == reference})
+    for row in rows:
+        print(f"{row['mode']:<22}{row['images_per_s']:>10.1f}{row['seconds']:>9.2f}{row['calls']:>16,}")
+
+    mismatched = [row["mode"] for row in rows if row.get("matches_per_image") is False]
+    if mismatched:
+        print(f"\n⚠️  Stored results differ from the per-image aggregator for: {', '.join(mismatched)}")
+    else:
+        print(f"\n   Bulk results identical to the per-image aggregator "
+              f"({failed} image(s) with every model failed were marked classification_failed)")
+
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "images": args.images,
+                   "dynamodb_latency_ms": args.dynamodb_latency_ms, "runs": rows}, f, indent=2)
+    print(f"📄 Results saved to: {args.output}")
+    harness.close()
+
+
+def capacity_units(size, unit):
+    return max(1, -(-size // unit))
+
+
+def comparable_results(results):
+    """classification_results without the fields that differ between two runs of the same image"""
+    results = json.loads(json.dumps(results, default=float))
+    results.pop("processing_timestamp", None)
+    for prediction in results["individual_predictions"].values():
+        prediction.pop("processing_time", None)
+    return results
+
+
+def encoding(args):
+    from local.standins import item_size_bytes
+    harness = make_harness(args)
+    image_ids = harness.seed_images(args.images, size=(args.width, args.height))
+    print(f"   Seeded {len(image_ids)} image(s) of {args.width}x{args.height}\n")
+    aggregator = harness.functions["aggregator"].module
+    fetch = harness.functions["fetch_image"].module
+    table = harness.dynamodb.Table(harness.table)
+
+    print(f"{'Encoding':<14}{'item B':>9}{'results B':>11}{'WCU/write':>11}{'RCU/read':>10}"
+          f"{'fetch read B':>14}{'decodes':>9}")
+    print("-" * 78)
+    rows, reference = [], {}
+    for name in args.encodings.split(","):
+        aggregator.RESULTS_ENCODING = name
+        executions = [harness.classify(image_id) for image_id in image_ids]
+        failed = [e for e in executions if e.status != "SUCCEEDED"]
+        if failed:
+            print(f"⚠️  {len(failed)} execution(s) failed with {name}: {failed[0].error} {failed[0].cause}")
+        items = [table.get_item(Key={"image_id": image_id})["Item"] for image_id in image_ids]
+        items = [item for item in items if "classification_results" in item]
+        projected = [table.get_item(Key={"image_id": image_id}, ProjectionExpression=fetch.METADATA_PROJECTION,
+                                    ExpressionAttributeNames=fetch.METADATA_PROJECTION_NAMES)["Item"]
+                     for image_id in image_ids]
+        decoded = {item["image_id"]: comparable_results(aggregator.load_classification_results(item))
+                   for item in items}
+        if not reference:
+            reference = decoded
+        item_bytes = [item_size_bytes(item) for item in items]
+        results_bytes = [item_size_bytes({"classification_results": item["classification_results"]})
+                         for item in items]
+        row = {
+            "encoding": name,
+            "item_bytes": statistics.mean(item_bytes),
+            "results_bytes": statistics.mean(results_bytes),
+            # an update is billed on the larger of the old and new item, per started 1 KB
+            "wcu_per_write": statistics.mean(capacity_units(b, 1024) for b in item_bytes),
+            # a read is billed on the whole item per started 4 KB, whatever the projection returns
+            "rcu_per_read": statistics.mean(capacity_units(b, 4096) for b in item_bytes),
+            "fetch_read_bytes": statistics.mean(item_size_bytes(p) for p in projected),
+            "decodes_to_full": decoded == reference
+        }
+        rows.append(row)
+        print(f"{name:<14}{row['item_bytes']:>9.0f}{row['results_bytes']:>11.0f}{row['wcu_per_write']:>11.2f}"
+              f"{row['rcu_per_read']:>10.2f}{row['fetch_read_bytes']:>14.0f}"
+              f"{'yes' if row['decodes_to_full'] else 'NO':>9}")
+
+    full = rows[0]
+    for row in rows[1:]:
+        print(f"   {row['encoding']}: {1 - row['item_bytes'] / full['item_bytes']:.0%} smaller items, "
+              f"{full['wcu_per_write'] - row['wcu_per_write']:.2f} WCU saved per aggregation")
+    print("   (RCU: strongly consistent reads; eventually consistent reads cost half. A projection cuts the bytes "
+          "returned, not the RCU)")
+
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "images": args.images, "encodings": rows}, f, indent=2)
+    print(f"📄 Results saved to: {args.output}")
+    harness.close()
+
+
+def fused(args):
+    """statemachine.json vs statemachine-fused.json on the same images"""
+    pipelines = {"two-state": STATEMACHINE_PATH, "fused": FUSED_STATEMACHINE_PATH}
+    rows = {}
+    for name, path in pipelines.items():
+        harness = make_harness(args, statemachine=path)
+        image_ids = harness.seed_images(args.images, size=(args.width, args.height))
+        harness.classify(image_ids[0])  # warm-up: first-use imports and model loads
+        before = harness.stats()
+        invocations_before = {fn: len(f.invocations) for fn, f in harness.functions.items()}
+        executions = [harness.classify(image_ids[i % len(image_ids)]) for i in range(args.executions)]
+        after = harness.stats()
+        ok = [e for e in executions if e.status == "SUCCEEDED"]
+        n = len(executions)
+
+        invocations, gb_s = 0, 0.0
+        for fn, function in harness.functions.items():
+            new = function.invocations[invocations_before[fn]:]
+            invocations += len(new)
+            gb_s += sum(ms for ms, _, _ in new) / 1000 * function.memory_mb / 1024
+        calls = {service: {op: count - before[service]["calls"].get(op, 0)
+                           for op, count in after[service]["calls"].items()} for service in ("s3", "dynamodb")}
+        dynamodb_reads = calls["dynamodb"].get("GetItem", 0)
+        dynamodb_writes = sum(calls["dynamodb"].get(op, 0) for op in ("UpdateItem", "PutItem"))
+        transitions = sum(len(e.events) for e in executions)
+        front = [sum(ev["end_ms"] - ev["start_ms"] for ev in e.events
+                     if ev["state"] in ("FetchImage", "Preprocessing", "FetchAndPreprocess")) for e in ok]
+        durations = sorted(e.duration_ms for e in ok)
+        cost = (gb_s * PRICES["lambda_gb_s"] + invocations * PRICES["lambda_request"]
+                + transitions * PRICES["sfn_transition"] + dynamodb_writes * PRICES["dynamodb_write"]
+                + dynamodb_reads * 0.5 * PRICES["dynamodb_read"]
+                + calls["s3"].get("GetObject", 0) * PRICES["s3_get"]
+                + calls["s3"].get("PutObject", 0) * PRICES["s3_put"])
+        rows[name] = {
+            "succeeded": len(ok),
+            "p50_ms": round(durations[len(durations) // 2], 2) if ok else None,
+            "fetch_preprocess_p50_ms": round(statistics.median(front), 2) if ok else None,
+            "invocations": invocations / n,
+            "lambda_gb_s": gb_s / n,
+            "transitions": transitions / n,
+            "dynamodb_calls": (dynamodb_reads + dynamodb_writes) / n,
+            "s3_gets": calls["s3"].get("GetObject", 0) / n,
+            "payload_kb": statistics.mean(e.payload_bytes for e in ok) / 1024 if ok else None,
+            "usd_per_million": cost / n * 1e6,
+        }
+        harness.close()
+        print()
+
+    print(f"🔗 Two-state vs fused fetch + preprocess, {args.executions} executions of {args.width}x{args.height} images")
+    print(f"{'':<32}{'two-state':>12}{'fused':>12}")
+    print("-" * 56)
+    for label, key, fmt in (("succeeded", "succeeded", "{}"), ("execution p50 ms", "p50_ms", "{:.1f}"),
+                            ("fetch+preprocess p50 ms", "fetch_preprocess_p50_ms", "{:.1f}"),
+                            ("Lambda invocations / image", "invocations", "{:.1f}"),
+                            ("Lambda GB-s / image", "lambda_gb_s", "{:.4f}"),
+                            ("state transitions / image", "transitions", "{:.1f}"),
+                            ("DynamoDB calls / image", "dynamodb_calls", "{:.1f}"),
+                            ("S3 GETs / image", "s3_gets", "{:.1f}"),
+                            ("KB between states / image", "payload_kb", "{:.1f}"),
+                            ("USD per 1M images", "usd_per_million", "{:.2f}")):
+        cells = ["-" if rows[p][key] is None else fmt.format(rows[p][key]) for p in pipelines]
+        print(f"{label:<32}{cells[0]:>12}{cells[1]:>12}")
+    print("   (cost: us-east-1 list prices for Lambda GB-s + requests, Step Functions Standard transitions,\n"
+          "    DynamoDB on-demand at 1 WRU per write and 0.5 RRU per read, S3 requests; local handler timings)")
+
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "executions": args.executions,
+                   "image_size": [args.width, args.height], "prices": PRICES, "pipelines": rows}, f, indent=2)
+    print(f"📄 Results saved to: {args.output}")
+
+
+def ingest(args):
+    """Workflow 1 with INGEST_UPLOAD=buffered vs =stream across object sizes"""
+    print(f"🧪 Ingestion upload benchmark (origin {args.source_bandwidth_mbps:g} Mbps, "
+          f"S3 {args.s3_bandwidth_mbps:g} Mbps per connection, {args.s3_latency_ms:g} ms per call)")
+    server, base_url = start_image_server(bandwidth_mbps=args.source_bandwidth_mbps)
+    log_file = None if args.handler_log == "-" else open(args.handler_log, "a")
+    sizes = [int(float(mb) * 1024 * 1024) for mb in args.sizes_mb.split(",") if mb.strip()]
+    env = {"MULTIPART_THRESHOLD_MB": str(args.threshold_mb), "MULTIPART_PART_MB": str(args.part_mb),
+           "UPLOAD_CONCURRENCY": str(args.concurrency)}
+    rows = []
+    for mode in ("buffered", "stream"):
+        s3 = LocalS3(args.s3_latency_ms, args.s3_bandwidth_mbps)
+        dynamodb = LocalDynamoDB(args.dynamodb_latency_ms)
+        function = load_functions(s3, dynamodb, env={**env, "INGEST_UPLOAD": mode}, names=["ingest"],
+                                  log_file=log_file)["ingest"]
+        for size in sizes:
+            url = f"{base_url}/bytes/{size}?random={size}"
+
+            # first run: keep the object and check it byte for byte (also warms the origin's cache)
+            s3.keep_bodies = True
+            expected = hashlib.sha256(requests.get(url, timeout=300).content).hexdigest()
+            body = json.loads(function.invoke({"image_url": url})["body"])
+            stored = s3.get_object(Bucket=body["metadata"]["s3_bucket"], Key=body["metadata"]["s3_key"])
+            intact = (hashlib.sha256(stored["Body"].read()).hexdigest() == expected
+                      == body["metadata"]["content_sha256"])
+            s3.objects.clear()
+            s3.keep_bodies = False
+
+            durations = []
+            for _ in range(args.iterations):
+                start = time.perf_counter()
+                function.invoke({"image_url": url})
+                durations.append((time.perf_counter() - start) * 1000)
+            calls_before = dict(s3.calls)
+            tracemalloc.start()
+            function.invoke({"image_url": url})
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            parts = s3.calls["UploadPart"] - calls_before.get("UploadPart", 0)
+
+            p50 = statistics.median(durations)
+            rows.append({"mode": mode, "size_bytes": size, "intact": intact, "p50_ms": round(p50, 1),
+                         "mb_per_s": round(size / 1e6 / (p50 / 1000), 1), "peak_mib": round(peak / 2 ** 20, 1),
+                         "parts": parts})
+            print(f"   {mode:<9}{size / 2 ** 20:>7.1f} MiB  {p50:>8.0f} ms  peak {peak / 2 ** 20:>6.1f} MiB  "
+                  f"{parts} part(s){'' if intact else '  ⚠️  stored bytes differ'}")
+    server.shutdown()
+
+    print(f"\n📦 Buffered vs streaming ingestion ({args.iterations} runs per cell, p50; "
+          f"multipart above {args.threshold_mb:g} MB, {args.part_mb:g} MB parts, {args.concurrency} in flight)")
+    print(f"{'size MiB':>9}{'buffered ms':>13}{'stream ms':>11}{'speedup':>9}{'buffered MiB':>14}{'stream MiB':>12}")
+    print("-" * 68)
+    by_key = {(r["mode"], r["size_bytes"]): r for r in rows}
+    for size in sizes:
+        buffered, stream = by_key[("buffered", size)], by_key[("stream", size)]
+        print(f"{size / 2 ** 20:>9.1f}{buffered['p50_ms']:>13.0f}{stream['p50_ms']:>11.0f}"
+              f"{buffered['p50_ms'] / stream['p50_ms']:>8.2f}x{buffered['peak_mib']:>14.1f}{stream['peak_mib']:>12.1f}")
+    print("   (peak = tracemalloc peak of the handler process during one invocation; the S3 stand-in "
+          "drops the bodies)")
+    if not all(r["intact"] for r in rows):
+        print("⚠️  Some stored objects did not match the source")
+
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "iterations": args.iterations,
+                   "source_bandwidth_mbps": args.source_bandwidth_mbps,
+                   "s3_bandwidth_mbps": args.s3_bandwidth_mbps, "s3_latency_ms": args.s3_latency_ms,
+                   "threshold_mb": args.threshold_mb, "part_mb": args.part_mb,
+                   "concurrency": args.concurrency, "results": rows}, f, indent=2)
+    print(f"📄 Results saved to: {args.output}")
+
+
+def ingest_batch(args):
+    """Workflow 1: one invocation per URL vs one batch invocation (image_urls) per concurrency setting"""
+    print(f"🧪 Batch ingestion benchmark ({args.urls} URLs of {args.width}x{args.height}, origin "
+          f"{args.origin_latency_ms:g} ms, S3 {args.s3_latency_ms:g} ms, DynamoDB {args.dynamodb_latency_ms:g} ms "
+          f"per call)")
+    server, base_url = start_image_server(latency_ms=args.origin_latency_ms)
+    log_file = None if args.handler_log == "-" else open(args.handler_log, "a")
+    urls = [f"{base_url}/{args.width}/{args.height}?random=u{i}" for i in range(args.urls)]
+    # unservable URLs (HTTP 400 from the origin) show per-URL failure isolation
+    step = max(1, len(urls) // (args.inject_failures + 1))
+    for n in range(args.inject_failures):
+        urls.insert((n + 1) * step, f"{base_url}/bytes/0?random=bad{n}")
+    for url in set(urls):
+        requests.get(url, timeout=30)  # let the origin encode every image before timing
+
+    def setup(concurrency):
+        s3 = LocalS3(args.s3_latency_ms)
+        dynamodb = LocalDynamoDB(args.dynamodb_latency_ms)
+        function = load_functions(s3, dynamodb, env={"INGEST_CONCURRENCY": str(concurrency)}, names=["ingest"],
+                                  log_file=log_file)["ingest"]
+        return s3, dynamodb, function
+
+    rows = []
+    s3, dynamodb, function = setup(1)
+    start = time.perf_counter()
+    statuses = [function.invoke({"image_url": url})["statusCode"] for url in urls]
+    elapsed = time.perf_counter() - start
+    rows.append({"mode": "per-URL invocations", "concurrency": 1, "ingested": statuses.count(200),
+                 "failed": len(statuses) - statuses.count(200), "invocations": len(urls),
+                 "elapsed_s": round(elapsed, 3), "images_per_s": round(statuses.count(200) / elapsed, 1),
+                 "s3_calls": dict(s3.calls), "dynamodb_calls": dict(dynamodb.calls)})
+
+    for concurrency in [int(c) for c in args.concurrency.split(",") if c.strip()]:
+        s3, dynamodb, function = setup(concurrency)
+        start = time.perf_counter()
+        body = json.loads(function.invoke({"image_urls": urls})["body"])
+        elapsed = time.perf_counter() - start
+        stored = len(dynamodb.Table("image-metadata").items)
+        rows.append({"mode": "batch", "concurrency": concurrency, "ingested": body["ingested"],
+                     "failed": body["failed"], "invocations": 1, "elapsed_s": round(elapsed, 3),
+                     "images_per_s": round(body["ingested"] / elapsed, 1), "unprocessed": len(body["unprocessed"]),
+                     "items_stored": stored, "s3_calls": dict(s3.calls), "dynamodb_calls": dict(dynamodb.calls)})
+        if stored != body["ingested"]:
+            print(f"⚠️  concurrency {concurrency}: {stored} items stored for {body['ingested']} ingested images")
+    server.shutdown()
+
+    baseline = rows[0]["images_per_s"]
+    print(f"\n📦 {len(urls)} URLs ({args.inject_failures} unservable)")
+    print(f"{'':<22}{'threads':>8}{'images/s':>10}{'speedup':>9}{'failed':>8}{'S3 calls':>10}{'DynamoDB calls':>22}")
+    print("-" * 89)
+    for row in rows:
+        writes = ", ".join(f"{n} {op}" for op, n in row["dynamodb_calls"].items())
+        print(f"{row['mode']:<22}{row['concurrency']:>8}{row['images_per_s']:>10.1f}"
+              f"{row['images_per_s'] / baseline:>8.1f}x{row['failed']:>8}{sum(row['s3_calls'].values()):>10}"
+              f"{writes:>22}")
+    print("   (per-URL invocations excludes API Gateway and Lambda invoke overhead, so the real gap is larger)")
+
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "urls": len(urls), "image_size": [args.width, args.height],
+                   "origin_latency_ms": args.origin_latency_ms, "s3_latency_ms": args.s3_latency_ms,
+                   "dynamodb_latency_ms": args.dynamodb_latency_ms, "results": rows}, f, indent=2)
+    print(f"📄 Results saved to: {args.output}")
+
+
+def dedup(args):
+    """Workflow 1 with each DEDUP_POLICY on workloads that repeat URLs or content"""
+    print(f"🧪 Ingestion dedup benchmark ({args.requests} requests per workload, origin {args.origin_latency_ms:g} ms, "
+          f"S3 {args.s3_latency_ms:g} ms, DynamoDB {args.dynamodb_latency_ms:g} ms per call)")
+    server, base_url = start_image_server(latency_ms=args.origin_latency_ms)
+    log_file = None if args.handler_log == "-" else open(args.handler_log, "a")
+    workloads = {
+        # the same URL every time, like a load test with a fixed IMAGE_URL
+        "fixed URL": [f"{base_url}/{args.width}/{args.height}"] * args.requests,
+        # a new ?random= value every time, but the local origin only has a few distinct images
+        "random params": [f"{base_url}/{args.width}/{args.height}?random={i}" for i in range(args.requests)],
+    }
+    rows = []
+    for workload, urls in workloads.items():
+        distinct = len({hashlib.sha256(requests.get(url, timeout=30).content).hexdigest() for url in set(urls)})
+        for policy in [p for p in args.policies.split(",") if p.strip()]:
+            s3 = LocalS3(args.s3_latency_ms)
+            dynamodb = LocalDynamoDB(args.dynamodb_latency_ms, key_names={DEDUP_TABLE: "dedup_key"})
+            env = {"DEDUP_TABLE_NAME": "" if policy == "off" else DEDUP_TABLE, "DEDUP_POLICY": policy}
+            function = load_functions(s3, dynamodb, env=env, names=["ingest"], log_file=log_file)["ingest"]
+            durations, results = [], []
+            for url in urls:
+                start = time.perf_counter()
+                response = function.invoke({"image_url": url})
+                durations.append((time.perf_counter() - start) * 1000)
+                results.append(json.loads(response["body"]).get("dedup", {}).get("result", "error"))
+            hits = sum(1 for r in results if r in ("url_hit", "content_hit"))
+            rows.append({"workload": workload, "policy": policy, "requests": len(urls), "distinct_images": distinct,
+                         "url_hits": results.count("url_hit"), "content_hits": results.count("content_hit"),
+                         "errors": results.count("error"), "hit_rate": round(hits / len(urls), 3),
+                         "p50_ms": round(statistics.median(durations), 1),
+                         "s3_objects": len(s3.objects), "mb_stored": sum(o["size"] for o in s3.objects.values()) / 1e6,
+                         "metadata_items": len(dynamodb.Table("image-metadata").items)})
+    server.shutdown()
+
+    print(f"\n📦 Dedup policies ({args.width}x{args.height} images)")
+    print(f"{'workload':<15}{'policy':<17}{'hit rate':>9}{'url':>6}{'content':>9}{'p50 ms':>8}{'objects':>9}"
+          f"{'MB stored':>11}")
+    print("-" * 84)
+    for row in rows:
+        print(f"{row['workload']:<15}{row['policy']:<17}{row['hit_rate']:>9.1%}{row['url_hits']:>6}"
+              f"{row['content_hits']:>9}{row['p50_ms']:>8.1f}{row['s3_objects']:>9}{row['mb_stored']:>11.2f}")
+        if row["errors"]:
+            print(f"⚠️  {row['errors']} failed requests")
+    print(f"   (distinct images: fixed URL {rows[0]['distinct_images']}, "
+          f"random params {rows[-1]['distinct_images']})")
+
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "image_size": [args.width, args.height],
+                   "origin_latency_ms": args.origin_latency_ms, "s3_latency_ms": args.s3_latency_ms,
+                   "dynamodb_latency_ms": args.dynamodb_latency_ms, "results": rows}, f, indent=2)
+    print(f"📄 Results saved to: {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline harness for the serverless workflows")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = sub.add_parser("serve", help="run the local HTTP gateway for load_test.py")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8080)
+    add_common_args(serve_parser)
+
+    bench_parser = sub.add_parser("bench", help="time each handler in-process")
+    bench_parser.add_argument("--iterations", type=int, default=20)
+    bench_parser.add_argument("--images", type=int, default=1, help="distinct seeded images to cycle through")
+    bench_parser.add_argument("--width", type=int, default=800)
+    bench_parser.add_argument("--height", type=int, default=600)
+    bench_parser.add_argument("--output", default="local_bench_results.json")
+    add_common_args(bench_parser)
+
+    run_parser = sub.add_parser("run", help="execute statemachine.json locally and print a timing waterfall")
+    run_parser.add_argument("--executions", type=int, default=5)
+    run_parser.add_argument("--images", type=int, default=1, help="distinct seeded images to cycle through")
+    run_parser.add_argument("--width", type=int, default=800)
+    run_parser.add_argument("--height", type=int, default=600)
+    run_parser.add_argument("--pool", choices=["thread", "process"], default="thread",
+                            help="how Parallel branches run")
+    run_parser.add_argument("--inference-mode", choices=["parallel", "multi_model"], default="parallel",
+                            help="ParallelInference (three invocations) or MultiModelInference (one)")
+    run_parser.add_argument("--retry-delay-scale", type=float, default=1.0,
+                            help="multiply Retry IntervalSeconds (0 = retry immediately)")
+    run_parser.add_argument("--output", default="local_run_results.json")
+    add_common_args(run_parser)
+
+    payload_parser = sub.add_parser("payload", help="compare inline and claim-check payload passing")
+    payload_parser.add_argument("--executions", type=int, default=20)
+    payload_parser.add_argument("--images", type=int, default=1, help="distinct seeded images to cycle through")
+    payload_parser.add_argument("--width", type=int, default=800)
+    payload_parser.add_argument("--height", type=int, default=600)
+    payload_parser.add_argument("--retry-delay-scale", type=float, default=0.0,
+                                help="multiply Retry IntervalSeconds (0 = retry immediately)")
+    payload_parser.add_argument("--output", default="local_payload_results.json")
+    add_common_args(payload_parser)
+
+    batch_parser = sub.add_parser("batch", help="run the batch preprocessing handler over many images")
+    batch_parser.add_argument("--images", type=int, default=200)
+    batch_parser.add_argument("--width", type=int, default=800)
+    batch_parser.add_argument("--height", type=int, default=600)
+    batch_parser.add_argument("--pools", default="process,thread", help="comma list of process,thread")
+    batch_parser.add_argument("--workers", type=int, default=None, help="default: CPUs available")
+    batch_parser.add_argument("--shard-size", type=int, default=64)
+    batch_parser.add_argument("--inject-failures", type=int, default=2,
+                              help="unknown image_ids added to show per-image failure isolation")
+    batch_parser.add_argument("--output", default="local_batch_results.json")
+    add_common_args(batch_parser)
+
+    aggregate_parser = sub.add_parser("aggregate", help="per-image vs bulk aggregator over synthetic results")
+    aggregate_parser.add_argument("--images", type=int, default=1000)
+    aggregate_parser.add_argument("--batch-sizes", default="100,1000", help="images per bulk invocation")
+    aggregate_parser.add_argument("--failure-rate", type=float, default=0.05,
+                                  help="chance that each model result is a failure")
+    aggregate_parser.add_argument("--output", default="local_aggregate_results.json")
+    add_common_args(aggregate_parser)
+
+    encoding_parser = sub.add_parser("encoding", help="DynamoDB item size per RESULTS_ENCODING")
+    encoding_parser.add_argument("--images", type=int, default=50)
+    encoding_parser.add_argument("--width", type=int, default=640)
+    encoding_parser.add_argument("--height", type=int, default=480)
+    encoding_parser.add_argument("--encodings", default="full,compact,compact_zlib",
+                                 help="comma list; the first is the reference for the decode check")
+    encoding_parser.add_argument("--output", default="local_encoding_results.json")
+    add_common_args(encoding_parser)
+
+    fused_parser = sub.add_parser("fused", help="FetchImage + Preprocessing vs the fused FetchAndPreprocess state")
+    fused_parser.add_argument("--executions", type=int, default=30)
+    fused_parser.add_argument("--images", type=int, default=5, help="distinct seeded images to cycle through")
+    fused_parser.add_argument("--width", type=int, default=640)
+    fused_parser.add_argument("--height", type=int, default=480)
+    fused_parser.add_argument("--output", default="local_fused_results.json")
+    add_common_args(fused_parser)
+
+    ingest_parser = sub.add_parser("ingest", help="buffered vs streaming multipart upload in Workflow 1")
+    ingest_parser.add_argument("--sizes-mb", default="0.5,4,16,64")
+    ingest_parser.add_argument("--iterations", type=int, default=3)
+    ingest_parser.add_argument("--source-bandwidth-mbps", type=float, default=400.0,
+                               help="transfer rate of the image origin")
+    ingest_parser.add_argument("--s3-bandwidth-mbps", type=float, default=400.0,
+                               help="transfer rate of each S3 request")
+    ingest_parser.add_argument("--threshold-mb", type=float, default=8.0, help="MULTIPART_THRESHOLD_MB")
+    ingest_parser.add_argument("--part-mb", type=float, default=8.0, help="MULTIPART_PART_MB")
+    ingest_parser.add_argument("--concurrency", type=int, default=4, help="UPLOAD_CONCURRENCY")
+    ingest_parser.add_argument("--output", default="local_ingest_results.json")
+    add_common_args(ingest_parser)
+
+    ingest_batch_parser = sub.add_parser("ingest-batch", help="per-URL vs batch ingestion in Workflow 1")
+    ingest_batch_parser.add_argument("--urls", type=int, default=300)
+    ingest_batch_parser.add_argument("--width", type=int, default=800)
+    ingest_batch_parser.add_argument("--height", type=int, default=600)
+    ingest_batch_parser.add_argument("--concurrency", default="1,4,16,32", help="INGEST_CONCURRENCY settings")
+    ingest_batch_parser.add_argument("--origin-latency-ms", type=float, default=50.0,
+                                     help="delay before the image server answers")
+    ingest_batch_parser.add_argument("--inject-failures", type=int, default=2, help="unservable URLs in the list")
+    ingest_batch_parser.add_argument("--output", default="local_ingest_batch_results.json")
+    add_common_args(ingest_batch_parser)
+    ingest_batch_parser.set_defaults(s3_latency_ms=20.0, dynamodb_latency_ms=5.0)
+
+    dedup_parser = sub.add_parser("dedup", help="ingestion with each DEDUP_POLICY on repeated URLs and content")
+    dedup_parser.add_argument("--requests", type=int, default=200, help="ingest calls per workload and policy")
+    dedup_parser.add_argument("--width", type=int, default=800)
+    dedup_parser.add_argument("--height", type=int, default=600)
+    dedup_parser.add_argument("--policies", default="off,url,content,url_and_content")
+    dedup_parser.add_argument("--origin-latency-ms", type=float, default=50.0,
+                              help="delay before the image server answers")
+    dedup_parser.add_argument("--output", default="local_dedup_results.json")
+    add_common_args(dedup_parser)
+    dedup_parser.set_defaults(s3_latency_ms=20.0, dynamodb_latency_ms=5.0)
+
+    args = parser.parse_args()
+    if args.command == "run" and args.pool == "process" and args.payload_mode == "claim_check":
+        parser.error("--pool process keeps a separate in-memory S3 per process, so claim_check "
+                     "references written by Preprocessing are not visible there; use --pool thread")
+    if args.command == "serve":
+        serve(args)
+    elif args.command == "run":
+        run(args)
+    elif args.command == "payload":
+        payload(args)
+    elif args.command == "batch":
+        batch(args)
+    elif args.command == "aggregate":
+        aggregate(args)
+    elif args.command == "encoding":
+        encoding(args)
+    elif args.command == "fused":
+        fused(args)
+    elif args.command == "ingest":
+        ingest(args)
+    elif args.command == "ingest-batch":
+        ingest_batch(args)
+    elif args.command == "dedup":
+        dedup(args)
+    else:
+        bench(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Mixed-workload helpers for load_test.py --mixed
+
+Workflow 1 and Workflow 2 run at the same time against the shared S3 bucket
+and DynamoDB table. Every image ID returned by an ingestion request goes into
+a FreshImagePool, and Workflow 2 classifies the newest image that has not been
+classified yet (read-after-write). It reuses a recent image when ingestion has
+not caught up, and falls back to IMAGE_ID before the first ingestion finishes.
+"""
+
+import json
+import random
+import threading
+import time
+from collections import Counter, deque
+
+from latency_recorder import LatencyHistogram
+
+
+def extract_image_id(body):
+    """image_id from a Workflow 1 response (API Gateway proxy body or raw Lambda result)."""
+    if not body:
+        return None
+    try:
+        data = json.loads(body)
+        if isinstance(data.get("body"), str):
+            data = json.loads(data["body"])
+        return data.get("image_id")
+    except (ValueError, AttributeError):
+        return None
+
+
+class FreshImagePool:
+    """
+    Image IDs created during the run, handed out newest first. Memory is
+    fixed for soak runs: at most max_fresh unclassified IDs are kept (the
+    oldest are dropped, they would be handed out last anyway) and the
+    write -> read gaps go into a histogram.
+    """
+
+    def __init__(self, fallback_id, window=1000, seed=None, max_fresh=10000):
+        self.fallback_id = fallback_id
+        self.fresh = deque(maxlen=max_fresh)  # (image_id, created) not classified yet
+        self.recent = deque(maxlen=window)    # already handed out, reused when nothing is fresh
+        self.sources = Counter()
+        self.ages = LatencyHistogram()
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+
+    def add(self, image_id):
+        with self.lock:
+            self.fresh.append((image_id, time.monotonic()))
+
+    def take(self):
+        """Return (image_id, source, ms since Workflow 1 created it or None)."""
+        with self.lock:
+            if self.fresh:
+                image_id, created = self.fresh.pop()
+                self.recent.append((image_id, created))
+                source = "fresh"
+            elif self.recent:
+                image_id, created = self.rng.choice(self.recent)
+                source = "reused"
+            else:
+                image_id, created, source = self.fallback_id, None, "fallback"
+            self.sources[source] += 1
+            if created is None:
+                return image_id, source, None
+            age_ms = round((time.monotonic() - created) * 1000, 2)
+            if source == "fresh":
+                self.ages.record(age_ms)
+            return image_id, source, age_ms
+
+
+def print_mixed_report(recorders, pool, workflow_names):
+    """Per-interval corrected latency of both workflows side by side, plus read-after-write stats."""
+    print("\n" + "="*60)
+    print("🔀 MIXED WORKLOAD TIMELINE (corrected latency)")
+    print("="*60)
+    timelines = {w: dict(r.interval_summaries()) for w, r in recorders.items()}
+    workflows = sorted(timelines)
+    print("  start   " + "".join(f"{workflow_names.get(w, w).split(' (')[0]:<33}" for w in workflows))
+    for start in sorted(set().union(*timelines.values()) if timelines else ()):
+        row = f"  {start:5.0f}s  "
+        for w in workflows:
+            stats = timelines[w].get(start)
+            row += (f"n={stats['count']:<5} p50 {stats['p50']:7.0f} p99 {stats['p99']:7.0f}  " if stats
+                    else " " * 33)
+        print(row)
+
+    total = sum(pool.sources.values())
+    if total:
+        print(f"\nWorkflow 2 image IDs ({total} requests):")
+        for source in ("fresh", "reused", "fallback"):
+            count = pool.sources.get(source, 0)
+            print(f"  {source:<9} {count:6d} ({count / total * 100:5.1f}%)")
+        if pool.ages.count:
+            print(f"  write -> read gap: median {pool.ages.percentile(50):.0f}ms, "
+                  f"min {pool.ages.min:.0f}ms, max {pool.ages.max:.0f}ms")
+    print("="*60)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Open-loop asyncio load engine used by load_test.py
+
+Requests are fired on a precomputed arrival schedule (constant or Poisson)
+regardless of how long earlier requests take, so the offered rate does not
+silently drop when latency grows. A concurrency cap bounds in-flight
+requests; when it is hit, requests queue and the delay shows up as the gap
+between their scheduled and actual send times.
+"""
+
+import asyncio
+import random
+import time
+from datetime import datetime
+
+import aiohttp
+
+
+def constant_schedule(rps, duration):
+    """Evenly spaced send offsets (seconds from start)."""
+    interval = 1.0 / rps
+    for i in range(int(duration * rps)):
+        yield i * interval
+
+
+def poisson_schedule(rps, duration, seed=None):
+    """Poisson arrivals: exponential inter-arrival gaps with mean 1/rps."""
+    rng = random.Random(seed)
+    t = rng.expovariate(rps)
+    while t < duration:
+        yield t
+        t += rng.expovariate(rps)
+
+
+ARRIVALS = {
+    "constant": constant_schedule,
+    "poisson": poisson_schedule,
+}
+
+
+def make_schedule(arrival, rps, duration, seed=None):
+    if arrival not in ARRIVALS:
+        raise ValueError(f"Unknown arrival process: {arrival}")
+    if arrival == "poisson":
+        return poisson_schedule(rps, duration, seed)
+    return constant_schedule(rps, duration)
+
+
+class OpenLoopEngine:
+    """Fires HTTP POSTs on a schedule and reports one result dict per request."""
+
+    def __init__(self, on_result, max_concurrency=256, timeout=30, verbose=True):
+        self.on_result = on_result
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.verbose = verbose
+        self.sent = 0
+        self.completed = 0
+
+    async def _fire(self, session, semaphore, workflow, request_id, url, payload, scheduled, t0):
+        loop = asyncio.get_running_loop()
+        async with semaphore:
+            sent = loop.time()
+            try:
+                async with session.post(url, json=payload) as response:
+                    text = await response.text()
+                    end = loop.time()
+                    success = response.status == 200
+                    status_code = response.status
+                    error = None if success else text[:100]
+                    body = text if success else None
+            except Exception as e:
+                end = loop.time()
+                success, status_code, body = False, 0, None
+                error = str(e)[:100] or type(e).__name__
+
+        self.completed += 1
+        result = {
+            "workflow": workflow,
+            "request_id": request_id,
+            "timestamp": datetime.now().isoformat(),
+            "status_code": status_code,
+            "response_time": round((end - sent) * 1000, 2),  # ms
+            "success": success,
+            "error": error,
+            "scheduled_at": round(scheduled, 4),          # s from test start
+            "sent_at": round(sent - t0, 4),               # s from test start
+            "send_lag_ms": round((sent - (t0 + scheduled)) * 1000, 2),
+        }
+        self.on_result(result, body)
+
+        if self.verbose:
+            status = "✅" if success else "❌"
+            detail = f"{result['response_time']}ms" if status_code else f"Error - {error[:50]}"
+            print(f"   {status} Request {request_id}: {detail}")
+
+    async def _progress(self, start):
+        while True:
+            await asyncio.sleep(5)
+            in_flight = self.sent - self.completed
+            print(f"   … {time.time() - start:5.0f}s: sent {self.sent}, "
+                  f"completed {self.completed}, in flight {in_flight}")
+
+    async def run(self, workflow, url, payload_fn, schedule):
+        """Send one request per schedule offset; payload_fn(request_id) builds each body."""
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        pending = set()
+        loop = asyncio.get_running_loop()
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            ticker = None if self.verbose else asyncio.create_task(self._progress(time.time()))
+            t0 = loop.time()
+            for offset in schedule:
+                delay = t0 + offset - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self.sent += 1
+                task = asyncio.create_task(self._fire(session, semaphore, workflow, self.sent,
+                                                      url, payload_fn(self.sent), offset, t0))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending)
+            if ticker:
+                ticker.cancel()
+        return self.sent
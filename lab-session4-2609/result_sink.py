@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Streaming result sinks for load_test.py
+
+Results are handed to a bounded queue and written by a background thread as
+they arrive, so memory stays flat for multi-hour runs and a crash or Ctrl-C
+keeps everything written so far. If the writer falls behind or fails, rows are
+dropped and counted rather than blocking the caller or raising in it:
+
+  - JsonlSink:   one compact JSON object per line, flushed every batch
+                 (a partially written file is still readable line by line)
+  - ParquetSink: one row group per `row_group_size` results (needs pyarrow;
+                 the file is only readable once the sink is closed)
+
+iter_results(path) streams the rows back from either format, so summaries can
+be computed without loading the whole file (see `load_test.py --summarize`).
+"""
+
+import json
+import queue
+import threading
+
+_STOP = object()
+
+# Column types for the result schema written by open_loop.py; extra fields
+# added by other modes are inferred from the first row group.
+BASE_PARQUET_FIELDS = {
+    "workflow": "string",
+    "request_id": "int64",
+    "timestamp": "string",
+    "status_code": "int64",
+    "response_time": "float64",
+    "success": "bool_",
+    "error": "string",
+    "scheduled_at": "float64",
+    "sent_at": "float64",
+    "send_lag_ms": "float64",
+    # set by --mixed / --corpus (null for other rows)
+    "image_id": "string",
+    "image_source": "string",
+    "image_age_ms": "float64",
+    "first_touch": "bool_",
+    "image_rank": "int64",
+}
+
+
+class _BackgroundSink:
+    """Bounded queue + writer thread; subclasses implement _write_batch/_close_file."""
+
+    def __init__(self, path, max_queue=10000, batch_size=1000):
+        self.path = path
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.written = 0
+        self.dropped = 0
+        self.error = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"sink-{path}", daemon=True)
+        self._thread.start()
+
+    def write(self, result):
+        """
+        Queue one result without blocking. If the writer is max_queue rows
+        behind, the row is dropped and counted instead: write() runs on the
+        load generator's event loop, and blocking there would delay the
+        scheduled sends (the send lag the results are measuring).
+        """
+        if self.error:
+            self.dropped += 1  # the writer has failed; close() reports why
+            return
+        try:
+            self.queue.put_nowait(result)
+        except queue.Full:
+            if not self.dropped:
+                print(f"⚠️  {self.path}: writer is {self.queue.maxsize} rows behind, dropping detailed results "
+                      f"(summary statistics are unaffected)")
+            self.dropped += 1
+
+    def _run(self):
+        batch = []
+        try:
+            while True:
+                item = self.queue.get()
+                if item is not _STOP:
+                    batch.append(item)
+                # write when the batch is full, the queue is momentarily empty, or on stop
+                if batch and (item is _STOP or len(batch) >= self.batch_size or self.queue.empty()):
+                    self._write_batch(batch)
+                    self.written += len(batch)
+                    batch = []
+                if item is _STOP:
+                    break
+        except Exception as e:
+            self.error = e
+        finally:
+            self._close_file()
+
+    def close(self):
+        """Drain the queue and close the file; safe to call more than once."""
+        if self._closed:
+            return
+        self._closed = True
+        # a writer that failed never drains the queue again, so only wait for room while it runs
+        while self._thread.is_alive() and self.error is None:
+            try:
+                self.queue.put(_STOP, timeout=0.5)
+                break
+            except queue.Full:
+                continue
+        self._thread.join()
+        if self.error:
+            print(f"⚠️  Writing {self.path} failed after {self.written} rows: {self.error} "
+                  f"({self.dropped} rows dropped)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JsonlSink(_BackgroundSink):
+    def __init__(self, path, **kwargs):
+        self._file = open(path, "w", buffering=1024 * 1024)
+        super().__init__(path, **kwargs)
+
+    def _write_batch(self, batch):
+        self._file.write("".join(json.dumps(row, separators=(",", ":")) + "\n" for row in batch))
+        self._file.flush()
+
+    def _close_file(self):
+        self._file.close()
+
+
+class ParquetSink(_BackgroundSink):
+    def __init__(self, path, row_group_size=10000, **kwargs):
+        import pyarrow  # noqa: F401  (fail fast if pyarrow is missing)
+        self._writer = None
+        self._schema = None
+        self._pending = []
+        self.row_group_size = row_group_size
+        super().__init__(path, batch_size=row_group_size, **kwargs)
+
+    def _schema_for(self, rows):
+        import pyarrow as pa
+        fields = [pa.field(name, getattr(pa, kind)()) for name, kind in BASE_PARQUET_FIELDS.items()]
+        inferred = pa.Table.from_pylist(rows).schema
+        for field in inferred:
+            if field.name not in BASE_PARQUET_FIELDS:
+                fields.append(pa.field(field.name, pa.string() if pa.types.is_null(field.type) else field.type))
+        return pa.schema(fields)
+
+    def _write_batch(self, batch):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        # accumulate to full row groups; small row groups make Parquet slow to scan
+        self._pending.extend(batch)
+        if len(self._pending) >= self.row_group_size:
+            self._flush(pa, pq)
+
+    def _flush(self, pa, pq):
+        if not self._pending:
+            return
+        if self._writer is None:
+            self._schema = self._schema_for(self._pending)
+            self._writer = pq.ParquetWriter(self.path, self._schema, compression="zstd")
+        self._writer.write_table(pa.Table.from_pylist(self._pending, schema=self._schema))
+        self._pending = []
+
+    def _close_file(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._flush(pa, pq)
+        if self._writer is not None:
+            self._writer.close()
+
+
+def open_sink(path, **kwargs):
+    """Pick the sink from the file extension (.parquet -> Parquet, anything else -> JSONL)."""
+    if path.endswith(".parquet"):
+        return ParquetSink(path, **kwargs)
+    return JsonlSink(path, **kwargs)
+
+
+def iter_results(path):
+    """Stream result rows back from a JSONL or Parquet results file."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches():
+            yield from batch.to_pylist()
+        return
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                break  # truncated last line after a crash
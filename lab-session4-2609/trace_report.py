@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Latency waterfall report for Workflow 2
+
+Each handler appends a span [stage, start_ms, end_ms, cold_start, bytes_in,
+bytes_out] to the trace context carried in the state, and the aggregator logs
+the whole execution as one "TRACE {json}" line (see
+workflow2-stepfunctions/aggregator/src/lambda_function.py). This script
+collects those lines, from a local handler log (local_harness.py run
+--handler-log) or from the aggregator's CloudWatch log group after a load
+test, and summarises where the end-to-end time went:
+
+  - per stage: invocations, p50/p95 duration, cold starts, payload sizes
+  - critical path: each stage's share of the total end-to-end time, and the
+    share spent outside any handler (state transitions, Lambda invoke
+    latency and cold-start init, shown as "overhead")
+  - which model branch was the slowest, and how cold starts move the p50
+
+Span times come from each function's own clock, so offsets between stages
+are only as good as the clock sync between Lambda hosts (normally well under
+a millisecond, but a negative wait is possible).
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+DEFAULT_LOG_GROUP = "/aws/lambda/serverless-lab-workflow2-aggregator"
+MARKER = "TRACE "
+
+
+def parse_trace(line):
+    """The waterfall in a log line, or None (CloudWatch prefixes lines with a timestamp and request ID)."""
+    index = line.find(MARKER + "{")
+    if index < 0:
+        return None
+    try:
+        return json.loads(line[index + len(MARKER):])
+    except json.JSONDecodeError:
+        return None
+
+
+def read_log_files(paths):
+    traces = []
+    for path in paths:
+        with open(path) as f:
+            traces.extend(t for t in map(parse_trace, f) if t is not None)
+    return traces
+
+
+def read_log_group(log_group, since_minutes, region=None):
+    """TRACE lines logged to the aggregator's log group in the last `since_minutes`."""
+    import boto3
+    logs = boto3.client("logs", region_name=region or os.getenv("AWS_REGION", "ap-south-1"))
+    kwargs = {"logGroupName": log_group, "filterPattern": '"TRACE"',
+              "startTime": int((time.time() - since_minutes * 60) * 1000)}
+    traces = []
+    for page in logs.get_paginator("filter_log_events").paginate(**kwargs):
+        traces.extend(t for t in (parse_trace(e["message"]) for e in page["events"]) if t is not None)
+    return traces
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def summarize(traces):
+    # an aggregator retry logs the same execution twice; keep the last one
+    by_execution = {}
+    for trace in traces:
+        by_execution[trace.get("execution") or id(trace)] = trace
+    traces = list(by_execution.values())
+
+    total_ms = sum(t["end_to_end_ms"] for t in traces)
+    stages = defaultdict(lambda: {"durations": [], "cold": 0, "bytes_in": 0, "bytes_out": 0,
+                                  "critical": 0, "critical_ms": 0, "wait_ms": 0})
+    for trace in traces:
+        for span in trace["spans"]:
+            stage = stages[span["stage"]]
+            stage["durations"].append(span["duration_ms"])
+            stage["cold"] += span["cold"]
+            stage["bytes_in"] += span["bytes_in"]
+            stage["bytes_out"] += span["bytes_out"]
+            if span["critical"]:
+                stage["critical"] += 1
+                stage["critical_ms"] += span["duration_ms"]
+                stage["wait_ms"] += span["wait_ms"] or 0
+
+    per_stage = {}
+    for name, stage in sorted(stages.items(), key=lambda item: -item[1]["critical_ms"]):
+        count = len(stage["durations"])
+        per_stage[name] = {
+            "invocations": count,
+            "p50_ms": percentile(stage["durations"], 50),
+            "p95_ms": percentile(stage["durations"], 95),
+            "cold_starts": stage["cold"],
+            "avg_bytes_in": round(stage["bytes_in"] / count),
+            "avg_bytes_out": round(stage["bytes_out"] / count),
+            "on_critical_path": stage["critical"],
+            "critical_share": round(stage["critical_ms"] / total_ms, 4) if total_ms else 0.0,
+            "avg_wait_before_ms": round(stage["wait_ms"] / stage["critical"], 1) if stage["critical"] else None,
+        }
+
+    end_to_end = [t["end_to_end_ms"] for t in traces]
+    cold = [t["end_to_end_ms"] for t in traces if any(s["cold"] for s in t["spans"])]
+    warm = [t["end_to_end_ms"] for t in traces if not any(s["cold"] for s in t["spans"])]
+    slowest_branch = defaultdict(int)
+    for trace in traces:
+        for stage in trace["critical_path"]:
+            if stage.startswith("ml_inference"):
+                slowest_branch[stage] += 1
+    return {
+        "executions": len(traces),
+        "end_to_end_ms": {"p50": percentile(end_to_end, 50), "p95": percentile(end_to_end, 95),
+                          "p99": percentile(end_to_end, 99), "max": max(end_to_end, default=None)},
+        "overhead_share": round(sum(t["overhead_ms"] for t in traces) / total_ms, 4) if total_ms else 0.0,
+        "overhead_ms_p50": percentile([t["overhead_ms"] for t in traces], 50),
+        "cold_executions": len(cold),
+        "cold_p50_ms": percentile(cold, 50),
+        "warm_p50_ms": percentile(warm, 50),
+        "slowest_branch": dict(slowest_branch),
+        "stages": per_stage,
+    }
+
+
+def print_report(summary):
+    e2e = summary["end_to_end_ms"]
+    print(f"Executions: {summary['executions']} (with a cold start: {summary['cold_executions']})")
+    print(f"End-to-end ms: p50 {e2e['p50']}, p95 {e2e['p95']}, p99 {e2e['p99']}, max {e2e['max']}")
+    if summary["cold_executions"]:
+        print(f"p50 with a cold start: {summary['cold_p50_ms']} ms, all warm: {summary['warm_p50_ms']} ms")
+    print()
+    print(f"{'Stage':<28}{'calls':>7}{'p50 ms':>9}{'p95 ms':>9}{'cold':>6}{'in KB':>9}{'out KB':>9}"
+          f"{'critical':>10}{'share':>8}")
+    for name, stage in summary["stages"].items():
+        print(f"{name:<28}{stage['invocations']:>7}{stage['p50_ms']:>9}{stage['p95_ms']:>9}"
+              f"{stage['cold_starts']:>6}{stage['avg_bytes_in'] / 1024:>9.1f}{stage['avg_bytes_out'] / 1024:>9.1f}"
+              f"{stage['on_critical_path']:>10}{stage['critical_share']:>8.1%}")
+    print(f"{'overhead (outside handlers)':<28}{'':>7}{summary['overhead_ms_p50']:>9}{'':>9}{'':>6}{'':>9}{'':>9}"
+          f"{'':>10}{summary['overhead_share']:>8.1%}")
+    if summary["slowest_branch"]:
+        branches = ", ".join(f"{name} {count}" for name, count in
+                             sorted(summary["slowest_branch"].items(), key=lambda item: -item[1]))
+        print(f"\nSlowest inference branch: {branches}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise the Workflow 2 latency waterfalls (aggregator TRACE lines)")
+    parser.add_argument("--log", action="append", metavar="FILE",
+                        help="local handler log (local_harness.py --handler-log); repeatable")
+    parser.add_argument("--log-group", default=DEFAULT_LOG_GROUP, help="aggregator log group in CloudWatch Logs")
+    parser.add_argument("--since-minutes", type=float, default=30, help="CloudWatch: how far back to read")
+    parser.add_argument("--region", help="CloudWatch: AWS region (default AWS_REGION or ap-south-1)")
+    parser.add_argument("--output", default="trace_report.json")
+    args = parser.parse_args()
+
+    print("🧪 Workflow 2 latency waterfall report")
+    if args.log:
+        print(f"   Reading: {', '.join(args.log)}")
+        traces = read_log_files(args.log)
+    else:
+        print(f"   Reading: {args.log_group} (last {args.since_minutes:g} minutes)")
+        traces = read_log_group(args.log_group, args.since_minutes, args.region)
+    if not traces:
+        print("⚠️  No TRACE lines found (is the aggregator deployed with trace propagation?)")
+        sys.exit(1)
+    print()
+
+    summary = summarize(traces)
+    print_report(summary)
+    with open(args.output, "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"\n📄 Report saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import json
+import time
+
+from botocore.exceptions import ClientError
+
+# DEDUP_POLICY values
+#   off:             every call stores a new image (the original behaviour)
+#   url:             a URL that was ingested before is not downloaded again (assumes URLs are immutable;
+#                    picsum.photos?random=N URLs are not)
+#   content:         the bytes are downloaded and hashed, but identical content is stored only once
+#   url_and_content: both checks
+POLICIES = ('off', 'url', 'content', 'url_and_content')
+METRICS_NAMESPACE = 'ServerlessLab/Ingestion'
+# What a dedup entry holds about the image it points at
+ENTRY_ATTRIBUTES = ('image_id', 's3_key', 's3_url', 'created_at', 'content_sha256', 'file_size')
+
+class DedupIndex:
+    """
+    The dedup table: one item per ingested URL ("url#<url>") and per distinct
+    content ("sha256#<hex>"), each pointing at the image_id that holds it.
+
+    Content entries are claimed with a conditional put before the S3 upload,
+    so two concurrent ingests of the same bytes cannot both store them: the
+    loser's claim fails and it returns the winner's image_id instead. A new
+    image's URL entry is written only after its metadata item (commit), and
+    its claim is released if that write fails (release): an entry must never
+    point at an image_id Workflow 2 cannot find.
+    """
+
+    def __init__(self, table, policy):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown DEDUP_POLICY: {policy} (expected one of {', '.join(POLICIES)})")
+        self.table = table
+        self.policy = policy
+        self.by_url = policy in ('url', 'url_and_content')
+        self.by_content = policy in ('content', 'url_and_content')
+
+    def lookup_url(self, image_url):
+        if not self.by_url:
+            return None
+        return self.table.get_item(Key={'dedup_key': f"url#{image_url}"}).get('Item')
+
+    def record_url(self, image_url, entry):
+        if self.by_url:
+            self.table.put_item(Item={**entry, 'dedup_key': f"url#{image_url}"})
+
+    def claim_content(self, sha256, entry):
+        """Register entry as the holder of this content; returns the existing holder instead if there is one"""
+        try:
+            self.table.put_item(
+                Item={**entry, 'dedup_key': f"sha256#{sha256}"},
+                ConditionExpression='attribute_not_exists(dedup_key)'
+            )
+            return None
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+        existing = self.table.get_item(Key={'dedup_key': f"sha256#{sha256}"}, ConsistentRead=True).get('Item')
+        # the holder may have released its claim in between (its upload failed); claim again
+        return existing or self.claim_content(sha256, entry)
+
+    def commit(self, item, image_url=None):
+        """Point a URL (by default the item's own) at an image whose metadata item is written"""
+        self.record_url(image_url or item['original_url'], {k: item[k] for k in ENTRY_ATTRIBUTES if k in item})
+
+    def release(self, item):
+        """Undo the content claim of a new image whose metadata item could not be written"""
+        if self.by_content:
+            self.release_content(item['content_sha256'])
+
+    def release_content(self, sha256):
+        """Undo a claim whose image was never stored"""
+        try:
+            self.table.delete_item(Key={'dedup_key': f"sha256#{sha256}"})
+        except Exception as e:
+            print(f"Failed to release dedup claim for sha256 {sha256}: {str(e)}")
+
+def metrics_line(policy, counts):
+    """
+    One CloudWatch Embedded Metric Format log line: CloudWatch turns the
+    counts into metrics (namespace ServerlessLab/Ingestion, dimension
+    DedupPolicy) without any API call from the function.
+    """
+    names = ('DedupUrlHits', 'DedupContentHits', 'DedupMisses', 'DedupBytesSkipped')
+    return json.dumps({
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['DedupPolicy']],
+                'Metrics': [{'Name': name, 'Unit': 'Bytes' if name == 'DedupBytesSkipped' else 'Count'}
+                            for name in names]
+            }]
+        },
+        'DedupPolicy': policy,
+        **{name: counts.get(name, 0) for name in names}
+    })
@@ -1,11 +1,18 @@
 import json
 import boto3
+import hashlib
 import requests
+import time
 import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlparse
 import os
 
+from dedup_index import DedupIndex, metrics_line
+from streaming_upload import MB, StreamingUpload
+
 # Initialize AWS clients
 s3_client = boto3.client('s3')
 dynamodb = boto3.resource('dynamodb')
@@ -13,6 +20,33 @@ dynamodb = boto3.resource('dynamodb')
 # Environment variables
 BUCKET_NAME = os.environ['S3_BUCKET_NAME']
 TABLE_NAME = os.environ['DYNAMODB_TABLE_NAME']
+# stream: pipe the download into S3 as it arrives (multipart above the threshold)
+# buffered: download the whole image, then one PutObject (the original behaviour)
+INGEST_UPLOAD = os.environ.get('INGEST_UPLOAD', 'stream')
+MULTIPART_THRESHOLD = int(float(os.environ.get('MULTIPART_THRESHOLD_MB', '8')) * MB)
+MULTIPART_PART_SIZE = int(float(os.environ.get('MULTIPART_PART_MB', '8')) * MB)
+UPLOAD_CONCURRENCY = int(os.environ.get('UPLOAD_CONCURRENCY', '4'))
+DOWNLOAD_CHUNK = 256 * 1024
+# Batch ingestion (image_urls / manifest): downloads in flight, and the time kept back for writing the results
+INGEST_CONCURRENCY = int(os.environ.get('INGEST_CONCURRENCY', '16'))
+BATCH_TIME_MARGIN_MS = 15000
+BATCH_WRITE_SIZE = 25  # items per BatchWriteItem call
+
+# Deduplication (dedup_index.py): off unless DEDUP_TABLE_NAME is set
+DEDUP_TABLE_NAME = os.environ.get('DEDUP_TABLE_NAME', '')
+DEDUP_POLICY = os.environ.get('DEDUP_POLICY', 'content') if DEDUP_TABLE_NAME else 'off'
+DEDUP_HITS = ('url_hit', 'content_hit')
+
+# One pooled session per container: connections are kept alive across URLs and warm invocations
+http_session = requests.Session()
+http_session.mount('http://', HTTPAdapter(pool_connections=INGEST_CONCURRENCY, pool_maxsize=INGEST_CONCURRENCY))
+http_session.mount('https://', HTTPAdapter(pool_connections=INGEST_CONCURRENCY, pool_maxsize=INGEST_CONCURRENCY))
+
+# The attributes this function writes; Workflow 2 later adds classification results to the item
+METADATA_PROJECTION = ('image_id, original_url, s3_bucket, s3_key, s3_url, original_filename, content_type, '
+                       'file_size, content_sha256, upload_timestamp, #status, workflow_stage, '
+                       'created_at, updated_at')
+METADATA_PROJECTION_NAMES = {'#status': 'status'}
 
 def lambda_handler(event, context):
     """
@@ -25,6 +59,15 @@ def lambda_handler(event, context):
     {
         "image_url": "https://example.com/image.jpg"
     }
+    
+    Batch input (see ingest_batch):
+    {
+        "image_urls": ["https://...", ...]
+    }
+    or
+    {
+        "manifest": {"bucket": "...", "key": "..."}
+    }
     """
     
     try:
@@ -32,75 +75,69 @@ def lambda_handler(event, context):
         if 'body' in event:
             # If called via API Gateway
             body = json.loads(event['body'])
-            image_url = body['image_url']
         else:
             # If called directly
-            image_url = event['image_url']
-        
-        print(f"Processing image URL: {image_url}")
-        
-        # Generate unique image ID
-        image_id = str(uuid.uuid4())
-        timestamp = datetime.utcnow().isoformat()
-        
-        # Extract filename from URL
-        parsed_url = urlparse(image_url)
-        original_filename = os.path.basename(parsed_url.path)
-        if not original_filename or '.' not in original_filename:
-            original_filename = f"image_{image_id}.jpg"
+            body = event
         
-        # Generate S3 key
-        s3_key = f"raw-images/{image_id}_{original_filename}"
-        
-        # Step 1: Download image from URL
-        print(f"Downloading image from: {image_url}")
-        response = requests.get(image_url, timeout=30)
-        response.raise_for_status()
+        if 'image_urls' in body or 'manifest' in body:
+            image_urls = body['image_urls'] if 'image_urls' in body else read_manifest(body['manifest'])
+            if not image_urls:
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': 'Bad request', 'message': 'No image URLs given'})
+                }
+            return ingest_batch(image_urls, context)
         
-        image_data = response.content
-        content_type = response.headers.get('content-type', 'image/jpeg')
-        image_size = len(image_data)
+        image_url = body['image_url']
+        print(f"Processing image URL: {image_url}")
         
-        print(f"Downloaded image: {image_size} bytes, content-type: {content_type}")
+        # Steps 1 + 2: Download image from URL and upload it to S3 (unless it is already stored)
+        metadata, dedup = ingest_image(image_url)
+        image_id = metadata['image_id']
+        s3_url = metadata['s3_url']
+        if DEDUP_POLICY != 'off':
+            print(metrics_line(DEDUP_POLICY, dedup_counts([dedup])))
         
-        # Step 2: Upload image to S3
-        print(f"Uploading to S3: s3://{BUCKET_NAME}/{s3_key}")
-        s3_client.put_object(
-            Bucket=BUCKET_NAME,
-            Key=s3_key,
-            Body=image_data,
-            ContentType=content_type,
-            Metadata={
-                'original-url': image_url,
-                'image-id': image_id,
-                'upload-timestamp': timestamp
+        if dedup['result'] in DEDUP_HITS:
+            print(f"Duplicate of image_id {image_id} ({dedup['result']}), nothing stored")
+            if dedup['result'] == 'content_hit':
+                if not metadata_exists(image_id):
+                    # the holder is still being ingested by another call: its item (or its failure) is not known yet
+                    return {
+                        'statusCode': 409,
+                        'body': json.dumps({
+                            'error': 'Ingestion pending',
+                            'message': 'An image with the same content is still being ingested; retry shortly',
+                            'image_id': image_id,
+                            'pending': True,
+                            'dedup': dedup
+                        })
+                    }
+                dedup_index().commit(metadata, image_url)
+            return {
+                'statusCode': 200,
+                'body': json.dumps({
+                    'message': 'Image already ingested',
+                    'image_id': image_id,
+                    's3_url': s3_url,
+                    'duplicate': True,
+                    'dedup': dedup
+                })
             }
-        )
-        
-        # Generate public URL for the uploaded image
-        s3_url = f"https://{BUCKET_NAME}.s3.amazonaws.com/{s3_key}"
         
-        # Step 3: Store metadata in DynamoDB
+        # Step 3: Store metadata in DynamoDB, then point the dedup entries at it
         table = dynamodb.Table(TABLE_NAME)
-        
-        metadata = {
-            'image_id': image_id,
-            'original_url': image_url,
-            's3_bucket': BUCKET_NAME,
-            's3_key': s3_key,
-            's3_url': s3_url,
-            'original_filename': original_filename,
-            'content_type': content_type,
-            'file_size': image_size,
-            'upload_timestamp': timestamp,
-            'status': 'uploaded',
-            'workflow_stage': 'ingestion_complete',
-            'created_at': timestamp,
-            'updated_at': timestamp
-        }
+        index = dedup_index()
         
         print(f"Storing metadata in DynamoDB table: {TABLE_NAME}")
-        table.put_item(Item=metadata)
+        try:
+            table.put_item(Item=metadata)
+        except Exception:
+            if index:
+                index.release(metadata)
+            raise
+        if index:
+            index.commit(metadata)
         
         # Success response
         result = {
@@ -109,7 +146,8 @@ def lambda_handler(event, context):
                 'message': 'Image ingestion completed successfully',
                 'image_id': image_id,
                 's3_url': s3_url,
-                'metadata': metadata
+                'metadata': metadata,
+                'dedup': dedup
             })
         }
         
@@ -138,13 +176,348 @@ def lambda_handler(event, context):
             })
         }
 
-def get_image_metadata(image_id):
+def ingest_image(image_url):
+    """
+    Download one image into S3; returns (item, dedup)
+    
+    item is the new metadata item (not yet written to DynamoDB), or for a
+    duplicate the dedup entry of the image already holding the URL or content
+    (image_id, s3_key, s3_url, content_sha256). dedup is {"result":
+    "off" | "miss" | "url_hit" | "content_hit", "bytes_skipped": n}.
+    No URL entry is written here. For a miss the content is claimed and the
+    caller writes the item, then calls DedupIndex.commit (or release if the
+    write fails). For a content hit the holder may still be in flight, so
+    the caller records the URL once the holder's item exists.
+    """
+    index = dedup_index()
+    if index:
+        existing = index.lookup_url(image_url)
+        if existing:
+            return existing, {'result': 'url_hit', 'bytes_skipped': int(existing.get('file_size', 0))}
+    
+    # Generate unique image ID
+    image_id = str(uuid.uuid4())
+    timestamp = datetime.utcnow().isoformat()
+    
+    # Extract filename from URL
+    parsed_url = urlparse(image_url)
+    original_filename = os.path.basename(parsed_url.path)
+    if not original_filename or '.' not in original_filename:
+        original_filename = f"image_{image_id}.jpg"
+    
+    # Generate S3 key
+    s3_key = f"raw-images/{image_id}_{original_filename}"
+    
+    s3_metadata = {
+        'original-url': image_url,
+        'image-id': image_id,
+        'upload-timestamp': timestamp
+    }
+    
+    entry = {
+        'image_id': image_id,
+        's3_key': s3_key,
+        's3_url': f"https://{BUCKET_NAME}.s3.amazonaws.com/{s3_key}",
+        'created_at': timestamp
+    }
+    holder, claimed = {}, []
+    
+    def commit(sha256):
+        # called with the whole content hashed, before anything is stored
+        if not (index and index.by_content):
+            return True
+        existing = index.claim_content(sha256, {**entry, 'content_sha256': sha256})
+        if existing:
+            holder.update(existing)
+            return False
+        claimed.append(sha256)
+        return True
+    
+    print(f"Downloading image from: {image_url}")
+    print(f"Uploading to S3: s3://{BUCKET_NAME}/{s3_key} ({INGEST_UPLOAD})")
+    try:
+        if INGEST_UPLOAD == 'buffered':
+            content_type, upload = download_then_upload(image_url, s3_key, s3_metadata, commit)
+        else:
+            content_type, upload = stream_to_s3(image_url, s3_key, s3_metadata, commit)
+    except Exception:
+        for sha256 in claimed:
+            index.release_content(sha256)
+        raise
+    
+    if not upload['stored']:
+        return holder, {'result': 'content_hit', 'bytes_skipped': upload['size']}
+    
+    print(f"Uploaded image: {upload['size']} bytes, content-type: {content_type}, "
+          f"{upload['parts'] or 'single'} part(s)")
+    
+    return {
+        'image_id': image_id,
+        'original_url': image_url,
+        's3_bucket': BUCKET_NAME,
+        's3_key': s3_key,
+        # Generate public URL for the uploaded image
+        's3_url': f"https://{BUCKET_NAME}.s3.amazonaws.com/{s3_key}",
+        'original_filename': original_filename,
+        'content_type': content_type,
+        'file_size': upload['size'],
+        'content_sha256': upload['sha256'],
+        'upload_timestamp': timestamp,
+        'status': 'uploaded',
+        'workflow_stage': 'ingestion_complete',
+        'created_at': timestamp,
+        'updated_at': timestamp
+    }, {'result': 'miss' if index else 'off', 'bytes_skipped': 0}
+
+def dedup_index():
+    return DedupIndex(dynamodb.Table(DEDUP_TABLE_NAME), DEDUP_POLICY) if DEDUP_POLICY != 'off' else None
+
+def dedup_counts(dedups):
+    """Per-policy metric counts for metrics_line"""
+    return {
+        'DedupUrlHits': sum(1 for d in dedups if d['result'] == 'url_hit'),
+        'DedupContentHits': sum(1 for d in dedups if d['result'] == 'content_hit'),
+        'DedupMisses': sum(1 for d in dedups if d['result'] == 'miss'),
+        'DedupBytesSkipped': sum(d['bytes_skipped'] for d in dedups)
+    }
+
+def ingest_batch(image_urls, context):
+    """
+    Ingest many URLs in one invocation
+    
+    Up to INGEST_CONCURRENCY downloads (each streaming into its own S3
+    upload) run on a thread pool sharing one pooled HTTP session, and the
+    metadata items go to DynamoDB through batch_writer (25 per
+    BatchWriteItem call) as the images finish. A URL that fails is reported
+    in its result and does not stop the batch. URLs not started before the
+    Lambda timeout come back in "unprocessed"; send them again. With
+    DEDUP_POLICY set, a URL whose image is already stored gets status
+    "duplicate" and the existing image_id. A content hit on an image whose
+    metadata item is not written by the end of the batch (another
+    invocation is still ingesting it) gets status "pending"; send it again.
+    
+    Output body: {"ingested": N, "duplicates": N, "pending": N, "failed": N,
+                  "results": [per URL, in input order], "unprocessed": [...], "dedup": {...}}
+    """
+    started = time.monotonic()
+    print(f"Batch ingestion of {len(image_urls)} URLs, {INGEST_CONCURRENCY} at a time")
+    table = dynamodb.Table(TABLE_NAME)
+    results = [None] * len(image_urls)
+    dedups = []
+    queue = list(enumerate(image_urls))
+    queue.reverse()
+    
+    index = dedup_index()
+    pending = []  # (position, item) not yet written
+    
+    stored_ids = set()
+    waiting = {}  # holder image_id not stored yet -> [(position, image_url, holder entry)] of its content hits
+    
+    def flush():
+        items = [item for _, item in pending]
+        error = store_metadata(table, index, items)
+        for position, item in pending:
+            duplicates_of = waiting.pop(item['image_id'], [])
+            if error is None:
+                stored_ids.add(item['image_id'])
+                results[position] = {'image_url': item['original_url'], 'status': 'ingested',
+                                     'image_id': item['image_id'], 's3_url': item['s3_url']}
+                for _, image_url, _ in duplicates_of:
+                    index.commit(item, image_url)
+            else:
+                results[position] = {'image_url': item['original_url'], 'status': 'failed',
+                                     'error': f"Failed to store metadata: {str(error)}"}
+                for duplicate_position, image_url, _ in duplicates_of:
+                    results[duplicate_position] = {'image_url': image_url, 'status': 'failed',
+                                                   'error': f"Failed to store metadata of the image with "
+                                                            f"the same content: {str(error)}"}
+        pending.clear()
+    
+    with ThreadPoolExecutor(INGEST_CONCURRENCY) as pool:
+        running = {}
+        while queue or running:
+            # keep the pool busy, but only start work that can finish before the timeout
+            while queue and len(running) < 2 * INGEST_CONCURRENCY and _time_left(context):
+                position, image_url = queue.pop()
+                running[pool.submit(ingest_image, image_url)] = position
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                position = running.pop(future)
+                image_url = image_urls[position]
+                try:
+                    metadata, dedup = future.result()
+                except requests.exceptions.RequestException as e:
+                    results[position] = {'image_url': image_url, 'status': 'failed',
+                                         'error': f"Failed to download image from URL: {str(e)}"}
+                    continue
+                except Exception as e:
+                    results[position] = {'image_url': image_url, 'status': 'failed',
+                                         'error': f"Unexpected error during image ingestion: {str(e)}"}
+                    continue
+                dedups.append(dedup)
+                if dedup['result'] in DEDUP_HITS:
+                    results[position] = {'image_url': image_url, 'status': 'duplicate', 'dedup': dedup['result'],
+                                         'image_id': metadata['image_id'], 's3_url': metadata['s3_url']}
+                    holder_id = metadata['image_id']
+                    if dedup['result'] == 'content_hit':
+                        if holder_id in stored_ids:
+                            index.commit(metadata, image_url)
+                        else:
+                            # the holder is pending, still running in this batch, or in another invocation
+                            waiting.setdefault(holder_id, []).append((position, image_url, metadata))
+                    continue
+                pending.append((position, metadata))
+                if len(pending) == BATCH_WRITE_SIZE:
+                    flush()
+    if pending:
+        flush()
+    # holders this batch did not store: another invocation's, or one of ours that failed and released its claim
+    for holder_id, duplicates_of in waiting.items():
+        if metadata_exists(holder_id):
+            for _, image_url, entry in duplicates_of:
+                index.commit(entry, image_url)
+        else:
+            for position, image_url, _ in duplicates_of:
+                results[position] = {'image_url': image_url, 'status': 'pending', 'image_id': holder_id,
+                                     'error': 'An image with the same content is still being ingested '
+                                              '(or failed); send the URL again'}
+    
+    unprocessed = [image_url for _, image_url in reversed(queue)]
+    results = [r for r in results if r is not None]
+    ingested = sum(1 for r in results if r['status'] == 'ingested')
+    duplicates = sum(1 for r in results if r['status'] == 'duplicate')
+    pending_count = sum(1 for r in results if r['status'] == 'pending')
+    failed = len(results) - ingested - duplicates - pending_count
+    elapsed = time.monotonic() - started
+    counts = dedup_counts(dedups)
+    if DEDUP_POLICY != 'off':
+        print(metrics_line(DEDUP_POLICY, counts))
+    print(f"Batch ingestion done: {ingested} ingested, {duplicates} duplicates, {pending_count} pending, "
+          f"{failed} failed, {len(unprocessed)} unprocessed in {elapsed:.2f}s")
+    
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'message': 'Batch ingestion completed',
+            'ingested': ingested,
+            'duplicates': duplicates,
+            'pending': pending_count,
+            'failed': failed,
+            'results': results,
+            'unprocessed': unprocessed,
+            'dedup': {'policy': DEDUP_POLICY, **counts,
+                      'hit_rate': round(duplicates / len(dedups), 4) if dedups else None},
+            'elapsed_s': round(elapsed, 3),
+            'images_per_s': round(ingested / elapsed, 2) if elapsed else None
+        })
+    }
+
+def metadata_exists(image_id):
+    """Whether the metadata item is written (a content holder may still be uploading in another invocation)"""
+    response = dynamodb.Table(TABLE_NAME).get_item(
+        Key={'image_id': image_id},
+        ProjectionExpression='image_id',
+        ConsistentRead=True
+    )
+    return 'Item' in response
+
+def store_metadata(table, index, items):
+    """
+    Write up to BATCH_WRITE_SIZE new metadata items (one BatchWriteItem through
+    batch_writer) and only then record their dedup entries; returns the error,
+    or None. On a failure the content claims are released, so a retry of
+    those URLs ingests them again instead of hitting an entry with no item.
+    """
+    try:
+        with table.batch_writer() as writer:
+            for item in items:
+                writer.put_item(Item=item)
+    except Exception as e:
+        print(f"ERROR: Failed to store {len(items)} metadata items: {str(e)}")
+        if index:
+            for item in items:
+                index.release(item)
+        return e
+    if index:
+        for item in items:
+            index.commit(item)
+    return None
+
+def read_manifest(manifest):
+    """URLs from an S3 object: a JSON list, or one URL per line"""
+    body = s3_client.get_object(Bucket=manifest['bucket'], Key=manifest['key'])['Body'].read().decode('utf-8')
+    if body.lstrip().startswith('['):
+        return json.loads(body)
+    return [line.strip() for line in body.splitlines() if line.strip()]
+
+def _time_left(context):
+    return context is None or context.get_remaining_time_in_millis() > BATCH_TIME_MARGIN_MS
+
+def download_then_upload(image_url, s3_key, s3_metadata, commit=None):
+    """
+    Whole image in memory, then one PutObject; returns (content type, upload summary).
+    commit(sha256) returning False skips the PutObject (see StreamingUpload.close).
+    """
+    response = http_session.get(image_url, timeout=30)
+    response.raise_for_status()
+    
+    image_data = response.content
+    content_type = response.headers.get('content-type', 'image/jpeg')
+    sha256 = hashlib.sha256(image_data).hexdigest()
+    if commit is not None and not commit(sha256):
+        return content_type, {'size': len(image_data), 'sha256': sha256, 'parts': 0, 'stored': False}
+    s3_client.put_object(
+        Bucket=BUCKET_NAME,
+        Key=s3_key,
+        Body=image_data,
+        ContentType=content_type,
+        Metadata=s3_metadata
+    )
+    return content_type, {'size': len(image_data), 'sha256': sha256, 'parts': 0, 'stored': True}
+
+def stream_to_s3(image_url, s3_key, s3_metadata, commit=None):
+    """
+    Download in DOWNLOAD_CHUNK pieces straight into a StreamingUpload, so
+    parts upload while the rest of the image is still downloading and the
+    function never holds the whole image. Returns (content type, upload summary).
+    """
+    with http_session.get(image_url, timeout=30, stream=True) as response:
+        response.raise_for_status()
+        content_type = response.headers.get('content-type', 'image/jpeg')
+        upload = StreamingUpload(
+            s3_client, BUCKET_NAME, s3_key, content_type, s3_metadata,
+            threshold=MULTIPART_THRESHOLD,
+            part_size=MULTIPART_PART_SIZE,
+            concurrency=UPLOAD_CONCURRENCY
+        )
+        try:
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK):
+                upload.write(chunk)
+        except Exception:
+            # a failed download must not leave a half-finished multipart upload behind
+            upload.abort()
+            raise
+    return content_type, upload.close(commit)
+
+def get_image_metadata(image_id, include_results=False):
     """
     Helper function to retrieve image metadata from DynamoDB
+    
+    Only the ingestion attributes are returned unless include_results is set,
+    so the response stays small after the image has been classified.
     """
     try:
         table = dynamodb.Table(TABLE_NAME)
-        response = table.get_item(Key={'image_id': image_id})
+        if include_results:
+            response = table.get_item(Key={'image_id': image_id})
+        else:
+            response = table.get_item(
+                Key={'image_id': image_id},
+                ProjectionExpression=METADATA_PROJECTION,
+                ExpressionAttributeNames=METADATA_PROJECTION_NAMES
+            )
         
         if 'Item' in response:
             return response['Item']
@@ -0,0 +1,155 @@
+import base64
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+MB = 1024 * 1024
+# S3 rejects multipart parts under 5 MB (except the last one)
+MIN_PART_SIZE = 5 * MB
+
+class StreamingUpload:
+    """
+    Writes an object to S3 while it is still being downloaded.
+
+    Bytes passed to write() are buffered until they reach `threshold`. If the
+    download ends first, close() sends them as one PutObject. Otherwise a
+    multipart upload starts and every `part_size` bytes become an UploadPart
+    call on a background thread, so the next chunk downloads while earlier
+    parts upload. At most `concurrency` parts are in flight: write() blocks
+    when they are all busy, which keeps the handler's memory at roughly
+    threshold + concurrency x part_size whatever the object size.
+
+    Every request carries a SHA-256 checksum that S3 verifies (BadDigest on a
+    mismatch), and the SHA-256 of the whole object is returned by close().
+    close(commit) calls commit(sha256) once the whole object has been read
+    and drops the upload if it returns False (content that is already stored).
+    """
+
+    def __init__(self, s3_client, bucket, key, content_type, metadata, threshold=8 * MB, part_size=8 * MB,
+                 concurrency=4):
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"part_size must be at least {MIN_PART_SIZE} bytes")
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.content_type = content_type
+        self.metadata = metadata
+        self.threshold = max(threshold, part_size)
+        self.part_size = part_size
+        self.concurrency = concurrency
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.parts = []  # futures of (part number, ETag, checksum), in part order
+        self.pool = None
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.peak_buffered = 0
+
+    def write(self, chunk):
+        self.sha256.update(chunk)
+        self.size += len(chunk)
+        self.buffer += chunk
+        self.peak_buffered = max(self.peak_buffered, len(self.buffer))
+        if self.upload_id is None and len(self.buffer) >= self.threshold:
+            self._start_multipart()
+        if self.upload_id is not None:
+            while len(self.buffer) >= self.part_size:
+                self._submit_part(self.part_size)
+
+    def close(self, commit=None):
+        """
+        Finish the upload; returns {'size', 'sha256', 'parts', 'stored'}
+        (parts is 0 for a single PUT, stored is False when commit declined it)
+        """
+        sha256 = self.sha256.hexdigest()
+        if commit is not None and not commit(sha256):
+            # below the threshold nothing has been sent yet; above it the parts are discarded
+            self.buffer.clear()
+            self.abort()
+            return {'size': self.size, 'sha256': sha256, 'parts': 0, 'stored': False}
+
+        if self.upload_id is None:
+            data = bytes(self.buffer)
+            self.buffer.clear()
+            self.s3_client.put_object(
+                Bucket=self.bucket,
+                Key=self.key,
+                Body=data,
+                ContentType=self.content_type,
+                Metadata=self.metadata,
+                ChecksumSHA256=_checksum(data)
+            )
+            return {'size': self.size, 'sha256': sha256, 'parts': 0, 'stored': True}
+
+        try:
+            if self.buffer or not self.parts:
+                self._submit_part(len(self.buffer))
+            completed = [future.result() for future in self.parts]
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self.upload_id,
+                MultipartUpload={'Parts': [
+                    {'PartNumber': number, 'ETag': etag, 'ChecksumSHA256': checksum}
+                    for number, etag, checksum in completed
+                ]}
+            )
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self.pool.shutdown(wait=True)
+        return {'size': self.size, 'sha256': sha256, 'parts': len(self.parts), 'stored': True}
+
+    def abort(self):
+        """Drop the parts already uploaded (they are billed as storage until the upload is aborted)"""
+        if self.upload_id is None:
+            return
+        for future in self.parts:
+            future.cancel()
+        # parts still uploading would otherwise reappear after the abort
+        self.pool.shutdown(wait=True)
+        try:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+        except Exception as e:
+            print(f"Failed to abort multipart upload {self.upload_id}: {str(e)}")
+
+    def _start_multipart(self):
+        response = self.s3_client.create_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            ContentType=self.content_type,
+            Metadata=self.metadata,
+            ChecksumAlgorithm='SHA256'
+        )
+        self.upload_id = response['UploadId']
+        self.pool = ThreadPoolExecutor(self.concurrency)
+
+    def _submit_part(self, length):
+        # fail fast: stop reading the download once a part has failed
+        for future in self.parts:
+            if future.done() and future.exception() is not None:
+                raise future.exception()
+        with memoryview(self.buffer) as view:
+            data = bytes(view[:length])
+        del self.buffer[:length]
+        self.slots.acquire()
+        future = self.pool.submit(self._upload_part, len(self.parts) + 1, data)
+        future.add_done_callback(lambda _: self.slots.release())
+        self.parts.append(future)
+
+    def _upload_part(self, number, data):
+        checksum = _checksum(data)
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=number,
+            Body=data,
+            ChecksumSHA256=checksum
+        )
+        return number, response['ETag'], checksum
+
+def _checksum(data):
+    return base64.b64encode(hashlib.sha256(data).digest()).decode()
@@ -0,0 +1,265 @@
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+
+import boto3
+import numpy as np
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+
+import results_codec
+from lambda_function import RESULTS_ENCODING, TABLE_NAME, extract_model_predictions
+
+# Initialize AWS clients
+s3_client = boto3.client('s3')
+dynamodb_client = boto3.client('dynamodb')
+
+MODELS = ('alexnet', 'resnet', 'mobilenet')
+# BatchExecuteStatement takes at most 25 statements per call
+STATEMENTS_PER_BATCH = 25
+WRITE_CONCURRENCY = int(os.environ.get('BULK_WRITE_CONCURRENCY', '4'))
+MAX_WRITE_ATTEMPTS = 5
+RETRYABLE_ERRORS = {'ProvisionedThroughputExceeded', 'ThrottlingError', 'RequestLimitExceeded',
+                    'InternalServerError', 'TransactionConflict'}
+# error codes of a whole BatchExecuteStatement call that are worth retrying
+RETRYABLE_CALL_ERRORS = {'ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded',
+                         'InternalServerError'}
+
+_serializer = TypeSerializer()
+
+RESULTS_STATEMENT = (f'UPDATE "{TABLE_NAME}" SET workflow_stage=? SET classification_results=? '
+                     f'SET consensus_label=? SET consensus_confidence=? SET successful_models=? '
+                     f'SET failed_models=? SET processing_completed_at=? SET updated_at=? WHERE image_id=?')
+ERROR_STATEMENT = (f'UPDATE "{TABLE_NAME}" SET workflow_stage=? SET error_message=? SET updated_at=? '
+                   f'WHERE image_id=?')
+
+def lambda_handler(event, context):
+    """
+    Bulk Aggregator Lambda - many images' model outputs in one invocation
+
+    Produces the same classification_results as lambda_function.py, for a whole
+    batch at once: the scores go into one image x model x label tensor, and the
+    consensus for every image comes from a handful of array operations instead
+    of per-image dict loops. The DynamoDB updates are PartiQL UPDATE statements
+    sent 25 per BatchExecuteStatement call, WRITE_CONCURRENCY calls at a time.
+
+    Input: {"images": [{"image_id": "uuid", "alexnet_result": {...}, ...}, ...]}
+           (each element is the single-image Aggregator input, e.g. a Map state's output)
+        or {"images_ref": {"bucket": "...", "key": "..."}}   (the same list as a JSON object in S3)
+    Output: {"processed": N, "completed": N, "failed": [{"image_id", "error"}], "results": [...], ...}
+
+    An image whose models all failed is marked classification_failed, as the
+    single-image handler does; it never fails the batch.
+    """
+
+    started = time.monotonic()
+    if event.get('images_ref'):
+        ref = event['images_ref']
+        images = json.loads(s3_client.get_object(Bucket=ref['bucket'], Key=ref['key'])['Body'].read())
+    elif event.get('images') is not None:
+        images = event['images']
+    else:
+        return {'statusCode': 400, 'error': 'Provide images or images_ref'}
+
+    print(f"Bulk aggregating {len(images)} images")
+    timestamp = datetime.utcnow().isoformat()
+    tensor = ScoreTensor(images)
+    aggregated = tensor.aggregate()
+
+    statements, results, failed = [], [], []
+    for index, image in enumerate(images):
+        image_id = image.get('image_id', 'unknown')
+        successful = [m for j, m in enumerate(MODELS) if tensor.success[index, j]]
+        if not successful:
+            error_msg = "Error in result aggregation: All ML model inferences failed"
+            statements.append(error_statement(image_id, error_msg, timestamp))
+            failed.append({'image_id': image_id, 'error': error_msg})
+            continue
+        final_results = {
+            'image_id': image_id,
+            'processing_timestamp': timestamp,
+            'successful_models': successful,
+            'failed_models': [m for m in MODELS if m not in successful],
+            'individual_predictions': {m: extract_model_predictions(image.get(f'{m}_result', {})) for m in MODELS},
+            'aggregated_predictions': aggregated[index],
+            'consensus': consensus(aggregated[index]),
+            'processing_summary': {
+                'total_models': len(MODELS),
+                'successful_models': len(successful),
+                'failed_models': len(MODELS) - len(successful)
+            }
+        }
+        final_results['processing_summary']['overall_confidence'] = final_results['consensus'].get('confidence', 0.0)
+        statements.append(results_statement(image_id, final_results))
+        results.append({'image_id': image_id, 'consensus_prediction': final_results['consensus']})
+
+    write_errors, write_calls = execute_statements(statements)
+    for image_id, error in write_errors.items():
+        failed.append({'image_id': image_id, 'error': f"DynamoDB update failed: {error}"})
+    results = [r for r in results if r['image_id'] not in write_errors]
+
+    elapsed = time.monotonic() - started
+    print(f"Bulk aggregation done: {len(results)} completed, {len(failed)} failed in {elapsed:.2f}s "
+          f"({write_calls} BatchExecuteStatement calls)")
+
+    return {
+        'statusCode': 200,
+        'processed': len(images),
+        'completed': len(results),
+        'failed': failed,
+        'results': results,
+        'write_calls': write_calls,
+        'elapsed_s': round(elapsed, 3),
+        'images_per_s': round(len(images) / elapsed, 2) if elapsed else None
+    }
+
+class ScoreTensor:
+    """
+    scores[image, label] and counts[image, model, label] for one batch, with
+    labels numbered in the order they are first seen. Each score sum is
+    accumulated in the order the single-image handler adds them (model, then
+    position), so the floats are bit-identical. first_seen keeps the position
+    where each label first appeared in an image's results, so ties are broken
+    the way the single-image handler breaks them (insertion order).
+    """
+
+    def __init__(self, images):
+        labels, rows = {}, []  # rows: (image, model, label id, score, position)
+        self.success = np.zeros((len(images), len(MODELS)), dtype=bool)
+        for i, image in enumerate(images):
+            position = 0
+            for j, model in enumerate(MODELS):
+                result = image.get(f'{model}_result', {})
+                if result.get('statusCode') != 200 or result.get('inference_failed'):
+                    continue
+                self.success[i, j] = True
+                for label, score in zip(result.get('predictions', []), result.get('confidence_scores', [])):
+                    rows.append((i, j, labels.setdefault(label, len(labels)), score, position))
+                    position += 1
+
+        self.labels = list(labels)
+        shape = (len(images), len(MODELS), len(labels))
+        self.scores = np.zeros((len(images), len(labels)))
+        self.counts = np.zeros(shape, dtype=np.int32)
+        self.first_seen = np.full((len(images), len(labels)), np.iinfo(np.int32).max, dtype=np.int32)
+        if rows:
+            i, j, label, score, position = (np.array(column) for column in zip(*rows))
+            # unbuffered and in row order: the same left-to-right sum as sum() over the image's scores
+            np.add.at(self.scores, (i, label), score.astype(np.float64))
+            np.add.at(self.counts, (i, j, label), 1)
+            np.minimum.at(self.first_seen, (i, label), position)
+
+    def aggregate(self):
+        """Per image, aggregate_model_predictions' dict: label -> scores, best consensus_score first"""
+        model_count = self.counts.sum(axis=1)                       # (image, label)
+        successful = np.maximum(self.success.sum(axis=1), 1)[:, None]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            average = self.scores / model_count
+        consensus_score = average * (0.7 + 0.3 * (model_count / successful))
+        order = np.argsort(self.first_seen, axis=-1, kind='stable')
+
+        aggregated = []
+        for i in range(len(self.success)):
+            per_image = {}
+            for label in order[i, :np.count_nonzero(model_count[i])]:
+                models = self.counts[i, :, label].nonzero()[0]
+                per_image[self.labels[label]] = {
+                    'average_confidence': round(float(average[i, label]), 3),
+                    'consensus_score': round(float(consensus_score[i, label]), 3),
+                    'model_count': int(model_count[i, label]),
+                    'models': [MODELS[j] for j in models for _ in range(self.counts[i, j, label])]
+                }
+            # sorted on Python's round() like the single-image handler; np.round differs at ties such as 0.0005
+            aggregated.append(dict(sorted(per_image.items(), key=lambda x: x[1]['consensus_score'], reverse=True)))
+        return aggregated
+
+def consensus(aggregated_predictions):
+    """calculate_consensus for one image's aggregated predictions"""
+    if not aggregated_predictions:
+        return {'label': 'unknown', 'confidence': 0.0, 'method': 'no_predictions'}
+    top_label, top_data = next(iter(aggregated_predictions.items()))
+    return {
+        'label': top_label,
+        'confidence': top_data['consensus_score'],
+        'model_agreement': top_data['model_count'],
+        'method': 'weighted_consensus',
+        'alternative_predictions': list(aggregated_predictions.keys())[1:3]
+    }
+
+# ---------- DynamoDB writes ----------
+
+def _parameters(*values):
+    # boto3 rejects Python floats; DynamoDB numbers must be Decimal
+    values = json.loads(json.dumps(values), parse_float=Decimal)
+    return [_serializer.serialize(value) for value in values]
+
+def results_statement(image_id, results):
+    """The same attributes update_dynamodb_with_results sets, as one PartiQL UPDATE"""
+    parameters = _parameters('classification_completed', results['consensus']['label'],
+                             results['consensus']['confidence'], results['successful_models'],
+                             results['failed_models'], results['processing_timestamp'],
+                             results['processing_timestamp'], image_id)
+    stored = results_codec.encode(results['individual_predictions'], results, RESULTS_ENCODING)
+    parameters.insert(1, _serializer.serialize(stored))
+    return image_id, {'Statement': RESULTS_STATEMENT, 'Parameters': parameters}
+
+def error_statement(image_id, error_message, timestamp):
+    return image_id, {
+        'Statement': ERROR_STATEMENT,
+        'Parameters': _parameters('classification_failed', error_message, timestamp, image_id)
+    }
+
+def execute_statements(statements):
+    """
+    Run [(image_id, statement)] in batches of 25, WRITE_CONCURRENCY batches in flight.
+    Returns ({image_id: error} for statements that did not apply, number of calls).
+    """
+    batches = [statements[i:i + STATEMENTS_PER_BATCH] for i in range(0, len(statements), STATEMENTS_PER_BATCH)]
+    errors, calls = {}, 0
+    with ThreadPoolExecutor(max(1, min(WRITE_CONCURRENCY, len(batches)))) as pool:
+        for batch_errors, batch_calls in pool.map(_execute_batch, batches):
+            errors.update(batch_errors)
+            calls += batch_calls
+    return errors, calls
+
+def _execute_batch(batch):
+    """
+    One batch with retries of throttled statements (exponential backoff with
+    jitter). A failed call (the whole request throttled or rejected) is
+    retried if the error is retryable, otherwise every statement in the batch
+    is reported in errors; it never raises.
+    """
+    errors, calls = {}, 0
+    for attempt in range(MAX_WRITE_ATTEMPTS):
+        try:
+            response = dynamodb_client.batch_execute_statement(Statements=[statement for _, statement in batch])
+        except ClientError as e:
+            calls += 1
+            error = e.response.get('Error', {})
+            message = f"{error.get('Code')}: {error.get('Message', '')}"
+            for image_id, _ in batch:
+                errors[image_id] = message
+            if error.get('Code') not in RETRYABLE_CALL_ERRORS:
+                break
+        else:
+            calls += 1
+            retry = []
+            for (image_id, statement), result in zip(batch, response['Responses']):
+                error = result.get('Error')
+                if error is None:
+                    errors.pop(image_id, None)
+                elif error.get('Code') in RETRYABLE_ERRORS:
+                    retry.append((image_id, statement))
+                    errors[image_id] = f"{error.get('Code')}: {error.get('Message', '')}"
+                else:
+                    errors[image_id] = f"{error.get('Code')}: {error.get('Message', '')}"
+            if not retry:
+                break
+            batch = retry
+        if attempt + 1 < MAX_WRITE_ATTEMPTS:
+            time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+    return errors, calls
@@ -1,13 +1,26 @@
 import json
 import boto3
+import time
 from datetime import datetime
+from decimal import Decimal
 import os
 
+import results_codec
+
 # Initialize AWS clients
 dynamodb = boto3.resource('dynamodb')
 
 # Environment variables
 TABLE_NAME = os.environ['DYNAMODB_TABLE_NAME']
+# full: classification_results is the whole final_results map (default)
+# compact: label IDs + fixed-point scores of the per-model outputs only (see results_codec.py)
+# compact_zlib: the compact form, zlib-compressed into one binary attribute
+RESULTS_ENCODING = os.environ.get('RESULTS_ENCODING', 'full')
+MODEL_RESULT_KEYS = ('alexnet_result', 'resnet_result', 'mobilenet_result')
+
+# base64 images in the state: sized by their length rather than serialised for the trace
+TRACE_SIZED_FIELDS = ('image_data', 'processed_image_data')
+_cold_start = True
 
 def lambda_handler(event, context):
     """
@@ -19,11 +32,17 @@ def lambda_handler(event, context):
         "image_id": "uuid",
         "alexnet_result": {...},
         "resnet_result": {...},
-        "mobilenet_result": {...}
+        "mobilenet_result": {...},
+        "trace": {...}
     }
-    Output: {"image_id": "uuid", "aggregated_results": {...}, "status": "completed"}
+    Output: {"image_id": "uuid", "aggregated_results": {...}, "status": "completed", "trace": {...}}
+    
+    The spans collected along the execution (the upstream trace plus the one
+    each model result carries) are closed with an "aggregator" span and logged
+    as one "TRACE {json}" line: the latency waterfall that trace_report.py reads.
     """
     
+    start_ms = int(time.time() * 1000)
     try:
         image_id = event['image_id']
         print(f"Aggregating results for image_id: {image_id}")
@@ -82,13 +101,15 @@ def lambda_handler(event, context):
         print(f"Aggregation completed successfully for image_id: {image_id}")
         print(f"Consensus prediction: {consensus_result.get('label')} ({consensus_result.get('confidence', 0):.3f})")
         
-        return {
+        result = {
             'statusCode': 200,
             'image_id': image_id,
             'aggregated_results': final_results,
             'status': 'classification_completed',
             'consensus_prediction': consensus_result
         }
+        result['trace'] = emit_trace(event, start_ms, result)
+        return result
         
     except Exception as e:
         error_msg = f"Error in result aggregation: {str(e)}"
@@ -100,12 +121,107 @@ def lambda_handler(event, context):
         except:
             pass
         
-        return {
+        result = {
             'statusCode': 500,
             'error': error_msg,
             'image_id': event.get('image_id', 'unknown'),
             'status': 'aggregation_failed'
         }
+        result['trace'] = emit_trace(event, start_ms, result)
+        return result
+
+def add_trace_span(event, stage, start_ms, result):
+    """The state's trace context plus this invocation's span; a copy of fetch-image's add_trace_span"""
+    global _cold_start
+    trace = dict(event.get('trace') or {})
+    span = [stage, start_ms, int(time.time() * 1000), _cold_start, _payload_bytes(event), _payload_bytes(result)]
+    _cold_start = False
+    trace['spans'] = list(trace.get('spans', [])) + [span]
+    return trace
+
+def _payload_bytes(payload):
+    if isinstance(payload, list):
+        return sum(_payload_bytes(item) for item in payload)
+    small = {k: v for k, v in payload.items() if k not in TRACE_SIZED_FIELDS and k != 'trace'}
+    return sum(len(payload.get(k) or '') for k in TRACE_SIZED_FIELDS) + len(json.dumps(small, default=str))
+
+def merge_trace(event):
+    """The upstream trace plus the spans of every model result (each Parallel branch carries its own copy)"""
+    trace = dict(event.get('trace') or {})
+    spans = list(trace.get('spans', []))
+    for key in MODEL_RESULT_KEYS:
+        for span in ((event.get(key) or {}).get('trace') or {}).get('spans', []):
+            if span not in spans:
+                spans.append(span)
+    trace['spans'] = spans
+    return trace
+
+def emit_trace(event, start_ms, result):
+    """Close the trace with the aggregator span, log it as a TRACE line and return the waterfall"""
+    try:
+        trace = add_trace_span({**event, 'trace': merge_trace(event)}, 'aggregator', start_ms, result)
+        waterfall = trace_waterfall(trace, event.get('image_id', 'unknown'))
+        print(f"TRACE {json.dumps(waterfall, separators=(',', ':'))}")
+        return waterfall
+    except Exception as e:
+        print(f"Failed to build the execution trace: {str(e)}")
+        return None
+
+def trace_waterfall(trace, image_id):
+    """
+    Spans as offsets from the execution start, plus the critical path: from the
+    last span to finish, step back to the span that finished last before it
+    started (the slowest model branch, then preprocessing, then fetch). Time on
+    the path not spent in a handler is Step Functions and Lambda overhead
+    (state transitions, invoke latency, cold-start init).
+    """
+    spans = sorted(trace['spans'], key=lambda span: (span[1], span[2]))
+    started_ms = _epoch_ms(trace.get('started')) or spans[0][1]
+    end_ms = max(span[2] for span in spans)
+    
+    path = []
+    current = max(spans, key=lambda span: span[2])
+    while current is not None:
+        path.append(current)
+        before = [span for span in spans if span[2] <= current[1] and span[1] < current[1]]
+        current = max(before, key=lambda span: span[2]) if before else None
+    path.reverse()
+    
+    waits = {}
+    previous_end = started_ms
+    for span in path:
+        waits[id(span)] = span[1] - previous_end
+        previous_end = span[2]
+    handler_ms = sum(span[2] - span[1] for span in path)
+    
+    return {
+        'execution': trace.get('execution'),
+        'image_id': image_id,
+        'started': trace.get('started'),
+        'end_to_end_ms': end_ms - started_ms,
+        'handler_ms': handler_ms,
+        'overhead_ms': end_ms - started_ms - handler_ms,
+        'critical_path': [span[0] for span in path],
+        'spans': [{
+            'stage': span[0],
+            'offset_ms': span[1] - started_ms,
+            'duration_ms': span[2] - span[1],
+            'cold': span[3],
+            'bytes_in': span[4],
+            'bytes_out': span[5],
+            'critical': id(span) in waits,
+            'wait_ms': waits.get(id(span))
+        } for span in spans]
+    }
+
+def _epoch_ms(timestamp):
+    """$$.Execution.StartTime ("2024-01-01T12:00:00.123Z") in epoch milliseconds"""
+    if not timestamp:
+        return None
+    try:
+        return int(datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp() * 1000)
+    except ValueError:
+        return None
 
 def extract_model_predictions(model_result):
     """Extract clean predictions from model result"""
@@ -205,9 +321,14 @@ def update_dynamodb_with_results(image_id, results):
             updated_at = :timestamp
     """
     
+    stored_results = results_codec.encode(results['individual_predictions'], results, RESULTS_ENCODING)
+    
+    # boto3 rejects Python floats; DynamoDB numbers must be Decimal
+    results = json.loads(json.dumps(results), parse_float=Decimal)
+    
     expression_values = {
         ':stage': 'classification_completed',
-        ':results': results,
+        ':results': stored_results,
         ':label': results['consensus']['label'],
         ':confidence': results['consensus']['confidence'],
         ':success_models': results['successful_models'],
@@ -239,3 +360,44 @@ def update_dynamodb_error(image_id, error_message):
     )
     
     print(f"DynamoDB updated with error status for image_id: {image_id}")
+
+def load_classification_results(item):
+    """
+    classification_results of a DynamoDB item in the full form, whichever
+    RESULTS_ENCODING stored it; None if the image has not been classified
+    """
+    stored = item.get('classification_results')
+    if stored is None:
+        return None
+    individual = results_codec.stored_individual_predictions(stored)
+    if individual is None:
+        return stored
+    
+    # Rebuild the derived fields exactly as lambda_handler does
+    model_results = {}
+    for model_name, prediction in individual.items():
+        if prediction['status'] == 'success':
+            model_results[model_name] = dict(prediction, statusCode=200)
+        else:
+            model_results[model_name] = {'statusCode': 500, 'error': prediction['error'], 'inference_failed': True}
+    successful_models = [m for m in results_codec.MODELS if individual[m]['status'] == 'success']
+    aggregated_predictions = aggregate_model_predictions(
+        model_results['alexnet'], model_results['resnet'], model_results['mobilenet'], successful_models
+    )
+    consensus_result = calculate_consensus(aggregated_predictions)
+    
+    return {
+        'image_id': item['image_id'],
+        'processing_timestamp': item.get('processing_completed_at'),
+        'successful_models': successful_models,
+        'failed_models': [m for m in results_codec.MODELS if m not in successful_models],
+        'individual_predictions': individual,
+        'aggregated_predictions': aggregated_predictions,
+        'consensus': consensus_result,
+        'processing_summary': {
+            'total_models': 3,
+            'successful_models': len(successful_models),
+            'failed_models': 3 - len(successful_models),
+            'overall_confidence': consensus_result.get('confidence', 0.0)
+        }
+    }
@@ -0,0 +1,105 @@
+import json
+import zlib
+from decimal import Decimal
+
+# RESULTS_ENCODING values
+ENCODINGS = ('full', 'compact', 'compact_zlib')
+FORMAT_VERSION = 1
+
+MODELS = ('alexnet', 'resnet', 'mobilenet')
+# Label IDs for FORMAT_VERSION 1 (the ml-inference class labels, in order). Only append:
+# stored items refer to labels by position. A label not in the list is stored as its string.
+LABELS = [
+    'cat', 'dog', 'bird', 'car', 'bicycle', 'airplane', 'boat', 'train',
+    'truck', 'traffic_light', 'fire_hydrant', 'stop_sign', 'parking_meter',
+    'bench', 'elephant', 'bear', 'zebra', 'giraffe', 'backpack', 'umbrella',
+    'handbag', 'tie', 'suitcase', 'frisbee', 'skis', 'snowboard', 'sports_ball',
+    'kite', 'baseball_bat', 'baseball_glove', 'skateboard', 'surfboard',
+    'tennis_racket', 'bottle', 'wine_glass', 'cup', 'fork', 'knife', 'spoon',
+    'bowl', 'banana', 'apple', 'sandwich', 'orange', 'broccoli', 'carrot',
+    'hot_dog', 'pizza', 'donut', 'cake'
+]
+LABEL_IDS = {label: index for index, label in enumerate(LABELS)}
+
+SCORE_SCALE = 1000    # confidence scores are reported to 3 decimals
+TIME_SCALE = 10000    # processing_time to 0.1 ms
+
+def encode_compact(individual_predictions):
+    """
+    individual_predictions (as built by the aggregator) -> compact map
+
+    {"v": 1, "m": [entry per model in MODELS order]}
+      success: [1, [label ids], [scores x1000], processing_time x10000, model_version]
+      failure: [0, error message]
+
+    Only the per-model outputs are stored. Everything else in
+    classification_results (aggregated predictions, consensus, summary) is
+    derived from them again by the aggregator's decode helper.
+    """
+    entries = []
+    for model in MODELS:
+        prediction = individual_predictions.get(model, {})
+        if prediction.get('status') != 'success':
+            entries.append([0, prediction.get('error', 'Unknown error')])
+            continue
+        entries.append([
+            1,
+            [LABEL_IDS.get(label, label) for label in prediction['predictions']],
+            [int(round(float(score) * SCORE_SCALE)) for score in prediction['confidence_scores']],
+            int(round(float(prediction['processing_time']) * TIME_SCALE)),
+            prediction['model_version']
+        ])
+    return {'v': FORMAT_VERSION, 'm': entries}
+
+def decode_compact(compact):
+    """compact map -> individual_predictions"""
+    if int(compact['v']) != FORMAT_VERSION:
+        raise ValueError(f"Unsupported classification_results format version: {compact['v']}")
+    individual = {}
+    for model, entry in zip(MODELS, compact['m']):
+        if not int(entry[0]):
+            individual[model] = {'status': 'failed', 'error': entry[1]}
+            continue
+        _, labels, scores, processing_time, model_version = entry
+        predictions = [label if isinstance(label, str) else LABELS[int(label)] for label in labels]
+        confidence_scores = [int(score) / SCORE_SCALE for score in scores]
+        individual[model] = {
+            'status': 'success',
+            'model_name': model,
+            'predictions': predictions,
+            'confidence_scores': confidence_scores,
+            'top_prediction': {'label': predictions[0], 'confidence': confidence_scores[0]} if predictions else {},
+            'processing_time': int(processing_time) / TIME_SCALE,
+            'model_version': model_version
+        }
+    return individual
+
+def compress(compact):
+    return zlib.compress(json.dumps(compact, separators=(',', ':')).encode(), 9)
+
+def decompress(data):
+    # boto3 returns Binary attributes as boto3.dynamodb.types.Binary
+    return json.loads(zlib.decompress(getattr(data, 'value', data)))
+
+def encode(individual_predictions, full_results, encoding):
+    """The classification_results attribute value for RESULTS_ENCODING"""
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown RESULTS_ENCODING: {encoding} (expected one of {', '.join(ENCODINGS)})")
+    if encoding == 'full':
+        # boto3 rejects Python floats; DynamoDB numbers must be Decimal
+        return json.loads(json.dumps(full_results), parse_float=Decimal)
+    compact = encode_compact(individual_predictions)
+    if encoding == 'compact_zlib':
+        return compress(compact)
+    return compact
+
+def stored_individual_predictions(value):
+    """
+    individual_predictions from a stored classification_results value, or None
+    when the value is the full (uncompressed dict) form
+    """
+    if isinstance(value, dict) and 'v' in value and 'm' in value:
+        return decode_compact(value)
+    if isinstance(value, (bytes, bytearray)) or hasattr(value, 'value'):
+        return decode_compact(decompress(value))
+    return None
@@ -4,6 +4,7 @@ import base64
 from PIL import Image
 import io
 import os
+import time
 
 # Initialize AWS clients
 s3_client = boto3.client('s3')
@@ -11,6 +12,45 @@ dynamodb = boto3.resource('dynamodb')
 
 # Environment variables
 TABLE_NAME = os.environ['DYNAMODB_TABLE_NAME']
+# inline: pass the image as base64 in the state (default)
+# claim_check: pass an S3 reference ({"bucket", "key", "size"}) instead of the bytes
+PAYLOAD_MODE = os.environ.get('PAYLOAD_MODE', 'inline')
+
+# Only the attributes written at ingestion: once an image has been classified its item
+# also holds classification_results, which this step never needs to read back
+METADATA_PROJECTION = ('image_id, original_url, s3_bucket, s3_key, s3_url, original_filename, content_type, '
+                       'file_size, content_sha256, upload_timestamp, #status, workflow_stage, '
+                       'created_at, updated_at')
+METADATA_PROJECTION_NAMES = {'#status': 'status'}
+
+# base64 images in the state: sized by their length rather than serialised for the trace
+TRACE_SIZED_FIELDS = ('image_data', 'processed_image_data')
+# True until this execution environment has served its first invocation
+_cold_start = True
+
+def add_trace_span(event, stage, start_ms, result):
+    """
+    The execution's trace context (see statemachine.json) with this invocation
+    appended as [stage, start_ms, end_ms, cold_start, bytes_in, bytes_out].
+    Times are epoch milliseconds from this function's clock. The byte counts
+    approximate the JSON sizes of the event and the result (trace excluded)
+    without serialising the base64 images: those are sized by their length.
+
+    Every Workflow 2 function deploys its own CodeUri, so the other handlers
+    carry copies of this function and _payload_bytes; change them together.
+    """
+    global _cold_start
+    trace = dict(event.get('trace') or {})
+    span = [stage, start_ms, int(time.time() * 1000), _cold_start, _payload_bytes(event), _payload_bytes(result)]
+    _cold_start = False
+    trace['spans'] = list(trace.get('spans', [])) + [span]
+    return trace
+
+def _payload_bytes(payload):
+    if isinstance(payload, list):
+        return sum(_payload_bytes(item) for item in payload)
+    small = {k: v for k, v in payload.items() if k not in TRACE_SIZED_FIELDS and k != 'trace'}
+    return sum(len(payload.get(k) or '') for k in TRACE_SIZED_FIELDS) + len(json.dumps(small, default=str))
 
 def lambda_handler(event, context):
     """
@@ -18,10 +58,15 @@ def lambda_handler(event, context):
     
     Reads metadata from DynamoDB and fetches image from S3
     
-    Input: {"image_id": "uuid-string"}
-    Output: {"image_id": "uuid", "image_data": "base64", "metadata": {...}}
+    Input: {"image_id": "uuid-string", "trace": {...}}
+    Output: {"image_id": "uuid", "image_data": "base64", "metadata": {...}, "trace": {...}}
+            in claim_check mode image_data is null and image_ref points at the
+            original object (it is already in S3, so nothing is copied); the
+            object is not read here, so original_dimensions and image_mode are
+            null and Preprocessing reports the dimensions
     """
     
+    start_ms = int(time.time() * 1000)
     try:
         # Get image_id from input
         image_id = event['image_id']
@@ -29,7 +74,11 @@ def lambda_handler(event, context):
         
         # Step 1: Get metadata from DynamoDB
         table = dynamodb.Table(TABLE_NAME)
-        response = table.get_item(Key={'image_id': image_id})
+        response = table.get_item(
+            Key={'image_id': image_id},
+            ProjectionExpression=METADATA_PROJECTION,
+            ExpressionAttributeNames=METADATA_PROJECTION_NAMES
+        )
         
         if 'Item' not in response:
             raise ValueError(f"Image metadata not found for image_id: {image_id}")
@@ -38,21 +87,31 @@ def lambda_handler(event, context):
         s3_bucket = metadata['s3_bucket']
         s3_key = metadata['s3_key']
         
-        print(f"Fetching image from S3: s3://{s3_bucket}/{s3_key}")
-        
-        # Step 2: Fetch image from S3
-        s3_response = s3_client.get_object(Bucket=s3_bucket, Key=s3_key)
-        image_data = s3_response['Body'].read()
-        
-        # Convert to base64 for passing through Step Functions
-        image_base64 = base64.b64encode(image_data).decode('utf-8')
-        
-        # Verify image can be opened
-        image = Image.open(io.BytesIO(image_data))
-        width, height = image.size
-        mode = image.mode
-        
-        print(f"Image loaded successfully: {width}x{height}, mode: {mode}")
+        if PAYLOAD_MODE == 'claim_check':
+            # Preprocessing reads the object (and reports its dimensions); reading it here too
+            # would download every original twice
+            image_base64 = None
+            image_ref = {'bucket': s3_bucket, 'key': s3_key, 'size': int(metadata.get('file_size', 0))}
+            original_dimensions, mode = None, None
+            print(f"Passing reference to s3://{s3_bucket}/{s3_key}")
+        else:
+            print(f"Fetching image from S3: s3://{s3_bucket}/{s3_key}")
+            
+            # Step 2: Fetch image from S3
+            s3_response = s3_client.get_object(Bucket=s3_bucket, Key=s3_key)
+            image_data = s3_response['Body'].read()
+            
+            # Convert to base64 for passing through Step Functions
+            image_base64 = base64.b64encode(image_data).decode('utf-8')
+            image_ref = None
+            
+            # Verify image can be opened
+            image = Image.open(io.BytesIO(image_data))
+            width, height = image.size
+            mode = image.mode
+            original_dimensions = {'width': width, 'height': height}
+            
+            print(f"Image loaded successfully: {width}x{height}, mode: {mode}")
         
         # Update metadata with processing status
         table.update_item(
@@ -65,14 +124,17 @@ def lambda_handler(event, context):
         )
         
         # Return data for next step
-        return {
+        result = {
             'statusCode': 200,
             'image_id': image_id,
             'image_data': image_base64,
-            'original_dimensions': {'width': width, 'height': height},
+            'image_ref': image_ref,
+            'original_dimensions': original_dimensions,
             'image_mode': mode,
             'metadata': dict(metadata)  # Convert DynamoDB item to regular dict
         }
+        result['trace'] = add_trace_span(event, 'fetch_image', start_ms, result)
+        return result
         
     except Exception as e:
         error_msg = f"Error fetching image: {str(e)}"
@@ -92,8 +154,10 @@ def lambda_handler(event, context):
         except:
             pass  # Don't fail if we can't update the error status
         
-        return {
+        result = {
             'statusCode': 500,
             'error': error_msg,
             'image_id': image_id
         }
+        result['trace'] = add_trace_span(event, 'fetch_image', start_ms, result)
+        return result
@@ -0,0 +1,258 @@
+"""
+Micro-batching inference server for the ml-inference models
+
+Concurrent requests for the same model are collected into a micro-batch
+(up to MAX_BATCH images, or whatever has arrived MAX_WAIT_MS after the first
+one), run through one vectorized forward pass, and the results are scattered
+back to the waiting requests. Each model has its own batcher, so AlexNet,
+ResNet and MobileNet batches run side by side on worker threads while the
+event loop keeps accepting requests.
+
+    POST /predict  same body as the Lambda: {"image_id", "processed_image_data" (base64 JPEG),
+                   "model_name"} or {"model_names": [...]}; same response shape
+    GET  /health
+    GET  /stats    batches, mean batch size and queue wait per model
+
+`app` is a plain ASGI application (uvicorn inference_server:app). Running
+this file serves it with uvicorn when installed, otherwise with aiohttp:
+
+    python inference_server.py --port 8081 --max-batch 16 --max-wait-ms 5
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from model_registry import registry_from_env
+from reference_models import check_input, check_model, prepare_input, softmax
+
+
+class ModelBatcher:
+    """One queue + one batching loop per model."""
+
+    def __init__(self, model_name, registry, executor, max_batch, max_wait_ms):
+        self.model_name = model_name
+        self.registry = registry
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.images = 0
+        self.queue_wait_s = 0.0
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def predict(self, image_array):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((image_array, future, time.perf_counter()))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait_s
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            started = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self.executor, self._forward, [item[0] for item in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.images += len(batch)
+            self.queue_wait_s += sum(started - item[2] for item in batch)
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(dict(result, batch_size=len(batch)))
+
+    def _forward(self, arrays):
+        """One forward pass for the whole batch (runs on a worker thread)"""
+        model, model_cache = self.registry.get(self.model_name)
+        start = time.perf_counter()
+        probabilities = softmax(model.forward(np.concatenate([prepare_input(a) for a in arrays])))
+        elapsed = time.perf_counter() - start
+        return [dict(model.predictions(p), processing_time=round(elapsed, 4), model_version=model.version,
+                     model_cache=model_cache) for p in probabilities]
+
+    def stats(self):
+        return {'batches': self.batches, 'images': self.images,
+                'mean_batch_size': round(self.images / self.batches, 2) if self.batches else 0,
+                'mean_queue_wait_ms': round(self.queue_wait_s / self.images * 1000, 3) if self.images else 0,
+                'queued': self.queue.qsize()}
+
+
+class InferenceService:
+    def __init__(self, max_batch=16, max_wait_ms=5.0, threads=None):
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.registry = registry_from_env()
+        self.executor = ThreadPoolExecutor(threads or max(4, os.cpu_count() or 1), thread_name_prefix="infer")
+        self.batchers = {}
+        self.requests = 0
+
+    def batcher(self, model_name):
+        name = model_name.lower()
+        # each batcher is a permanent task: only create them for models that exist
+        check_model(name)
+        if name not in self.batchers:
+            self.batchers[name] = ModelBatcher(name, self.registry, self.executor, self.max_batch, self.max_wait_ms)
+        return self.batchers[name]
+
+    async def handle_predict(self, event):
+        """The Lambda's request/response contract, batched across concurrent callers"""
+        self.requests += 1
+        image_id = event.get('image_id', 'unknown')
+        loop = asyncio.get_running_loop()
+        names = event.get('model_names') or [event.get('model_name', 'unknown')]
+        try:
+            image_array = await loop.run_in_executor(self.executor, decode, event['processed_image_data'])
+        except Exception as e:
+            results = [failed_result(name, image_id, e) for name in names]
+            return results if event.get('model_names') else results[0]
+
+        async def one(model_name):
+            try:
+                result = await self.batcher(model_name).predict(image_array)
+            except Exception as e:
+                return failed_result(model_name, image_id, e)
+            return {
+                'statusCode': 200,
+                'image_id': image_id,
+                'model_name': model_name,
+                'predictions': result['labels'],
+                'confidence_scores': result['scores'],
+                'top_prediction': result['top_prediction'],
+                'processing_time': result['processing_time'],
+                'model_version': result['model_version'],
+                'model_cache': result['model_cache'],
+                'batch_size': result['batch_size']
+            }
+
+        results = await asyncio.gather(*(one(name) for name in names))
+        return results if event.get('model_names') else results[0]
+
+    def stats(self):
+        return {'requests': self.requests, 'max_batch': self.max_batch, 'max_wait_ms': self.max_wait_ms,
+                'models': {name: b.stats() for name, b in self.batchers.items()},
+                'registry': self.registry.stats()}
+
+
+def failed_result(model_name, image_id, error):
+    """The ml-inference Lambda's failed_result shape"""
+    return {'statusCode': 500, 'error': f"Error in {model_name} inference: {str(error)}",
+            'image_id': image_id, 'model_name': model_name, 'inference_failed': True}
+
+
+def decode(processed_image_data):
+    image_array = np.array(Image.open(io.BytesIO(base64.b64decode(processed_image_data))))
+    # checked per request: one wrong-sized image would otherwise fail the np.concatenate of its whole batch
+    check_input(image_array)
+    image_array.setflags(write=False)
+    return image_array
+
+
+# ---------- ASGI ----------
+
+_service = None
+
+
+def get_service():
+    global _service
+    if _service is None:
+        _service = InferenceService(max_batch=int(os.environ.get('MAX_BATCH', '16')),
+                                    max_wait_ms=float(os.environ.get('MAX_WAIT_MS', '5')))
+    return _service
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                get_service()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] != 'http':
+        return
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    status, payload = await route(scope['method'], scope['path'], body)
+    data = json.dumps(payload).encode()
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(data)).encode())]})
+    await send({'type': 'http.response.body', 'body': data})
+
+
+async def route(method, path, body):
+    service = get_service()
+    path = path.rstrip('/')
+    if method == 'GET' and path.endswith('/health'):
+        return 200, {'status': 'ok'}
+    if method == 'GET' and path.endswith('/stats'):
+        return 200, service.stats()
+    if method == 'POST' and path.endswith('/predict'):
+        try:
+            event = json.loads(body)
+        except ValueError:
+            return 400, {'error': 'Body must be JSON'}
+        if 'processed_image_data' not in event:
+            return 400, {'error': 'processed_image_data is required'}
+        return 200, await service.handle_predict(event)
+    return 404, {'error': 'Not Found'}
+
+
+def serve_aiohttp(host, port):
+    from aiohttp import web
+
+    async def handler(request):
+        status, payload = await route(request.method, request.path, await request.read())
+        return web.json_response(payload, status=status)
+
+    web_app = web.Application(client_max_size=8 * 1024 * 1024)
+    web_app.router.add_route('*', '/{tail:.*}', handler)
+    web.run_app(web_app, host=host, port=port, print=None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-batching inference server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--max-batch", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    os.environ['MAX_BATCH'], os.environ['MAX_WAIT_MS'] = str(args.max_batch), str(args.max_wait_ms)
+    print(f"🧠 Inference server on http://{args.host}:{args.port} "
+          f"(max batch {args.max_batch}, max wait {args.max_wait_ms}ms)", flush=True)
+    try:
+        import uvicorn
+    except ImportError:
+        return serve_aiohttp(args.host, args.port)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
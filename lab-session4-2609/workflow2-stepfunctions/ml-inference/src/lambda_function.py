@@ -1,37 +1,144 @@
 import json
 import base64
+import threading
+from collections import OrderedDict
 import numpy as np
 from PIL import Image
 import io
 import os
 import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+
+from model_registry import registry_from_env
+from reference_models import check_input, check_model
+
+# numpy: small NumPy reference CNNs (reference_models.py), real CPU work (default)
+# mock: random labels + time.sleep, the original simulation
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'numpy')
+
+# claim_check: the processed image arrives as an S3 reference instead of base64
+PAYLOAD_MODE = os.environ.get('PAYLOAD_MODE', 'inline')
+CACHE_BYTES = int(float(os.environ.get('CLAIM_CHECK_CACHE_MB', '64')) * 1024 * 1024)
+
+s3_client = boto3.client('s3') if PAYLOAD_MODE == 'claim_check' else None
+
+# Per-container LRU of processed images: (bucket, key) -> bytes. Keys are content
+# addressed, so a cached entry can never be stale.
+_blob_cache = OrderedDict()
+_blob_cache_bytes = 0
+_blob_cache_lock = threading.Lock()
+
+def read_blob(ref):
+    """Bytes behind a claim-check reference, served from the container cache when possible"""
+    global _blob_cache_bytes
+    cache_key = (ref['bucket'], ref['key'])
+    with _blob_cache_lock:
+        data = _blob_cache.get(cache_key)
+        if data is not None:
+            _blob_cache.move_to_end(cache_key)
+            return data
+    data = s3_client.get_object(Bucket=ref['bucket'], Key=ref['key'])['Body'].read()
+    if len(data) <= CACHE_BYTES:
+        with _blob_cache_lock:
+            if cache_key not in _blob_cache:
+                _blob_cache[cache_key] = data
+                _blob_cache_bytes += len(data)
+                while _blob_cache_bytes > CACHE_BYTES:
+                    _, evicted = _blob_cache.popitem(last=False)
+                    _blob_cache_bytes -= len(evicted)
+    return data
+
+# base64 images in the state: sized by their length rather than serialised for the trace
+TRACE_SIZED_FIELDS = ('image_data', 'processed_image_data')
+_cold_start = True
+
+def add_trace_span(event, stage, start_ms, result):
+    """The state's trace context plus this invocation's span; a copy of fetch-image's add_trace_span"""
+    global _cold_start
+    trace = dict(event.get('trace') or {})
+    span = [stage, start_ms, int(time.time() * 1000), _cold_start, _payload_bytes(event), _payload_bytes(result)]
+    _cold_start = False
+    trace['spans'] = list(trace.get('spans', [])) + [span]
+    return trace
+
+def _payload_bytes(payload):
+    if isinstance(payload, list):
+        return sum(_payload_bytes(item) for item in payload)
+    small = {k: v for k, v in payload.items() if k not in TRACE_SIZED_FIELDS and k != 'trace'}
+    return sum(len(payload.get(k) or '') for k in TRACE_SIZED_FIELDS) + len(json.dumps(small, default=str))
 
 def lambda_handler(event, context):
     """
     ML Inference Lambda - Parallel execution for AlexNet, ResNet, MobileNet
     
-    This is a mock implementation that simulates ML model inference.
-    In a real scenario, you would load actual models (TensorFlow, PyTorch, etc.)
+    Runs small NumPy reference CNNs (reference_models.py) with fixed seeded
+    weights: the compute is real, the labels are not meaningful. In a real
+    scenario, you would load trained models (TensorFlow, PyTorch, etc.)
+    INFERENCE_BACKEND=mock restores the original random-label + sleep simulation.
     
     Input: {"processed_image_data": "base64", "model_name": "alexnet|resnet|mobilenet", ...}
+           or {"processed_image_ref": {"bucket", "key"}, ...} in claim_check mode
     Output: {"predictions": [...], "model_name": "...", "confidence": 0.95}
+    
+    Multi-model mode: {"model_names": ["alexnet", "resnet", "mobilenet"], ...}
+    decodes the image once, runs the models concurrently on the shared array and
+    returns a list with one result per model, in the same order and shape as the
+    ParallelInference branches produce (a failed model gets the same
+    inference_failed entry as the *Failed Pass states).
+    
+    Every result carries the trace context with an "ml_inference:<model>" span
+    ("ml_inference:multi_model" on each result in multi-model mode).
     """
     
+    global _invocations
+    _invocations += 1
+    start_ms = int(time.time() * 1000)
+    
+    if event.get('model_names'):
+        results = run_models(event)
+        trace = add_trace_span(event, 'ml_inference:multi_model', start_ms, results)
+        for result in results:
+            result['trace'] = trace
+        return results
+    
+    model_name = event.get('model_name', 'unknown')
     try:
         image_id = event['image_id']
-        model_name = event.get('model_name', 'unknown')
-        processed_image_base64 = event['processed_image_data']
         
         print(f"Running {model_name} inference for image_id: {image_id}")
         
-        # Decode the processed image
-        image_data = base64.b64decode(processed_image_base64)
-        image = Image.open(io.BytesIO(image_data))
-        
-        # Convert to numpy array (simulating model preprocessing)
-        image_array = np.array(image)
-        print(f"Image array shape: {image_array.shape}")
+        image_array = decode_image(event)
+        result = run_model(model_name, image_id, image_array)
         
+    except Exception as e:
+        result = failed_result(model_name, event.get('image_id', 'unknown'), e)
+    
+    result['trace'] = add_trace_span(event, f'ml_inference:{model_name}', start_ms, result)
+    return result
+
+def decode_image(event):
+    """Processed image from the event as a read-only numpy array"""
+    # Decode the processed image (or read it from S3 when the state carries a reference)
+    if event.get('processed_image_ref'):
+        image_data = read_blob(event['processed_image_ref'])
+    else:
+        image_data = base64.b64decode(event['processed_image_data'])
+    image = Image.open(io.BytesIO(image_data))
+    
+    # Convert to numpy array (simulating model preprocessing)
+    image_array = np.array(image)
+    image_array.setflags(write=False)  # shared between models in multi-model mode
+    print(f"Image array shape: {image_array.shape}")
+    return image_array
+
+# Models stay loaded across warm invocations (lazy, memory-mapped, LRU within MODEL_CACHE_MB)
+model_registry = registry_from_env()
+_invocations = 0
+
+def run_model(model_name, image_id, image_array):
+    if INFERENCE_BACKEND == 'mock':
         # Mock inference based on model type
         predictions = perform_mock_inference(model_name, image_array)
         
@@ -41,34 +148,70 @@ def lambda_handler(event, context):
             'resnet': 0.3,     # Slower, more accurate
             'mobilenet': 0.05  # Fastest, optimized for mobile
         }
-        
-        import time
-        time.sleep(processing_times.get(model_name.lower(), 0.2))
-        
-        print(f"{model_name} inference completed for image_id: {image_id}")
-        
-        return {
-            'statusCode': 200,
-            'image_id': image_id,
-            'model_name': model_name,
-            'predictions': predictions['labels'],
-            'confidence_scores': predictions['scores'],
-            'top_prediction': predictions['top_prediction'],
-            'processing_time': processing_times.get(model_name.lower(), 0.2),
-            'model_version': get_model_version(model_name)
-        }
-        
+        processing_time = processing_times.get(model_name.lower(), 0.2)
+        time.sleep(processing_time)
+        model_version = get_model_version(model_name)
+        model_cache = None
+    else:
+        # readable failures instead of a KeyError from the weight seeds or a matmul shape error
+        check_model(model_name.lower())
+        check_input(image_array)
+        model, model_cache = model_registry.get(model_name)
+        start = time.perf_counter()
+        predictions = model.predict(image_array)
+        processing_time = round(time.perf_counter() - start, 4)
+        model_version = model.version
+        model_cache['cold_container'] = _invocations == 1
+        if model_cache['evicted']:
+            print(f"Model cache evicted: {', '.join(model_cache['evicted'])}")
+        print(f"{model_name}: cache {'hit' if model_cache['cache_hit'] else 'miss'}, "
+              f"load {model_cache['load_ms']:.1f}ms, inference {processing_time * 1000:.1f}ms")
+    
+    print(f"{model_name} inference completed for image_id: {image_id}")
+    
+    return {
+        'statusCode': 200,
+        'image_id': image_id,
+        'model_name': model_name,
+        'predictions': predictions['labels'],
+        'confidence_scores': predictions['scores'],
+        'top_prediction': predictions['top_prediction'],
+        'processing_time': processing_time,
+        'model_version': model_version,
+        'model_cache': model_cache
+    }
+
+def failed_result(model_name, image_id, error):
+    error_msg = f"Error in {model_name} inference: {str(error)}"
+    print(f"ERROR: {error_msg}")
+    
+    return {
+        'statusCode': 500,
+        'error': error_msg,
+        'image_id': image_id,
+        'model_name': model_name,
+        'inference_failed': True
+    }
+
+def run_models(event):
+    """Multi-model mode: one decode, every model on its own thread (BLAS releases the GIL)"""
+    image_id = event.get('image_id', 'unknown')
+    model_names = event['model_names']
+    print(f"Running {', '.join(model_names)} inference for image_id: {image_id}")
+    
+    try:
+        image_array = decode_image(event)
     except Exception as e:
-        error_msg = f"Error in {model_name} inference: {str(e)}"
-        print(f"ERROR: {error_msg}")
-        
-        return {
-            'statusCode': 500,
-            'error': error_msg,
-            'image_id': event.get('image_id', 'unknown'),
-            'model_name': event.get('model_name', 'unknown'),
-            'inference_failed': True
-        }
+        return [failed_result(name, image_id, e) for name in model_names]
+    
+    def run_one(model_name):
+        try:
+            return run_model(model_name, image_id, image_array)
+        except Exception as e:
+            return failed_result(model_name, image_id, e)
+    
+    with ThreadPoolExecutor(max_workers=len(model_names)) as executor:
+        return list(executor.map(run_one, model_names))
 
 def perform_mock_inference(model_name, image_array):
     """
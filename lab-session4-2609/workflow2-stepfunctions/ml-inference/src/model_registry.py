@@ -0,0 +1,96 @@
+"""
+Warm-container model registry for the ml-inference Lambda
+
+Models are loaded on first use per model_name and kept at module scope, so
+warm invocations skip the load. Weight files are memory-mapped read-only
+(np.load(mmap_mode='r')): pages are read on first touch and are file-backed,
+so the kernel can drop them under pressure instead of the function running
+out of memory, and several models fit side by side. An LRU budget
+(MODEL_CACHE_MB) bounds how many stay loaded.
+
+get() returns the model plus what it cost (cache hit, load time), which the
+handler puts in its response so cold vs warm latency is visible per call.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from reference_models import ReferenceModel, load_weights
+
+
+class ModelRegistry:
+    def __init__(self, budget_mb=512, mmap=True, factory=None):
+        """
+        budget_mb: LRU budget for loaded weights (mapped size when mmap=True)
+        factory:   callable(model_name, weights) -> model; default ReferenceModel
+        """
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.mmap_mode = 'r' if mmap else None
+        self.factory = factory or ReferenceModel
+        self.models = OrderedDict()  # model_name -> (model, size_bytes)
+        self.lock = threading.Lock()
+        self.load_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_ms_total = 0.0
+
+    def get(self, model_name):
+        """(model, {"cache_hit", "load_ms", "evicted"}); loads at most once per name at a time"""
+        name = model_name.lower()
+        with self.lock:
+            if name in self.models:
+                self.models.move_to_end(name)
+                self.hits += 1
+                return self.models[name][0], {'cache_hit': True, 'load_ms': 0.0, 'evicted': []}
+            load_lock = self.load_locks.setdefault(name, threading.Lock())
+
+        with load_lock:
+            with self.lock:  # another thread may have loaded it while we waited
+                if name in self.models:
+                    self.models.move_to_end(name)
+                    self.hits += 1
+                    return self.models[name][0], {'cache_hit': True, 'load_ms': 0.0, 'evicted': []}
+            start = time.perf_counter()
+            weights = load_weights(name, mmap_mode=self.mmap_mode)
+            model = self.factory(name, weights)
+            load_ms = (time.perf_counter() - start) * 1000
+            with self.lock:
+                self.misses += 1
+                self.load_ms_total += load_ms
+                self.models[name] = (model, int(weights.nbytes))
+                evicted = self._evict(keep=name)
+        return model, {'cache_hit': False, 'load_ms': round(load_ms, 3), 'evicted': evicted}
+
+    def _evict(self, keep):
+        evicted = []
+        while self.resident_bytes() > self.budget_bytes and len(self.models) > 1:
+            name = next(iter(self.models))
+            if name == keep:
+                break
+            del self.models[name]  # the memmap is unmapped once the last reference goes
+            self.evictions += 1
+            evicted.append(name)
+        return evicted
+
+    def resident_bytes(self):
+        return sum(size for _, size in self.models.values())
+
+    def stats(self):
+        with self.lock:
+            return {
+                'loaded': list(self.models),
+                'resident_mb': round(self.resident_bytes() / (1024 * 1024), 2),
+                'budget_mb': round(self.budget_bytes / (1024 * 1024), 2),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'load_ms_total': round(self.load_ms_total, 3)
+            }
+
+
+def registry_from_env():
+    return ModelRegistry(budget_mb=float(os.environ.get('MODEL_CACHE_MB', '512')),
+                         mmap=os.environ.get('MODEL_MMAP', 'true').lower() != 'false')
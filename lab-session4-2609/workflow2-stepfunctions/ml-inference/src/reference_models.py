@@ -0,0 +1,271 @@
+"""
+Small NumPy-only reference CNNs for the ml-inference Lambda
+
+AlexNet-, ResNet- and MobileNet-shaped networks (narrow versions of the real
+architectures) so inference latency comes from real float32 compute rather
+than time.sleep. Convolutions use im2col + one GEMM per layer (NumPy's BLAS
+releases the GIL); depthwise convolutions are k*k vectorized multiply-adds.
+
+Weights are deterministic: He-normal from a per-model seed, biases zero,
+stored as one flat float32 vector per model in weights/<model>.npy. The
+predictions are not meaningful - the point is the cost profile. Regenerate the
+files with:
+
+    python reference_models.py --write-weights
+"""
+
+import os
+import sys
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+WEIGHTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights")
+INPUT_SIZE = 224
+
+# Common ImageNet-like class labels
+CLASS_LABELS = [
+    'cat', 'dog', 'bird', 'car', 'bicycle', 'airplane', 'boat', 'train',
+    'truck', 'traffic_light', 'fire_hydrant', 'stop_sign', 'parking_meter',
+    'bench', 'elephant', 'bear', 'zebra', 'giraffe', 'backpack', 'umbrella',
+    'handbag', 'tie', 'suitcase', 'frisbee', 'skis', 'snowboard', 'sports_ball',
+    'kite', 'baseball_bat', 'baseball_glove', 'skateboard', 'surfboard',
+    'tennis_racket', 'bottle', 'wine_glass', 'cup', 'fork', 'knife', 'spoon',
+    'bowl', 'banana', 'apple', 'sandwich', 'orange', 'broccoli', 'carrot',
+    'hot_dog', 'pizza', 'donut', 'cake'
+]
+
+SEEDS = {'alexnet': 2012, 'resnet': 2015, 'mobilenet': 2017}
+VERSIONS = {
+    'alexnet': 'AlexNet-mini numpy-ref v1',
+    'resnet': 'ResNet-18-mini numpy-ref v1',
+    'mobilenet': 'MobileNetV1-0.25 numpy-ref v1'
+}
+TOP_K = {'alexnet': 5, 'resnet': 5, 'mobilenet': 3}
+# Untrained networks have arbitrary logit scales (the ResNet, with no batch norm,
+# saturates softmax); logits are standardized and multiplied by this before softmax
+# so the three models report comparable confidence ranges.
+LOGIT_SCALE = 1.5
+
+
+# ---------- layers (x is always (N, H, W, C) float32) ----------
+
+def conv2d(x, w, b, stride=1, pad=0):
+    """w: (kh, kw, C, F). im2col copy of the strided windows, then one GEMM."""
+    kh, kw, c, f = w.shape
+    if kh == 1 and kw == 1 and pad == 0:
+        x = x[:, ::stride, ::stride] if stride > 1 else x
+        n, oh, ow, _ = x.shape
+        return (x.reshape(-1, c) @ w.reshape(c, f) + b).reshape(n, oh, ow, f)
+    if pad:
+        x = np.pad(x, ((0, 0), (pad, pad), (pad, pad), (0, 0)))
+    windows = sliding_window_view(x, (kh, kw), axis=(1, 2))[:, ::stride, ::stride]  # (N, oh, ow, C, kh, kw)
+    n, oh, ow = windows.shape[:3]
+    cols = windows.transpose(0, 1, 2, 4, 5, 3).reshape(n * oh * ow, kh * kw * c)
+    out = cols @ w.reshape(kh * kw * c, f)
+    out += b
+    return out.reshape(n, oh, ow, f)
+
+
+def depthwise_conv2d(x, w, b, stride=1, pad=1):
+    """w: (kh, kw, C), one filter per channel."""
+    kh, kw, _ = w.shape
+    if pad:
+        x = np.pad(x, ((0, 0), (pad, pad), (pad, pad), (0, 0)))
+    oh = (x.shape[1] - kh) // stride + 1
+    ow = (x.shape[2] - kw) // stride + 1
+    out = np.zeros((x.shape[0], oh, ow, x.shape[3]), dtype=np.float32)
+    for i in range(kh):
+        for j in range(kw):
+            out += x[:, i:i + stride * oh:stride, j:j + stride * ow:stride] * w[i, j]
+    out += b
+    return out
+
+
+def max_pool(x, size=3, stride=2, pad=0):
+    if pad:
+        x = np.pad(x, ((0, 0), (pad, pad), (pad, pad), (0, 0)), constant_values=-np.inf)
+    return sliding_window_view(x, (size, size), axis=(1, 2))[:, ::stride, ::stride].max(axis=(-2, -1))
+
+
+def relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def softmax(logits):
+    logits = (logits - logits.mean(axis=-1, keepdims=True)) / (logits.std(axis=-1, keepdims=True) + 1e-6)
+    z = logits * LOGIT_SCALE
+    z -= z.max(axis=-1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+# ---------- parameters ----------
+
+class Params:
+    """Hands out a model's parameters in the order its forward pass asks for them."""
+
+    def __init__(self, flat):
+        self.flat = flat
+        self.pos = 0
+
+    def take(self, *shape, kind="weight"):
+        size = int(np.prod(shape))
+        array = self.flat[self.pos:self.pos + size].reshape(shape)
+        self.pos += size
+        return array
+
+
+class _ShapeRecorder:
+    """Stand-in for Params that records shapes (used once to generate weights)."""
+
+    def __init__(self):
+        self.shapes = []
+
+    def take(self, *shape, kind="weight"):
+        self.shapes.append((shape, kind))
+        if kind == "bias":
+            return np.zeros(shape, dtype=np.float32)
+        return np.full(shape, 0.01, dtype=np.float32)
+
+
+# ---------- architectures ----------
+
+def _conv(x, p, k, c_in, c_out, stride=1, pad=0):
+    return conv2d(x, p.take(k, k, c_in, c_out), p.take(c_out, kind="bias"), stride, pad)
+
+
+def _dense(x, p, n_in, n_out):
+    return x @ p.take(n_in, n_out) + p.take(n_out, kind="bias")
+
+
+def alexnet(x, p):
+    x = max_pool(relu(_conv(x, p, 11, 3, 16, stride=4, pad=2)))   # 55 -> 27
+    x = max_pool(relu(_conv(x, p, 5, 16, 32, pad=2)))             # 27 -> 13
+    x = relu(_conv(x, p, 3, 32, 48, pad=1))
+    x = relu(_conv(x, p, 3, 48, 48, pad=1))
+    x = max_pool(relu(_conv(x, p, 3, 48, 32, pad=1)))             # 13 -> 6
+    x = x.reshape(x.shape[0], -1)
+    x = relu(_dense(x, p, 6 * 6 * 32, 256))
+    x = relu(_dense(x, p, 256, 256))
+    return _dense(x, p, 256, len(CLASS_LABELS))
+
+
+def resnet(x, p):
+    x = max_pool(relu(_conv(x, p, 7, 3, 16, stride=2, pad=3)), pad=1)   # 112 -> 56
+    c_in = 16
+    for c_out, stride in ((16, 1), (32, 2), (64, 2), (128, 2)):          # ResNet-18 layout, 2 blocks per stage
+        for block in range(2):
+            s = stride if block == 0 else 1
+            shortcut = x if (s == 1 and c_in == c_out) else _conv(x, p, 1, c_in, c_out, stride=s)
+            y = relu(_conv(x, p, 3, c_in, c_out, stride=s, pad=1))
+            y = _conv(y, p, 3, c_out, c_out, pad=1)
+            x = relu(y + shortcut)
+            c_in = c_out
+    return _dense(x.mean(axis=(1, 2)), p, c_in, len(CLASS_LABELS))
+
+
+def mobilenet(x, p):
+    x = relu(_conv(x, p, 3, 3, 8, stride=2, pad=1))   # 112
+    c_in = 8
+    blocks = [(16, 1), (32, 2), (32, 1), (64, 2), (64, 1), (128, 2)] + [(128, 1)] * 5 + [(256, 2), (256, 1)]
+    for c_out, stride in blocks:                       # depthwise 3x3 + pointwise 1x1
+        x = relu(depthwise_conv2d(x, p.take(3, 3, c_in, kind="depthwise"), p.take(c_in, kind="bias"), stride))
+        x = relu(_conv(x, p, 1, c_in, c_out))
+        c_in = c_out
+    return _dense(x.mean(axis=(1, 2)), p, c_in, len(CLASS_LABELS))
+
+
+ARCHITECTURES = {'alexnet': alexnet, 'resnet': resnet, 'mobilenet': mobilenet}
+
+
+def check_model(model_name):
+    """Raise ValueError unless model_name is one of ARCHITECTURES"""
+    if model_name not in ARCHITECTURES:
+        raise ValueError(f"Unknown model: {model_name} (expected one of {', '.join(ARCHITECTURES)})")
+
+
+def generate_weights(model_name):
+    """Deterministic He-normal weights (zero biases) as one flat float32 vector."""
+    check_model(model_name)
+    recorder = _ShapeRecorder()
+    ARCHITECTURES[model_name](np.zeros((1, INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32), recorder)
+    rng = np.random.default_rng(SEEDS[model_name])
+    parts = []
+    for shape, kind in recorder.shapes:
+        if kind == "bias":
+            parts.append(np.zeros(shape, dtype=np.float32).ravel())
+            continue
+        fan_in = int(np.prod(shape[:-1])) if kind == "weight" else shape[0] * shape[1]
+        parts.append((rng.standard_normal(int(np.prod(shape))) * np.sqrt(2.0 / fan_in)).astype(np.float32))
+    return np.concatenate(parts)
+
+
+def weights_path(model_name):
+    return os.path.join(WEIGHTS_DIR, f"{model_name}.npy")
+
+
+def load_weights(model_name, mmap_mode=None):
+    """The flat weight vector from weights/<model>.npy (generated if the file is missing)."""
+    check_model(model_name)
+    path = weights_path(model_name)
+    if os.path.exists(path):
+        return np.load(path, mmap_mode=mmap_mode)
+    return generate_weights(model_name)
+
+
+# ---------- inference ----------
+
+def check_input(image_array):
+    """Raise ValueError unless image_array is one INPUT_SIZE x INPUT_SIZE image, (H, W) or (H, W, C)"""
+    shape = np.shape(image_array)
+    if len(shape) not in (2, 3) or shape[:2] != (INPUT_SIZE, INPUT_SIZE):
+        raise ValueError(f"expected {INPUT_SIZE}x{INPUT_SIZE} input, got shape {shape}")
+
+
+def prepare_input(image_array):
+    """uint8 (H, W), (H, W, 3) or a batch of either -> float32 (N, H, W, 3) in [-0.5, 0.5]"""
+    x = np.asarray(image_array, dtype=np.float32)
+    if x.ndim == 2 or (x.ndim == 3 and x.shape[-1] != 3):
+        x = np.repeat(x[..., None], 3, axis=-1)
+    if x.ndim == 3:
+        x = x[None]
+    return x * (1 / 255.0) - 0.5
+
+
+class ReferenceModel:
+    def __init__(self, model_name, weights=None):
+        check_model(model_name)
+        self.name = model_name
+        self.weights = load_weights(model_name) if weights is None else weights
+        self.version = VERSIONS[model_name]
+        self.top_k = TOP_K[model_name]
+
+    def forward(self, x):
+        """Batched logits: x is (N, 224, 224, 3) float32"""
+        return ARCHITECTURES[self.name](x, Params(self.weights))
+
+    def predict(self, image_array):
+        """Same dict shape the mock produced: labels, scores, top_prediction"""
+        check_input(image_array)
+        return self.predictions(softmax(self.forward(prepare_input(image_array)))[0])
+
+    def predictions(self, probabilities):
+        top = np.argsort(probabilities)[::-1][:self.top_k]
+        labels = [CLASS_LABELS[i] for i in top]
+        scores = [round(float(probabilities[i]), 3) for i in top]
+        return {
+            'labels': labels,
+            'scores': scores,
+            'top_prediction': {'label': labels[0], 'confidence': scores[0]}
+        }
+
+
+if __name__ == "__main__":
+    if "--write-weights" not in sys.argv:
+        sys.exit(__doc__)
+    os.makedirs(WEIGHTS_DIR, exist_ok=True)
+    for name in ARCHITECTURES:
+        flat = generate_weights(name)
+        np.save(weights_path(name), flat)
+        print(f"{name}: {flat.size:,} parameters -> {weights_path(name)} ({flat.nbytes / 1e6:.1f} MB)")
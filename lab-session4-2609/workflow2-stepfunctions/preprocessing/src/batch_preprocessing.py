@@ -0,0 +1,313 @@
+import io
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime
+
+import boto3
+import numpy as np
+
+from lambda_function import TARGET_SIZE, preprocess_image
+
+# Initialize AWS clients
+s3_client = boto3.client('s3')
+dynamodb = boto3.resource('dynamodb')
+
+# Environment variables
+BUCKET_NAME = os.environ.get('S3_BUCKET_NAME')
+TABLE_NAME = os.environ.get('DYNAMODB_TABLE_NAME')
+
+DEFAULT_SHARD_SIZE = 1024
+IO_THREADS = 16
+# stop taking new images when less than this much Lambda time is left
+TIME_RESERVE_S = 30
+
+def lambda_handler(event, context):
+    """
+    Batch Preprocessing Lambda - backfill entry point for Workflow 2
+
+    Runs the same preprocessing as lambda_function.py over many images in one
+    invocation: S3 downloads stream through a thread pool, decoding and
+    resizing run on a process pool sized to the container's CPUs, and results
+    are packed into .npy shards of shape (N, 224, 224) uint8.
+
+    Input: {"image_ids": ["uuid", ...]}            (S3 location looked up in DynamoDB)
+        or {"s3_prefix": "raw-images/"}            (every object under the prefix)
+        optional: "output_prefix", "shard_size", "workers", "pool": "auto|process|thread"
+    Output: {"manifest_key": "...", "processed": N, "failed": N, "unprocessed": [...], ...}
+
+    A failing image is recorded in the manifest and skipped; it never fails the
+    batch. Images not started before the Lambda deadline come back in
+    "unprocessed" so the caller can resubmit them.
+    """
+
+    started = time.monotonic()
+    output_prefix = event.get('output_prefix') or f"preprocessed/{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}/"
+    shard_size = int(event.get('shard_size', DEFAULT_SHARD_SIZE))
+    workers = int(event.get('workers') or cpu_count())
+    deadline = None
+    if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+        deadline = started + context.get_remaining_time_in_millis() / 1000 - TIME_RESERVE_S
+
+    if event.get('image_ids'):
+        items = ({'image_id': image_id} for image_id in event['image_ids'])
+    elif event.get('s3_prefix') is not None:
+        items = list_prefix(event.get('s3_bucket', BUCKET_NAME), event['s3_prefix'])
+    else:
+        return {'statusCode': 400, 'error': 'Provide image_ids or s3_prefix'}
+
+    print(f"Batch preprocessing into s3://{BUCKET_NAME}/{output_prefix} "
+          f"({workers} workers, shards of {shard_size})")
+
+    pool, pool_kind = make_pool(workers, event.get('pool', 'auto'))
+    writer = ShardWriter(BUCKET_NAME, output_prefix, shard_size)
+    failed, unprocessed = [], []
+    try:
+        in_flight = {}
+
+        def collect(done):
+            for future in done:
+                item = in_flight.pop(future)
+                try:
+                    status, value = future.result()
+                except Exception as e:  # worker process died
+                    status, value = 'error', f"worker failed: {e}"
+                if status == 'ok':
+                    writer.add(item, value)
+                else:
+                    failed.append(dict(item, error=value))
+
+        for item, data, error in stream_objects(items, workers * 2, deadline, unprocessed):
+            if error:
+                failed.append(dict(item, error=error))
+                continue
+            in_flight[pool.submit(data)] = item
+            if len(in_flight) >= workers * 2:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+        collect(wait(in_flight)[0])
+        manifest_key = writer.close(failed, unprocessed)
+    finally:
+        pool.shutdown()
+
+    elapsed = time.monotonic() - started
+    print(f"Batch done: {writer.count} processed, {len(failed)} failed, {len(unprocessed)} unprocessed "
+          f"in {elapsed:.1f}s ({writer.count / elapsed:.1f} images/s, {pool_kind} pool)")
+
+    return {
+        'statusCode': 200,
+        'manifest_key': manifest_key,
+        'output_prefix': output_prefix,
+        'shards': len(writer.shards),
+        'processed': writer.count,
+        'failed': len(failed),
+        'unprocessed': unprocessed,
+        'elapsed_s': round(elapsed, 3),
+        'images_per_s': round(writer.count / elapsed, 2) if elapsed else None,
+        'pool': pool_kind,
+        'workers': workers
+    }
+
+def cpu_count():
+    """CPUs this container may use (Lambda: about 1 vCPU per 1769 MB of memory)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def image_id_from_key(key):
+    """workflow1 stores images as raw-images/<image_id>_<filename>"""
+    name = os.path.basename(key)
+    return name.split('_', 1)[0] if '_' in name else name
+
+def list_prefix(bucket, prefix):
+    """Yield one work item per object under the prefix, a page at a time"""
+    kwargs = {'Bucket': bucket, 'Prefix': prefix}
+    while True:
+        page = s3_client.list_objects_v2(**kwargs)
+        for obj in page.get('Contents', []):
+            yield {'image_id': image_id_from_key(obj['Key']), 's3_bucket': bucket, 's3_key': obj['Key']}
+        if not page.get('IsTruncated'):
+            return
+        kwargs['ContinuationToken'] = page['NextContinuationToken']
+
+def fetch(item):
+    """Read one image; looks up its S3 location first when only the image_id is known"""
+    if 's3_key' not in item:
+        response = dynamodb.Table(TABLE_NAME).get_item(Key={'image_id': item['image_id']},
+                                                       ProjectionExpression='s3_bucket, s3_key')
+        if 'Item' not in response:
+            raise ValueError(f"Image metadata not found for image_id: {item['image_id']}")
+        item.update(s3_bucket=response['Item']['s3_bucket'], s3_key=response['Item']['s3_key'])
+    return s3_client.get_object(Bucket=item['s3_bucket'], Key=item['s3_key'])['Body'].read()
+
+def stream_objects(items, window, deadline, unprocessed):
+    """
+    Yield (item, bytes, error) as downloads finish, with at most `window`
+    downloads in flight. Items left when the deadline passes go to `unprocessed`.
+    """
+    items = iter(items)
+    pending = deque()
+    with ThreadPoolExecutor(IO_THREADS) as io_pool:
+        for item in items:
+            if deadline is not None and time.monotonic() > deadline:
+                unprocessed.append(item['image_id'])
+                unprocessed.extend(i['image_id'] for i in items)
+                break
+            pending.append((item, io_pool.submit(fetch, item)))
+            while len(pending) >= window or (pending and pending[0][1].done()):
+                yield _download_result(*pending.popleft())
+        while pending:
+            yield _download_result(*pending.popleft())
+
+def _download_result(item, future):
+    try:
+        return item, future.result(), None
+    except Exception as e:
+        return item, None, f"download failed: {e}"
+
+def preprocess_one(data):
+    """('ok', uint8 array) or ('error', message); never raises, so one bad image cannot stop the batch"""
+    try:
+        return 'ok', preprocess_image(data, pipeline='fused', output='array')
+    except Exception as e:
+        return 'error', f"preprocessing failed: {e}"
+
+# ---------- worker pools ----------
+
+def _pipe_worker(conn):
+    while True:
+        data = conn.recv()
+        if data is None:
+            return
+        conn.send(preprocess_one(data))
+
+class PipePool:
+    """
+    Process pool built on multiprocessing.Pipe. AWS Lambda has no /dev/shm, so
+    ProcessPoolExecutor and multiprocessing.Pool (which need semaphores) fail
+    there; plain pipes work. One feeder thread per worker process keeps one
+    task in flight per process. A worker that dies is replaced and only the
+    image it was working on fails.
+    """
+
+    def __init__(self, workers):
+        self.context = multiprocessing.get_context('fork')
+        self.tasks = queue.Queue()
+        self.processes = [None] * workers
+        self.connections = [None] * workers
+        for index in range(workers):
+            self._start(index)
+        self.threads = [threading.Thread(target=self._feed, args=(index,), daemon=True) for index in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def _start(self, index):
+        parent, child = self.context.Pipe()
+        process = self.context.Process(target=_pipe_worker, args=(child,), daemon=True)
+        process.start()
+        child.close()
+        self.processes[index], self.connections[index] = process, parent
+
+    def _feed(self, index):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                self.connections[index].send(None)
+                return
+            future, data = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                self.connections[index].send(data)
+                future.set_result(self.connections[index].recv())
+            except (EOFError, OSError) as e:
+                future.set_exception(e)
+                self.processes[index].join(timeout=1)
+                self._start(index)
+
+    def submit(self, data):
+        future = Future()
+        self.tasks.put((future, data))
+        return future
+
+    def shutdown(self):
+        for _ in self.threads:
+            self.tasks.put(None)
+        for thread in self.threads:
+            thread.join()
+        for process in self.processes:
+            process.join(timeout=5)
+
+class ThreadPool:
+    """Fallback when fork is unavailable; Pillow releases the GIL while decoding and resizing"""
+
+    def __init__(self, workers):
+        self.executor = ThreadPoolExecutor(workers)
+
+    def submit(self, data):
+        return self.executor.submit(preprocess_one, data)
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+def make_pool(workers, kind='auto'):
+    if kind in ('auto', 'process') and workers > 1 and hasattr(os, 'fork'):
+        try:
+            return PipePool(workers), 'process'
+        except OSError as e:
+            if kind == 'process':
+                raise
+            print(f"WARNING: process pool unavailable ({e}), using threads")
+    return ThreadPool(workers), 'thread'
+
+# ---------- output ----------
+
+class ShardWriter:
+    """Packs arrays into (N, H, W) uint8 .npy shards and uploads each one as it fills"""
+
+    def __init__(self, bucket, prefix, shard_size):
+        self.bucket, self.prefix, self.shard_size = bucket, prefix, shard_size
+        self.buffer, self.buffer_items = [], []
+        self.shards = []
+        self.count = 0
+
+    def add(self, item, array):
+        self.buffer.append(array)
+        self.buffer_items.append(item)
+        self.count += 1
+        if len(self.buffer) >= self.shard_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        key = f"{self.prefix}shard-{len(self.shards):05d}.npy"
+        out = io.BytesIO()
+        np.save(out, np.stack(self.buffer), allow_pickle=False)
+        s3_client.put_object(Bucket=self.bucket, Key=key, Body=out.getvalue(), ContentType='application/octet-stream')
+        self.shards.append({'key': key, 'count': len(self.buffer), 'bytes': out.tell(),
+                            'image_ids': [i['image_id'] for i in self.buffer_items]})
+        print(f"Wrote s3://{self.bucket}/{key} ({len(self.buffer)} images)")
+        self.buffer, self.buffer_items = [], []
+
+    def close(self, failed, unprocessed):
+        """Flush the last shard and write manifest.json; returns its key"""
+        self.flush()
+        key = f"{self.prefix}manifest.json"
+        manifest = {
+            'created_at': datetime.utcnow().isoformat(),
+            'shape': list(TARGET_SIZE[::-1]),
+            'dtype': 'uint8',
+            'processed': self.count,
+            'shards': self.shards,
+            'failed': failed,
+            'unprocessed': unprocessed
+        }
+        s3_client.put_object(Bucket=self.bucket, Key=key, Body=json.dumps(manifest, indent=2).encode(),
+                             ContentType='application/json')
+        return key
@@ -0,0 +1,127 @@
+import base64
+import os
+import time
+
+import boto3
+from botocore.exceptions import ClientError
+from PIL import Image
+
+from lambda_function import (PAYLOAD_MODE, PIPELINE_STEPS, PREPROCESS_PIPELINE, add_trace_span, encode_jpeg,
+                             preprocess_fused, preprocess_reference, write_blob)
+
+# Initialize AWS clients
+s3_client = boto3.client('s3')
+dynamodb = boto3.resource('dynamodb')
+
+# Environment variables
+TABLE_NAME = os.environ.get('DYNAMODB_TABLE_NAME')
+
+# The ingestion attributes passed on as "metadata" (what FetchImage's projection reads)
+METADATA_ATTRIBUTES = ('image_id', 'original_url', 's3_bucket', 's3_key', 's3_url', 'original_filename',
+                       'content_type', 'file_size', 'content_sha256', 'upload_timestamp', 'status',
+                       'workflow_stage', 'created_at', 'updated_at')
+
+def lambda_handler(event, context):
+    """
+    Fetch + Preprocess Lambda - FetchImage and Preprocessing in one state
+
+    Used by statemachine-fused.json. The two-state pipeline reads the item,
+    reads the image from S3, base64-encodes it into the state, updates the
+    item, and then the next invocation base64-decodes and reopens the same
+    bytes. Here:
+    1. One UpdateItem sets workflow_stage and returns the item (ALL_NEW), so
+       the metadata read and the status write are a single DynamoDB call
+    2. The S3 body is handed straight to Image.open, with no base64 and no copy in the handler
+    3. The same preprocessing as lambda_function.py (PREPROCESS_PIPELINE)
+
+    Input: {"image_id": "uuid", "trace": {...}}
+    Output: the Preprocessing output ({"processed_image_data", "processed_image_ref", "metadata", ...}),
+            with one "fetch_preprocess" span in the trace
+    """
+
+    start_ms = int(time.time() * 1000)
+    image_id = event.get('image_id', 'unknown')
+    try:
+        print(f"Fetching and preprocessing image_id: {image_id}")
+
+        # Step 1: status write + metadata read in one call (fails if the image was never ingested)
+        table = dynamodb.Table(TABLE_NAME)
+        try:
+            response = table.update_item(
+                Key={'image_id': image_id},
+                UpdateExpression='SET workflow_stage = :stage',
+                ConditionExpression='attribute_exists(image_id)',
+                ExpressionAttributeValues={':stage': 'image_fetched'},
+                ReturnValues='ALL_NEW'
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                raise ValueError(f"Image metadata not found for image_id: {image_id}")
+            raise
+        item = response['Attributes']
+        metadata = {k: item[k] for k in METADATA_ATTRIBUTES if k in item}
+
+        # Step 2: decode straight from the S3 stream
+        print(f"Fetching image from S3: s3://{item['s3_bucket']}/{item['s3_key']}")
+        s3_response = s3_client.get_object(Bucket=item['s3_bucket'], Key=item['s3_key'])
+        image = Image.open(s3_response['Body'])
+        original_size = image.size
+        print(f"Image opened: {original_size[0]}x{original_size[1]}, mode: {image.mode}, "
+              f"{s3_response['ContentLength']} bytes")
+
+        # Step 3: grayscale, flip, rotate, resize
+        if PREPROCESS_PIPELINE == 'fused':
+            image = preprocess_fused(image)
+        else:
+            image = preprocess_reference(image)
+        final_size = image.size
+
+        processed_jpeg = encode_jpeg(image)
+        if PAYLOAD_MODE == 'claim_check':
+            processed_image_base64 = None
+            processed_image_ref = write_blob(processed_jpeg, 'jpg', 'image/jpeg')
+        else:
+            processed_image_base64 = base64.b64encode(processed_jpeg).decode('utf-8')
+            processed_image_ref = None
+
+        print(f"Fetch + preprocessing completed for image_id: {image_id}")
+
+        result = {
+            'statusCode': 200,
+            'image_id': image_id,
+            'processed_image_data': processed_image_base64,
+            'processed_image_ref': processed_image_ref,
+            'original_dimensions': {'width': original_size[0], 'height': original_size[1]},
+            'processed_dimensions': {'width': final_size[0], 'height': final_size[1]},
+            'preprocessing_steps': PIPELINE_STEPS[PREPROCESS_PIPELINE] + ['convert_to_rgb'],
+            'metadata': metadata
+        }
+        result['trace'] = add_trace_span(event, 'fetch_preprocess', start_ms, result)
+        return result
+
+    except Exception as e:
+        error_msg = f"Error in fetch + preprocessing: {str(e)}"
+        print(f"ERROR: {error_msg}")
+
+        # Update metadata with error status (only if the item exists)
+        try:
+            dynamodb.Table(TABLE_NAME).update_item(
+                Key={'image_id': image_id},
+                UpdateExpression='SET workflow_stage = :stage, error_message = :error',
+                ConditionExpression='attribute_exists(image_id)',
+                ExpressionAttributeValues={
+                    ':stage': 'fetch_failed',
+                    ':error': error_msg
+                }
+            )
+        except Exception:
+            pass  # Don't fail if we can't update the error status
+
+        result = {
+            'statusCode': 500,
+            'error': error_msg,
+            'image_id': image_id,
+            'preprocessing_failed': True
+        }
+        result['trace'] = add_trace_span(event, 'fetch_preprocess', start_ms, result)
+        return result
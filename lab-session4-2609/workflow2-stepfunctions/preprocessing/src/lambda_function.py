@@ -1,8 +1,148 @@
 import json
 import base64
+import hashlib
+import threading
+from collections import OrderedDict
 from PIL import Image, ImageOps
 import io
 import os
+import time
+import boto3
+
+# inline: images travel through the state as base64 (default)
+# claim_check: images are read from / written to S3 and only references travel
+PAYLOAD_MODE = os.environ.get('PAYLOAD_MODE', 'inline')
+BUCKET_NAME = os.environ.get('S3_BUCKET_NAME')
+INTERMEDIATE_PREFIX = 'intermediate/'
+CACHE_BYTES = int(float(os.environ.get('CLAIM_CHECK_CACHE_MB', '64')) * 1024 * 1024)
+# fused: draft-mode decode + one transpose + one resize (default)
+# reference: the original step-by-step pipeline, kept for comparison
+PREPROCESS_PIPELINE = os.environ.get('PREPROCESS_PIPELINE', 'fused')
+TARGET_SIZE = (224, 224)
+
+s3_client = boto3.client('s3') if PAYLOAD_MODE == 'claim_check' else None
+
+# Per-container LRU of blobs this container has read or written: (bucket, key) -> bytes
+_blob_cache = OrderedDict()
+_blob_cache_bytes = 0
+_blob_cache_lock = threading.Lock()
+
+def _cache_blob(cache_key, data):
+    global _blob_cache_bytes
+    if len(data) > CACHE_BYTES:
+        return
+    with _blob_cache_lock:
+        if cache_key in _blob_cache:
+            return
+        _blob_cache[cache_key] = data
+        _blob_cache_bytes += len(data)
+        while _blob_cache_bytes > CACHE_BYTES:
+            _, evicted = _blob_cache.popitem(last=False)
+            _blob_cache_bytes -= len(evicted)
+
+def _cached_blob(cache_key):
+    with _blob_cache_lock:
+        data = _blob_cache.get(cache_key)
+        if data is not None:
+            _blob_cache.move_to_end(cache_key)
+        return data
+
+def read_blob(ref):
+    """Bytes behind a claim-check reference, served from the container cache when possible"""
+    cache_key = (ref['bucket'], ref['key'])
+    data = _cached_blob(cache_key)
+    if data is None:
+        data = s3_client.get_object(Bucket=ref['bucket'], Key=ref['key'])['Body'].read()
+        _cache_blob(cache_key, data)
+    return data
+
+def write_blob(data, extension, content_type):
+    """
+    Store an intermediate under a content-addressed key (sha256 of the bytes).
+    Identical output (a retry, or the same image classified again) maps to the
+    same object, so it is uploaded once per container.
+    """
+    key = f"{INTERMEDIATE_PREFIX}{hashlib.sha256(data).hexdigest()}.{extension}"
+    cache_key = (BUCKET_NAME, key)
+    if _cached_blob(cache_key) is None:
+        s3_client.put_object(Bucket=BUCKET_NAME, Key=key, Body=data, ContentType=content_type)
+        _cache_blob(cache_key, data)
+    return {'bucket': BUCKET_NAME, 'key': key, 'size': len(data)}
+
+PIPELINE_STEPS = {
+    'reference': ['grayscale_conversion', 'horizontal_flip', 'rotate_90_degrees', 'resize_224x224'],
+    'fused': ['draft_decode_grayscale', 'transpose_flip_rotate', 'resize_224x224'],
+}
+
+def preprocess_reference(image, target_size=TARGET_SIZE):
+    """Original pipeline: full decode, then grayscale, mirror, rotate and resize as separate passes"""
+    if image.mode != 'L':  # If not already grayscale
+        image = image.convert('L')
+    image = ImageOps.mirror(image)
+    image = image.rotate(-90, expand=True)  # -90 for clockwise rotation
+    return image.resize(target_size, Image.Resampling.LANCZOS)
+
+def preprocess_fused(image, target_size=TARGET_SIZE):
+    """
+    Same steps as preprocess_reference in fewer full-image passes.
+    `image` must be freshly opened (not yet loaded) for draft mode to apply.
+    
+    - JPEGs decode straight to grayscale at the smallest 1/2, 1/4 or 1/8 DCT
+      scale that still covers the target, so a 4K photo is never decoded
+      at full size
+    - horizontal flip + 90 degree clockwise rotation is one transpose (TRANSVERSE)
+    - a single LANCZOS resize
+    """
+    # the transpose swaps width and height, so ask the decoder for the swapped target
+    image.draft('L', (target_size[1], target_size[0]))
+    if image.mode != 'L':
+        image = image.convert('L')
+    image = image.transpose(Image.Transpose.TRANSVERSE)
+    return image.resize(target_size, Image.Resampling.LANCZOS)
+
+def preprocess_image(image_data, pipeline=None, output='image'):
+    """
+    Run the preprocessing pipeline on encoded image bytes.
+    
+    output: 'image' - 224x224 grayscale PIL image
+            'array' - 224x224 uint8 numpy array, for in-process consumers
+                      (no JPEG encode/decode round trip)
+            'jpeg'  - RGB JPEG bytes, the format the state machine passes on
+    """
+    pipeline = pipeline or PREPROCESS_PIPELINE
+    image = Image.open(io.BytesIO(image_data))
+    image = preprocess_fused(image) if pipeline == 'fused' else preprocess_reference(image)
+    if output == 'array':
+        import numpy as np
+        return np.asarray(image)
+    if output == 'jpeg':
+        return encode_jpeg(image)
+    return image
+
+def encode_jpeg(image):
+    # Convert back to RGB for ML models (even though grayscale, some models expect RGB)
+    buffer = io.BytesIO()
+    image.convert('RGB').save(buffer, format='JPEG', quality=95)
+    return buffer.getvalue()
+
+# base64 images in the state: sized by their length rather than serialised for the trace
+TRACE_SIZED_FIELDS = ('image_data', 'processed_image_data')
+_cold_start = True
+
+def add_trace_span(event, stage, start_ms, result):
+    """The state's trace context plus this invocation's span; a copy of fetch-image's add_trace_span"""
+    global _cold_start
+    trace = dict(event.get('trace') or {})
+    span = [stage, start_ms, int(time.time() * 1000), _cold_start, _payload_bytes(event), _payload_bytes(result)]
+    _cold_start = False
+    trace['spans'] = list(trace.get('spans', [])) + [span]
+    return trace
+
+def _payload_bytes(payload):
+    if isinstance(payload, list):
+        return sum(_payload_bytes(item) for item in payload)
+    small = {k: v for k, v in payload.items() if k not in TRACE_SIZED_FIELDS and k != 'trace'}
+    return sum(len(payload.get(k) or '') for k in TRACE_SIZED_FIELDS) + len(json.dumps(small, default=str))
 
 def lambda_handler(event, context):
     """
@@ -15,50 +155,47 @@ def lambda_handler(event, context):
     4. Resize (224x224 for ML models)
     
     Input: {"image_data": "base64", "image_id": "uuid", ...}
-    Output: {"processed_image_data": "base64", "image_id": "uuid", ...}
+           or {"image_ref": {"bucket", "key"}, ...} in claim_check mode
+    Output: {"processed_image_data": "base64", "processed_image_ref": null, "image_id": "uuid", ...}
+            in claim_check mode processed_image_data is null and processed_image_ref
+            points at the processed JPEG in S3
+    The trace context is passed through with a "preprocessing" span appended.
     """
     
+    start_ms = int(time.time() * 1000)
     try:
         image_id = event['image_id']
-        image_base64 = event['image_data']
         
         print(f"Starting preprocessing pipeline for image_id: {image_id}")
         
-        # Decode base64 image
-        image_data = base64.b64decode(image_base64)
+        # Decode base64 image (or read it from S3 when the state carries a reference)
+        if event.get('image_ref'):
+            image_data = read_blob(event['image_ref'])
+        else:
+            image_data = base64.b64decode(event['image_data'])
         image = Image.open(io.BytesIO(image_data))
         
         original_size = image.size
         print(f"Original image size: {original_size}")
         
-        # Step 1: Convert to Grayscale
-        print("Step 1: Converting to grayscale")
-        if image.mode != 'L':  # If not already grayscale
-            image = image.convert('L')
-        
-        # Step 2: Flip horizontally
-        print("Step 2: Flipping horizontally")
-        image = ImageOps.mirror(image)
-        
-        # Step 3: Rotate 90 degrees clockwise
-        print("Step 3: Rotating 90 degrees")
-        image = image.rotate(-90, expand=True)  # -90 for clockwise rotation
-        
-        # Step 4: Resize to 224x224 (standard input size for many ML models)
-        print("Step 4: Resizing to 224x224")
-        target_size = (224, 224)
-        image = image.resize(target_size, Image.Resampling.LANCZOS)
-        
-        # Convert back to RGB for ML models (even though grayscale, some models expect RGB)
-        image = image.convert('RGB')
+        # Steps 1-4: grayscale, flip, rotate, resize (PREPROCESS_PIPELINE picks fused or reference)
+        print(f"Running {PREPROCESS_PIPELINE} pipeline: {' -> '.join(PIPELINE_STEPS[PREPROCESS_PIPELINE])}")
+        if PREPROCESS_PIPELINE == 'fused':
+            image = preprocess_fused(image)
+        else:
+            image = preprocess_reference(image)
         
         final_size = image.size
         print(f"Final processed image size: {final_size}")
         
-        # Convert processed image back to base64
-        buffer = io.BytesIO()
-        image.save(buffer, format='JPEG', quality=95)
-        processed_image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+        # Convert processed image back to base64 (or store it and pass a reference)
+        processed_jpeg = encode_jpeg(image)
+        if PAYLOAD_MODE == 'claim_check':
+            processed_image_base64 = None
+            processed_image_ref = write_blob(processed_jpeg, 'jpg', 'image/jpeg')
+        else:
+            processed_image_base64 = base64.b64encode(processed_jpeg).decode('utf-8')
+            processed_image_ref = None
         
         print(f"Preprocessing completed successfully for image_id: {image_id}")
         
@@ -67,17 +204,13 @@ def lambda_handler(event, context):
             'statusCode': 200,
             'image_id': image_id,
             'processed_image_data': processed_image_base64,
-            'original_dimensions': event.get('original_dimensions', {}),
+            'processed_image_ref': processed_image_ref,
+            'original_dimensions': {'width': original_size[0], 'height': original_size[1]},
             'processed_dimensions': {'width': final_size[0], 'height': final_size[1]},
-            'preprocessing_steps': [
-                'grayscale_conversion',
-                'horizontal_flip', 
-                'rotate_90_degrees',
-                'resize_224x224',
-                'convert_to_rgb'
-            ],
+            'preprocessing_steps': PIPELINE_STEPS[PREPROCESS_PIPELINE] + ['convert_to_rgb'],
             'metadata': event.get('metadata', {})
         }
+        result['trace'] = add_trace_span(event, 'preprocessing', start_ms, result)
         
         return result
         
@@ -85,12 +218,14 @@ def lambda_handler(event, context):
         error_msg = f"Error in preprocessing pipeline: {str(e)}"
         print(f"ERROR: {error_msg}")
         
-        return {
+        result = {
             'statusCode': 500,
             'error': error_msg,
             'image_id': event.get('image_id', 'unknown'),
             'preprocessing_failed': True
         }
+        result['trace'] = add_trace_span(event, 'preprocessing', start_ms, result)
+        return result
 
 def resize_image_only(event, context):
     """
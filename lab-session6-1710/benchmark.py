@@ -15,11 +15,14 @@ import time
 import sys
 import os
 import matplotlib.pyplot as plt
-import numpy as np
 from datetime import datetime
 import boto3
 from botocore.exceptions import ClientError
 
+# Shared latency histograms (lab-session4-2609/latency_recorder.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lab-session4-2609"))
+from latency_recorder import LatencyRecorder, format_summary
+
 # Configuration
 RPS = 1  # Requests per second
 DURATION = 300  # 5 minutes in seconds
@@ -28,11 +31,14 @@ IMAGE_URL = "https://www.w3schools.com/css/img_5terre.jpg"
 
 # Data tracking
 results = {
-    "e2e_latencies": [],  # End-to-end Lambda response times
+    "e2e_latencies": [],  # End-to-end Lambda response times (kept for the timeline plot)
     "lambda_ec2_latencies": [],  # Lambda to EC2 call latency
     "timestamps": [],
     "status_codes": [],
-    "errors": []
+    "errors": [],
+    # Histograms for statistics; E2E is also corrected against the 1/RPS send schedule
+    "e2e_recorder": LatencyRecorder(interval_s=30),
+    "lambda_ec2_recorder": LatencyRecorder(interval_s=30),
 }
 
 
@@ -124,6 +130,7 @@ def run_benchmark(lambda_name):
     
     for i in range(TOTAL_REQUESTS):
         loop_start = time.time()
+        intended_start = start_time + i / RPS  # when this request should have gone out
         
         # Invoke Lambda
         e2e_latency, lambda_ec2_latency, status_code, error = invoke_lambda(
@@ -139,25 +146,31 @@ def run_benchmark(lambda_name):
         
         if e2e_latency:
             results["e2e_latencies"].append(e2e_latency)
+            # Counting from the intended start corrects for coordinated omission:
+            # a slow response delays every request queued behind it
+            intended_latency = (loop_start - intended_start) * 1000 + e2e_latency
+            results["e2e_recorder"].record(e2e_latency, loop_start - start_time, intended_latency)
         
         if lambda_ec2_latency:
             results["lambda_ec2_latencies"].append(lambda_ec2_latency)
+            results["lambda_ec2_recorder"].record(lambda_ec2_latency, loop_start - start_time, lambda_ec2_latency)
         
         if error:
             results["errors"].append(error)
         
         # Print progress
         if (request_count) % 10 == 0:
-            avg_e2e = np.mean(results["e2e_latencies"]) if results["e2e_latencies"] else 0
+            avg_e2e = results["e2e_recorder"].service.mean
             print(f"[{request_count:3d}/{TOTAL_REQUESTS}] "
                   f"E2E Latency: {e2e_latency:6.1f}ms | "
                   f"Avg E2E: {avg_e2e:6.1f}ms | "
                   f"Status: {status_code} | "
                   f"{'✓' if status_code == 200 else '✗'}")
         
-        # Rate limiting: maintain 1 RPS
-        loop_elapsed = time.time() - loop_start
-        sleep_time = (1.0 / RPS) - loop_elapsed
+        # Rate limiting: keep to the fixed schedule start_time + i / RPS. After a slow
+        # call the next requests go out immediately until the schedule is caught up,
+        # and sleep overshoot does not accumulate
+        sleep_time = start_time + (i + 1) / RPS - time.time()
         if sleep_time > 0:
             time.sleep(sleep_time)
     
@@ -172,40 +185,43 @@ def run_benchmark(lambda_name):
     return results
 
 
+def print_latency_block(title, recorder, corrected=False):
+    """Print min/max/mean/percentiles for one recorder"""
+    hist = recorder.service
+    stats = hist.summary()
+    print(f"{title}:")
+    print(f"  Min:     {stats['min']:7.2f} ms")
+    print(f"  Max:     {stats['max']:7.2f} ms")
+    print(f"  Mean:    {stats['mean']:7.2f} ms")
+    print(f"  Median:  {stats['p50']:7.2f} ms")
+    print(f"  Std Dev: {stats['stddev']:7.2f} ms")
+    print(f"  P90:     {stats['p90']:7.2f} ms")
+    print(f"  P95:     {hist.percentile(95):7.2f} ms")
+    print(f"  P99:     {stats['p99']:7.2f} ms")
+    print(f"  P99.9:   {stats['p99.9']:7.2f} ms")
+    print(f"  Count:   {stats['count']}")
+    if corrected:
+        print(f"  {format_summary('Corrected', recorder.corrected.summary())}")
+
+
 def calculate_statistics(results):
     """Calculate and print statistics"""
-    e2e_latencies = results["e2e_latencies"]
-    lambda_ec2_latencies = results["lambda_ec2_latencies"]
+    e2e = results["e2e_recorder"]
+    lambda_ec2 = results["lambda_ec2_recorder"]
     
     print(f"\n{'='*70}")
     print("BENCHMARK STATISTICS")
     print(f"{'='*70}\n")
     
     # E2E Latency Statistics
-    if e2e_latencies:
-        print("End-to-End (E2E) Lambda Response Latency:")
-        print(f"  Min:     {np.min(e2e_latencies):7.2f} ms")
-        print(f"  Max:     {np.max(e2e_latencies):7.2f} ms")
-        print(f"  Mean:    {np.mean(e2e_latencies):7.2f} ms")
-        print(f"  Median:  {np.median(e2e_latencies):7.2f} ms")
-        print(f"  Std Dev: {np.std(e2e_latencies):7.2f} ms")
-        print(f"  P95:     {np.percentile(e2e_latencies, 95):7.2f} ms")
-        print(f"  P99:     {np.percentile(e2e_latencies, 99):7.2f} ms")
-        print(f"  Count:   {len(e2e_latencies)}")
+    if e2e.service.count:
+        print_latency_block("End-to-End (E2E) Lambda Response Latency", e2e, corrected=True)
     
     print()
     
     # Lambda-EC2 Latency Statistics
-    if lambda_ec2_latencies:
-        print("Lambda to EC2 and Back Call Latency:")
-        print(f"  Min:     {np.min(lambda_ec2_latencies):7.2f} ms")
-        print(f"  Max:     {np.max(lambda_ec2_latencies):7.2f} ms")
-        print(f"  Mean:    {np.mean(lambda_ec2_latencies):7.2f} ms")
-        print(f"  Median:  {np.median(lambda_ec2_latencies):7.2f} ms")
-        print(f"  Std Dev: {np.std(lambda_ec2_latencies):7.2f} ms")
-        print(f"  P95:     {np.percentile(lambda_ec2_latencies, 95):7.2f} ms")
-        print(f"  P99:     {np.percentile(lambda_ec2_latencies, 99):7.2f} ms")
-        print(f"  Count:   {len(lambda_ec2_latencies)}")
+    if lambda_ec2.service.count:
+        print_latency_block("Lambda to EC2 and Back Call Latency", lambda_ec2)
     
     print()
     
@@ -227,10 +243,13 @@ def calculate_statistics(results):
     print(f"{'='*70}\n")
     
     return {
-        "e2e_median": np.median(e2e_latencies) if e2e_latencies else 0,
-        "e2e_mean": np.mean(e2e_latencies) if e2e_latencies else 0,
-        "lambda_ec2_median": np.median(lambda_ec2_latencies) if lambda_ec2_latencies else 0,
-        "lambda_ec2_mean": np.mean(lambda_ec2_latencies) if lambda_ec2_latencies else 0,
+        "e2e_median": e2e.service.percentile(50),
+        "e2e_mean": e2e.service.mean,
+        "lambda_ec2_median": lambda_ec2.service.percentile(50),
+        "lambda_ec2_mean": lambda_ec2.service.mean,
+        "e2e": e2e.service.summary(),
+        "e2e_corrected": e2e.corrected.summary(),
+        "lambda_ec2": lambda_ec2.service.summary(),
     }
 
 
@@ -303,7 +322,11 @@ def plot_results(results, stats):
             "e2e_latencies": results["e2e_latencies"],
             "lambda_ec2_latencies": results["lambda_ec2_latencies"],
             "status_codes": results["status_codes"],
-            "statistics": stats
+            "statistics": stats,
+            "latency_histograms": {
+                "e2e": results["e2e_recorder"].to_dict(),
+                "lambda_ec2": results["lambda_ec2_recorder"].to_dict()
+            }
         }, f, indent=2)
     print(f"✓ Data saved: {data_file}")
     